@@ -8,26 +8,50 @@ import os
 import logging
 import uuid
 import base64
-from typing import Dict, Optional, List
+import hmac
+from typing import Dict, Optional, List, Literal
 from dotenv import load_dotenv
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, model_validator
 
-from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException
+from fastapi import FastAPI, WebSocket, WebSocketDisconnect, HTTPException, Query, Header, Depends
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse, PlainTextResponse, Response
 import uvicorn
-import websockets
-from openai import OpenAI
-import resend
-from datetime import datetime
-from email_templates import get_receipt_html
 
-# Load environment variables
+# Load environment variables before the local modules read their settings
 load_dotenv()
 
+from bills_cache import bills_cache, serialize_result
+from plan_engine import plan_engine
+from audio_pacer import AUDIO_PACING, AudioPacer
+from conversation_window import CONTEXT_MAX_ITEMS, WINDOW_EVENTS, ConversationWindow
+from event_filter import EventFilter, event_type_of
+from transcript_coalescer import (
+    COALESCED_EVENTS, FLUSH_EVENTS, TRANSCRIPT_COALESCE_MS, TranscriptCoalescer, parse_coalesce_ms
+)
+from config_store import ConfigStore, ConfigVersionConflict, diff_configs
+from cascaded_pipeline import CascadedPipeline, create_cascaded_services
+from payments import PaymentExecutor, PaymentLedger
+from transactions import transaction_store
+from upstream_connector import UpstreamUnavailable, upstream_connector
+from usage import BYTES_DOWN, BYTES_UP, GROUP_COLUMNS, TOOL_CALLS, SessionUsage, usage_store
+from loop_watchdog import LOOP_WATCHDOG, loop_watchdog
+from model_router import REALTIME_MODELS, model_router, model_url
+from monitor_hub import MONITORED_EVENTS, monitor_hub, parse_sessions
+from rate_limiter import rate_limiter
+from sampling_profiler import DEFAULT_INTERVAL_MS, MAX_PROFILE_SECONDS, profile_for
+from session_reaper import ACTIVITY_EVENTS, KEEPALIVE_INTERVAL_S, KEEPALIVE_TIMEOUT_S, session_reaper
+from speculative_tools import SpeculativeToolRunner
+from startup import LazyDependency, TimelineMiddleware, startup_timeline
+from text_chat import ChatConversationStore, stream_chat_reply
+from receipt_channels import receipt_dispatcher
+from tools import execute_tool
+from voice_catalog import REALTIME_VOICES, check_voice, voice_catalog
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+startup_timeline.mark("imports")
 
 app = FastAPI(title="Voice AI Pipeline Backend")
 
@@ -40,21 +64,42 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(TimelineMiddleware, timeline=startup_timeline)
 
-# OpenAI client
-openai_client = None
+# OpenAI client (async, shared by all text chat conversations so the
+# underlying HTTP connection pool and keep-alive connections are reused).
+# The openai package takes most of the import time, so it is loaded after
+# startup or on first use; voice sessions only need websockets
 openai_api_key = os.getenv("OPENAI_API_KEY")
-if openai_api_key:
-    openai_client = OpenAI(api_key=openai_api_key)
-
-# Resend configuration
-resend_api_key = os.getenv("RESEND_API_KEY")
-if resend_api_key:
-    resend.api_key = resend_api_key
-else:
+
+
+def _create_openai_client():
+    if not openai_api_key:
+        return None
+    from openai import AsyncOpenAI
+    return AsyncOpenAI(api_key=openai_api_key)
+
+
+openai_client = LazyDependency("openai", _create_openai_client)
+
+OPENAI_CHAT_MODEL = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+
+# Resend configuration (the client is loaded lazily by tools.py)
+if not os.getenv("RESEND_API_KEY"):
     logger.warning("RESEND_API_KEY not found in environment variables")
 
-OPENAI_REALTIME_URL = "wss://api.openai.com/v1/realtime?model=gpt-4o-realtime-preview"
+OPENAI_REALTIME_URL = os.getenv(
+    "OPENAI_REALTIME_URL",
+    "wss://api.openai.com/v1/realtime?model=gpt-4o-realtime-preview"
+)
+# permessage-deflate on the upstream socket; base64 audio barely compresses, so it is off by default
+UPSTREAM_WS_DEFLATE = os.getenv("UPSTREAM_WS_DEFLATE", "false").lower() == "true"
+
+# Admin endpoints (/api/admin/*) require this token in X-Admin-Token; disabled when unset
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")
+
+# Voice engines a session can run on
+VOICE_ENGINES = ("realtime", "cascaded")
 
 
 # ============================================================================
@@ -77,7 +122,8 @@ class VoiceSessionConfig(BaseModel):
     )
     voice: Optional[str] = Field(
         default="alloy",
-        description="Voice to use: alloy, echo, fable, onyx, nova, shimmer"
+        description=f"Realtime voice ({', '.join(sorted(REALTIME_VOICES))}) or, for the cascaded engine, "
+                    "a Cartesia voice id from /api/voices"
     )
     vad_threshold: Optional[float] = Field(
         default=0.95, 
@@ -95,6 +141,19 @@ class VoiceSessionConfig(BaseModel):
         ge=0,
         description="Silence duration to end turn (ms)"
     )
+    engine: Optional[Literal["realtime", "cascaded"]] = Field(
+        default="realtime",
+        description="Voice engine: realtime (OpenAI Realtime proxy) or cascaded (STT → LLM → TTS)"
+    )
+    model: Optional[Literal[REALTIME_MODELS]] = Field(
+        default=None,
+        description="Realtime model; unset lets the router choose by flow and latency (new sessions only)"
+    )
+    
+    @model_validator(mode="after")
+    def voice_exists(self):
+        check_voice(self.voice, self.engine)
+        return self
     
     model_config = {
         "json_schema_extra": {
@@ -111,6 +170,20 @@ class VoiceSessionConfig(BaseModel):
 
 
 
+class ChatRequest(BaseModel):
+    """Text chat turn sent to the streaming chat endpoint"""
+    message: str = Field(..., min_length=1, description="User message text")
+    conversation_id: Optional[str] = Field(
+        default=None,
+        description="Conversation to continue; a new one is started if omitted"
+    )
+
+
+class PlanQuoteRequest(BaseModel):
+    """Bill amounts to price against the payment plan catalog"""
+    amounts: List[float] = Field(..., min_length=1, max_length=10000, description="Bill amounts in dollars")
+
+
 class SessionInitRequest(BaseModel):
     """Request to initialize a session with custom config"""
     config: Optional[VoiceSessionConfig] = Field(
@@ -122,6 +195,30 @@ class SessionInitRequest(BaseModel):
 # Store active sessions and their configurations
 active_sessions: Dict[str, Dict] = {}
 session_configs: Dict[str, VoiceSessionConfig] = {}  # Store config per session
+chat_conversations = ChatConversationStore(  # Text chat histories
+    on_evict=lambda conversation_id: payment_executor.forget_session(f"chat:{conversation_id}")
+)
+config_store = ConfigStore(VoiceSessionConfig)  # Runtime default config and presets
+payment_executor = PaymentExecutor(PaymentLedger(), transactions=transaction_store, limiter=rate_limiter)  # Idempotent payments, shared by all sessions
+
+# Config fields that can be changed on a live Realtime session. The voice is
+# not: the Realtime API refuses it once the session has produced audio, so a
+# new voice only applies to sessions started after the change
+LIVE_UPDATABLE_FIELDS = {
+    "temperature", "max_response_output_tokens",
+    "vad_threshold", "vad_prefix_padding_ms", "vad_silence_duration_ms"
+}
+SESSION_START_FIELDS = LIVE_UPDATABLE_FIELDS | {"voice"}
+VAD_FIELDS = {"vad_threshold", "vad_prefix_padding_ms", "vad_silence_duration_ms"}
+
+# Upstream events the proxy itself acts on; all others are only forwarded or dropped
+PROXY_HANDLED_EVENTS = {
+    "response.output_item.added",
+    "response.function_call_arguments.delta",
+    "response.function_call_arguments.done",
+    "response.audio.done",
+    "response.done",
+} | WINDOW_EVENTS
 
 
 # ============================================================================
@@ -130,6 +227,14 @@ session_configs: Dict[str, VoiceSessionConfig] = {}  # Store config per session
 
 
 
+async def require_admin(x_admin_token: Optional[str] = Header(default=None)):
+    """Dependency for admin endpoints"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Admin endpoints are disabled (ADMIN_TOKEN not set)")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
 def get_system_instructions() -> str:
     """System instructions for the LLM"""
     return """You are a helpful voice assistant for a bill payment system. You can help users:
@@ -299,7 +404,11 @@ def get_tools() -> list:
                     },
                     "transaction_id": {
                         "type": "string",
-                        "description": "Transaction identifier"
+                        "description": "Transaction identifier or confirmation number"
+                    },
+                    "amount": {
+                        "type": "number",
+                        "description": "Payment amount, if the user reported the payment with a confirmation number"
                     }
                 },
                 "required": ["method", "recipient", "transaction_id"]
@@ -406,6 +515,67 @@ def get_tools() -> list:
     ]
 
 
+def realtime_session_fields(voice_config: VoiceSessionConfig, fields: Optional[set] = None) -> Dict:
+    """Realtime session settings derived from a config, optionally limited to some config fields"""
+    fields = SESSION_START_FIELDS if fields is None else set(fields)
+    session = {}
+    if "voice" in fields:
+        session["voice"] = voice_config.voice
+    if fields & VAD_FIELDS:
+        # turn_detection is replaced as a whole, so always send the complete object
+        session["turn_detection"] = {
+            "type": "server_vad",
+            "threshold": voice_config.vad_threshold,
+            "prefix_padding_ms": voice_config.vad_prefix_padding_ms,
+            "silence_duration_ms": voice_config.vad_silence_duration_ms
+        }
+    if "temperature" in fields:
+        session["temperature"] = voice_config.temperature
+    if "max_response_output_tokens" in fields:
+        session["max_response_output_tokens"] = voice_config.max_response_output_tokens
+    return session
+
+
+async def push_config_to_sessions(new_config: VoiceSessionConfig, session_ids: List[str]) -> Dict:
+    """
+    Send only the changed fields as session.update to live Realtime sessions
+    Sessions are patched concurrently; each one is compared against its own current config
+    """
+    async def push(session_id: str) -> str:
+        session = active_sessions.get(session_id)
+        if session is None:
+            return "not_found"
+        upstream = session.get("upstream")
+        changed = [f for f in diff_configs(session["config"], new_config) if f in LIVE_UPDATABLE_FIELDS]
+        if upstream is None or not changed:
+            return "skipped" if upstream is None else "unchanged"
+        await upstream.send(json.dumps({
+            "type": "session.update",
+            "session": realtime_session_fields(new_config, changed)
+        }))
+        # The session keeps the voice it started with
+        session["config"] = new_config.model_copy(update={"voice": session["config"].voice})
+        session["config_version"] = config_store.version
+        return "updated"
+
+    outcomes = await asyncio.gather(*(push(sid) for sid in session_ids), return_exceptions=True)
+    summary: Dict[str, int] = {}
+    for session_id, outcome in zip(session_ids, outcomes):
+        if isinstance(outcome, Exception):
+            logger.warning(f"Config push to session {session_id} failed: {outcome}")
+            outcome = "failed"
+        summary[outcome] = summary.get(outcome, 0) + 1
+    logger.info(f"📡 Pushed config v{config_store.version} to {len(session_ids)} sessions: {summary}")
+    return summary
+
+
+def select_live_sessions(session_ids: Optional[List[str]], preset: Optional[str] = None) -> List[str]:
+    """Explicit session ids, or every live session following the default (or given preset) config"""
+    if session_ids:
+        return session_ids
+    return [sid for sid, session in active_sessions.items() if session.get("preset") == preset and not session.get("custom_config")]
+
+
 async def proxy_openai_realtime(client_ws: WebSocket, session_id: str, voice_config: VoiceSessionConfig = None):
     """Proxy WebSocket connection to OpenAI Real-Time API"""
     if not openai_api_key:
@@ -421,6 +591,11 @@ async def proxy_openai_realtime(client_ws: WebSocket, session_id: str, voice_con
     
     logger.info(f"🎛️ Session config: temp={voice_config.temperature}, voice={voice_config.voice}, vad={voice_config.vad_threshold}")
     
+    # Pinned model, fast model for simple flows, or the default unless it is over its latency SLO
+    model, route_reason = model_router.choose(voice_config.model, active_sessions.get(session_id, {}).get("flow"))
+    if session_id in active_sessions:
+        active_sessions[session_id]["model"] = model
+    
     try:
         # Connect to OpenAI Real-Time API
         headers = {
@@ -428,35 +603,24 @@ async def proxy_openai_realtime(client_ws: WebSocket, session_id: str, voice_con
             "OpenAI-Beta": "realtime=v1"
         }
         
-        logger.info(f"🔌 Connecting to OpenAI Real-Time API for session {session_id}...")
+        logger.info(f"🔌 Connecting to OpenAI Real-Time API for session {session_id} ({model}, {route_reason})...")
         
-        async with websockets.connect(
-            OPENAI_REALTIME_URL,
-            extra_headers=headers
-        ) as openai_ws:
+        # Bounded, hedged connect; fails fast while the model's circuit is open
+        async with upstream_connector.session(
+            model,
+            model_url(OPENAI_REALTIME_URL, model),
+            extra_headers=headers,
+            ping_interval=KEEPALIVE_INTERVAL_S,
+            ping_timeout=KEEPALIVE_TIMEOUT_S,
+            compression="deflate" if UPSTREAM_WS_DEFLATE else None
+        ) as (openai_ws, initial_data):
             logger.info(f"✅ Connected to OpenAI Real-Time API for session {session_id}")
             
-            # Small delay to ensure connection is ready
-            await asyncio.sleep(0.1)
-            
-            # Wait for session.created event from OpenAI
-            try:
-                initial_response = await asyncio.wait_for(openai_ws.recv(), timeout=5.0)
-                initial_data = json.loads(initial_response) if isinstance(initial_response, str) else None
-                
-                if initial_data and initial_data.get("type") == "session.created":
-                    logger.info(f"✅ Session created by OpenAI: {initial_data.get('session', {}).get('id')}")
-                elif initial_data and initial_data.get("type") == "error":
-                    error_details = initial_data.get("error", {})
-                    logger.error(f"❌ OpenAI sent error on connection: {json.dumps(initial_data, indent=2)}")
-                    raise Exception(f"OpenAI connection error: {error_details.get('message', 'Unknown error')}")
-                else:
-                    logger.warning(f"Unexpected initial response: {initial_data.get('type') if initial_data else 'unknown'}")
-                    logger.warning(f"Full response: {json.dumps(initial_data, indent=2) if initial_data else 'None'}")
-                    
-            except asyncio.TimeoutError:
-                logger.error("Timeout waiting for session.created from OpenAI")
-                raise Exception("OpenAI did not send session.created event")
+            if initial_data.get("type") == "session.created":
+                logger.info(f"✅ Session created by OpenAI: {initial_data.get('session', {}).get('id')}")
+            else:
+                logger.warning(f"Unexpected initial response: {initial_data.get('type') or 'unknown'}")
+                logger.warning(f"Full response: {json.dumps(initial_data, indent=2)}")
             
             # Now send session.update with our configuration
             # Use minimal configuration that matches OpenAI Real-Time API schema
@@ -465,22 +629,14 @@ async def proxy_openai_realtime(client_ws: WebSocket, session_id: str, voice_con
                 "session": {
                     "modalities": ["text", "audio"],
                     "instructions": get_system_instructions(),
-                    "voice": voice_config.voice,
                     "input_audio_format": "pcm16",
                     "output_audio_format": "pcm16",
                     "input_audio_transcription": {
                         "model": "whisper-1"
                     },
-                    "turn_detection": {
-                        "type": "server_vad",
-                        "threshold": voice_config.vad_threshold,
-                        "prefix_padding_ms": voice_config.vad_prefix_padding_ms,
-                        "silence_duration_ms": voice_config.vad_silence_duration_ms
-                    },
                     "tools": get_tools(),
                     "tool_choice": "auto",
-                    "temperature": voice_config.temperature,
-                    "max_response_output_tokens": voice_config.max_response_output_tokens
+                    **realtime_session_fields(voice_config)
                 }
             }
             
@@ -512,6 +668,10 @@ async def proxy_openai_realtime(client_ws: WebSocket, session_id: str, voice_con
                 logger.error(f"Error sending session config: {e}")
                 raise
             
+            # Live config pushes go straight to this upstream socket
+            if session_id in active_sessions:
+                active_sessions[session_id]["upstream"] = openai_ws
+
             # Send initial greeting to client
             await client_ws.send_json({
                 "type": "message",
@@ -537,11 +697,16 @@ async def proxy_openai_realtime(client_ws: WebSocket, session_id: str, voice_con
                                     "type": "input_audio_buffer.append",
                                     "audio": audio_base64
                                 }
-                                await openai_ws.send(json.dumps(message))
+                                message = json.dumps(message)
+                                usage.counters[BYTES_UP] += len(message)
+                                await openai_ws.send(message)
                                 logger.debug(f"Sent {len(audio_bytes)} bytes of audio to OpenAI")
                                 
                             elif "text" in data:
                                 # JSON text message
+                                usage.counters[BYTES_UP] += len(data["text"])
+                                if event_type_of(data["text"]) != "input_audio_buffer.append":
+                                    session_reaper.touch(session_id)
                                 try:
                                     message = json.loads(data["text"])
                                     await openai_ws.send(json.dumps(message))
@@ -568,53 +733,142 @@ async def proxy_openai_realtime(client_ws: WebSocket, session_id: str, voice_con
                     logger.info(f"Client-to-OpenAI forwarding cancelled for session {session_id}")
                 except Exception as e:
                     logger.error(f"Error in client-to-OpenAI forwarding: {e}")
+                finally:
+                    # Client is gone - close upstream so the OpenAI-to-client side ends too
+                    await openai_ws.close()
             
+            # Read-only tools (account lookup, bills) start while arguments are still streaming
+            speculative_tools = SpeculativeToolRunner()
+            session = active_sessions.get(session_id, {})
+            event_filter = session.get("event_filter") or EventFilter()
+            coalescer = TranscriptCoalescer(
+                client_ws.send_text, session.get("coalesce_ms", TRANSCRIPT_COALESCE_MS)
+            )
+            pacer = AudioPacer(client_ws.send_text) if session.get("pacing", AUDIO_PACING) else None
+            usage = session.get("usage") or SessionUsage(session_id)
+            usage.config["model"] = model
+            window = ConversationWindow(session.get("context_max_items", CONTEXT_MAX_ITEMS))
+
+            async def answer_in_backend(call_id: str, function_name: str, arguments_str: str,
+                                        result: Dict, duplicate: bool = False):
+                """Send a backend tool result upstream and let the frontend apply its UI side effects"""
+                output = serialize_result(result)
+                await openai_ws.send(json.dumps({
+                    "type": "conversation.item.create",
+                    "item": {
+                        "type": "function_call_output",
+                        "call_id": call_id,
+                        "output": output
+                    }
+                }))
+                await openai_ws.send(json.dumps({"type": "response.create"}))
+
+                # Frontend must not answer again; duplicates were already applied in the UI.
+                # The result is spliced in as-is so cached results are not re-encoded
+                event = json.dumps({
+                    "type": "function_call",
+                    "call_id": call_id,
+                    "name": function_name,
+                    "arguments": arguments_str,
+                    "handled": True,
+                    "duplicate": duplicate
+                })
+                await client_ws.send_text(f'{event[:-1]}, "result": {output}}}')
+                monitor_hub.publish_tool_result(session_id, function_name, call_id, result, duplicate)
+                logger.info(f"📤 Answered {function_name} in backend{' (duplicate)' if duplicate else ''}, notified frontend")
+
+            async def cut_playback():
+                """Barge-in: drop paced audio and truncate the item to what the caller heard"""
+                state = await pacer.cut()
+                if state["active"] and state["item_id"]:
+                    await openai_ws.send(json.dumps({
+                        "type": "conversation.item.truncate",
+                        "item_id": state["item_id"],
+                        "content_index": 0,
+                        "audio_end_ms": state["played_ms"]
+                    }))
+                    logger.info(f"✂️ Barge-in: truncated {state['item_id']} at {state['played_ms']} ms "
+                                f"({state['buffered_ms']} ms of buffered audio dropped)")
+
             async def forward_openai_to_client():
                 """Forward messages from OpenAI to client"""
                 try:
                     async for message in openai_ws:
+                        usage.counters[BYTES_DOWN] += len(message)
+                        if isinstance(message, bytes):
+                            # Binary data - forward as-is
+                            logger.info(f"🔊 Forwarding binary audio chunk: {len(message)} bytes")
+                            await client_ws.send_bytes(message)
+                            continue
                         try:
+                            event_type = event_type_of(message)
+
+                            # Forward only the event types this client subscribed to; transcript
+                            # deltas are merged and flushed before the events that end them
+                            forward = event_filter.check(event_type, len(message))
+                            if event_type in ACTIVITY_EVENTS:
+                                session_reaper.touch(session_id)
+                            if event_type == "input_audio_buffer.speech_stopped":
+                                usage.speech_stopped()
+                            elif event_type == "response.audio.delta":
+                                first_audio_ms = usage.audio_started()
+                                if first_audio_ms is not None:
+                                    model_router.observe(model, first_audio_ms)
+                            if pacer is not None and event_type == "input_audio_buffer.speech_started":
+                                await cut_playback()
+                            if pacer is not None and forward and event_type == "response.audio.delta":
+                                await pacer.push(message)
+                            elif pacer is not None and forward and event_type == "response.audio.done":
+                                pacer.finish(message)
+                            elif event_type in FLUSH_EVENTS:
+                                await coalescer.flush(then=message if forward else None)
+                            elif forward and coalescer.enabled and event_type in COALESCED_EVENTS:
+                                await coalescer.add(message)
+                            elif forward:
+                                await client_ws.send_text(message)
+
+                            # Completed transcripts and errors for supervisors, if any watch this session
+                            if event_type in MONITORED_EVENTS:
+                                monitor_hub.publish_upstream(session_id, event_type, message)
+
+                            # Most events (audio/transcript deltas) need no further handling
+                            if event_type not in PROXY_HANDLED_EVENTS:
+                                continue
                             data = json.loads(message)
-                            
-                            # Forward all messages to client
-                            await client_ws.send_text(message)
-                            
+
+                            if event_type in WINDOW_EVENTS:
+                                window.observe(data)
+                            elif event_type == "response.done":
+                                usage.add_response(data.get("response", {}).get("usage"))
+                                # Between turns: trim the upstream conversation to the retention window
+                                for prune_event in window.prune_events():
+                                    await openai_ws.send(prune_event)
+
+                            if data.get("type") == "response.output_item.added":
+                                speculative_tools.on_output_item_added(data.get("item", {}))
+                            elif data.get("type") == "response.function_call_arguments.delta":
+                                speculative_tools.on_arguments_delta(data.get("call_id"), data.get("delta", ""))
+
                             # Handle function calls
                             if data.get("type") == "response.function_call_arguments.done":
                                 function_name = data.get("name")
                                 call_id = data.get("call_id")
                                 arguments_str = data.get("arguments", "{}")
+                                usage.counters[TOOL_CALLS] += 1
                                 logger.info(f"🔧 Function call detected: {function_name}")
+                                monitor_hub.publish(session_id, "tool.call", name=function_name, call_id=call_id,
+                                                    arguments=arguments_str)
                                 
-                                if function_name == "send_email":
-                                    # Handle email sending locally in backend
-                                    try:
-                                        args = json.loads(arguments_str)
-                                        to_email = args.get("to")
-                                        subject = args.get("subject")
-                                        html_content = args.get("html")
-                                        
-                                        logger.info(f"📧 Sending email to {to_email}...")
-                                        
-                                        # Send email using Resend
-                                        if resend.api_key:
-                                            email_params = {
-                                                "from": "CareCredit Support <onboarding@resend.dev>",
-                                                "to": [to_email],
-                                                "subject": subject,
-                                                "html": html_content
-                                            }
-                                            email_response = resend.Emails.send(email_params)
-                                            logger.info(f"✅ Email sent: {email_response}")
-                                            output_result = "Email sent successfully."
-                                        else:
-                                            logger.error("❌ Resend API key not configured")
-                                            output_result = "Error: Email service not configured."
-                                            
-                                    except Exception as e:
-                                        logger.error(f"❌ Error sending email: {e}")
-                                        output_result = f"Error sending email: {str(e)}"
-                                    
+                                if function_name in ("send_email", "send_receipt"):
+                                    # Handle email/receipt sending locally in backend, within the email limits
+                                    result = await rate_limiter.check_tool(
+                                        function_name, session_id, payment_executor.account_of(session_id)
+                                    ) or await execute_tool(
+                                        function_name, arguments_str, payment_executor.caller(session_id)
+                                    )
+                                    output_result = result.get("message") or f"Error: {result.get('error')}"
+                                    monitor_hub.publish_tool_result(session_id, function_name, call_id, result)
+
                                     # Send output back to OpenAI
                                     function_output_event = {
                                         "type": "conversation.item.create",
@@ -629,52 +883,21 @@ async def proxy_openai_realtime(client_ws: WebSocket, session_id: str, voice_con
                                     # Trigger response
                                     await openai_ws.send(json.dumps({"type": "response.create"}))
 
-                                elif function_name == "send_receipt":
-                                    # Handle receipt sending
-                                    try:
-                                        args = json.loads(arguments_str)
-                                        method = args.get("method")
-                                        recipient = args.get("recipient")
-                                        transaction_id = args.get("transaction_id")
-                                        
-                                        if method == "email":
-                                            logger.info(f"📧 Sending receipt to {recipient}...")
-                                            
-                                            # Generate HTML content
-                                            amount = "150.00" # Default/Mock amount since it's not passed in send_receipt
-                                            date_str = datetime.now().strftime("%B %d, %Y")
-                                            html_content = get_receipt_html(transaction_id, amount, date_str, "Credit Card")
-                                            
-                                            if resend.api_key:
-                                                email_params = {
-                                                    "from": "CareCredit Support <onboarding@resend.dev>",
-                                                    "to": [recipient],
-                                                    "subject": f"Payment Receipt - {transaction_id}",
-                                                    "html": html_content
-                                                }
-                                                email_response = resend.Emails.send(email_params)
-                                                logger.info(f"✅ Receipt sent: {email_response}")
-                                                output_result = "Receipt sent successfully."
-                                            else:
-                                                output_result = "Error: Email service not configured."
-                                        else:
-                                            output_result = "SMS not supported yet."
-                                            
-                                    except Exception as e:
-                                        logger.error(f"❌ Error sending receipt: {e}")
-                                        output_result = f"Error sending receipt: {str(e)}"
+                                elif payment_executor.handles(function_name):
+                                    # Side-effecting tools run at most once per call_id/operation
+                                    result, duplicate = await payment_executor.execute(
+                                        session_id, function_name, call_id, arguments_str
+                                    )
+                                    if function_name == "process_payment" and not duplicate:
+                                        speculative_tools.forget("get_bills")
+                                    await answer_in_backend(call_id, function_name, arguments_str, result, duplicate)
 
-                                    # Send output back to OpenAI
-                                    function_output_event = {
-                                        "type": "conversation.item.create",
-                                        "item": {
-                                            "type": "function_call_output",
-                                            "call_id": call_id,
-                                            "output": output_result
-                                        }
-                                    }
-                                    await openai_ws.send(json.dumps(function_output_event))
-                                    await openai_ws.send(json.dumps({"type": "response.create"}))
+                                elif speculative_tools.handles(function_name):
+                                    # Answer from the speculative/prefetched result when arguments match
+                                    result = await speculative_tools.resolve(function_name, call_id, arguments_str)
+                                    if function_name == "lookup_account" and result.get("success"):
+                                        payment_executor.remember_account(session_id, result["account"]["id"])
+                                    await answer_in_backend(call_id, function_name, arguments_str, result)
 
                                 else:
                                     # Forward other function calls to frontend
@@ -688,18 +911,9 @@ async def proxy_openai_realtime(client_ws: WebSocket, session_id: str, voice_con
                                     logger.info(f"📤 Sent function_call event to frontend: {function_name}")
                             
                             # Log important events
-                            if data.get("type") == "response.audio.delta":
-                                # logger.debug(f"Audio delta: {len(data.get('delta', ''))} bytes")
-                                pass
-                            elif data.get("type") == "response.audio.done":
+                            if data.get("type") == "response.audio.done":
                                 logger.info(f"✅ Audio response complete")
-                            elif data.get("type") in ["response.audio_transcript.delta", "response.audio_transcript.done"]:
-                                logger.debug(f"Transcript: {data.get('delta', '')}")
-                                
-                        except json.JSONDecodeError:
-                            # Binary data - forward as-is
-                            logger.info(f"🔊 Forwarding binary audio chunk: {len(message)} bytes")
-                            await client_ws.send_bytes(message)
+
                         except Exception as e:
                             logger.error(f"Error processing OpenAI message: {e}")
                             
@@ -707,6 +921,14 @@ async def proxy_openai_realtime(client_ws: WebSocket, session_id: str, voice_con
                     logger.info(f"OpenAI-to-client forwarding cancelled for session {session_id}")
                 except Exception as e:
                     logger.error(f"Error in OpenAI-to-client forwarding: {e}")
+                finally:
+                    speculative_tools.close()
+                    coalescer.close()
+                    if pacer is not None:
+                        pacer.close()
+                    logger.info(f"📉 Downstream events for session {session_id}: {event_filter.stats}")
+                    if window.stats["pruned"]:
+                        logger.info(f"🪟 Context window for session {session_id}: {window.stats}")
             
             # Run both forwarding tasks concurrently
             try:
@@ -717,6 +939,15 @@ async def proxy_openai_realtime(client_ws: WebSocket, session_id: str, voice_con
             except Exception as e:
                 logger.error(f"Error in proxy tasks: {e}")
                 
+    except UpstreamUnavailable as e:
+        # Logged by the connector; the client gets a retryable error instead of a long wait
+        try:
+            await client_ws.send_json({
+                "type": "error",
+                "error": {"code": "upstream_unavailable", "message": str(e), "retry_after_s": e.retry_after_s}
+            })
+        except Exception:
+            pass
     except Exception as e:
         logger.exception(f"Error proxying to OpenAI Real-Time API: {e}")
         try:
@@ -728,37 +959,265 @@ async def proxy_openai_realtime(client_ws: WebSocket, session_id: str, voice_con
             pass
 
 
+async def run_cascaded_engine(client_ws: WebSocket, session_id: str, voice_config: VoiceSessionConfig = None):
+    """Run a session through the cascaded STT → LLM → TTS pipeline"""
+    try:
+        stt, llm, tts = create_cascaded_services(
+            await openai_client.aget(),
+            OPENAI_CHAT_MODEL,
+            get_system_instructions(),
+            get_tools(),
+            # Realtime voice names keep the CARTESIA_VOICE_ID default
+            voice_id=None if voice_config is None or voice_config.voice in REALTIME_VOICES else voice_config.voice
+        )
+    except Exception as e:
+        logger.error(f"Cannot start cascaded pipeline for session {session_id}: {e}")
+        await client_ws.send_json({"type": "error", "error": {"message": str(e)}})
+        return
+
+    logger.info(f"🎛️ Cascaded pipeline for session {session_id}: {type(stt).__name__} → {type(llm).__name__} → {type(tts).__name__}")
+    pipeline = CascadedPipeline(
+        client_ws, session_id, stt, llm, tts, payment_executor.bind(session_id),
+        on_activity=lambda: session_reaper.touch(session_id)
+    )
+    try:
+        await pipeline.run()
+    except Exception as e:
+        logger.exception(f"Error in cascaded pipeline for session {session_id}: {e}")
+        try:
+            await client_ws.send_json({"type": "error", "error": {"message": str(e)}})
+        except:
+            pass
+
+
+async def warn_idle_session(session_id: str, seconds_left: float):
+    """Reaper warning: tell the caller the idle session is about to end"""
+    session = active_sessions.get(session_id)
+    if session is None:
+        return
+    await session["websocket"].send_json({
+        "type": "message",
+        "text": f"Are you still there? This call will end in {seconds_left:.0f} seconds if there is no activity.",
+        "sender": "bot",
+        "reason": "idle_warning"
+    })
+
+
+async def close_expired_session(session_id: str, reason: str):
+    """Reaper close: end an idle or overlong session and its upstream connection"""
+    session = active_sessions.get(session_id)
+    if session is None:
+        return
+    text = "This call was ended due to inactivity." if reason == "idle" else "This call reached its maximum length."
+    try:
+        await session["websocket"].send_json({"type": "message", "text": text, "sender": "bot", "reason": reason})
+        await session["websocket"].close(code=1000, reason=reason)
+    except Exception as e:
+        logger.debug(f"Client of session {session_id} already gone: {e}")
+    # The client may be unreachable; the paid upstream socket is closed regardless
+    upstream = session.get("upstream")
+    if upstream is not None:
+        await upstream.close()
+
+
+ENGINE_RUNNERS = {
+    "realtime": proxy_openai_realtime,
+    "cascaded": run_cascaded_engine,
+}
+
+
+@app.on_event("startup")
+async def start_loop_watchdog():
+    if LOOP_WATCHDOG:
+        loop_watchdog.start()
+
+
+@app.on_event("startup")
+async def warm_dependencies():
+    """Load the deferred clients once the server is up; /ready flips when they are"""
+    startup_timeline.mark("startup")
+    app.state.warm_up = asyncio.create_task(startup_timeline.warm(openai_client))
+
+
+@app.on_event("startup")
+async def load_voice_catalog():
+    """Disk copy, then the Cartesia API, in the background; startup does not wait"""
+    voice_catalog.start()
+
+
+@app.on_event("shutdown")
+async def stop_voice_catalog():
+    await voice_catalog.stop()
+
+
+@app.on_event("shutdown")
+async def flush_receipts():
+    """Deliver receipts still queued or in flight before the worker exits"""
+    await receipt_dispatcher.aclose()
+
+
+@app.on_event("shutdown")
+async def close_stores():
+    """Commit the last usage, ledger and transaction batches before the worker exits"""
+    for session in list(active_sessions.values()):
+        if "usage" in session:
+            usage_store.record(session.pop("usage"))
+    for name, store in (("usage", usage_store), ("payment ledger", payment_executor.ledger),
+                        ("transactions", transaction_store)):
+        try:
+            await store.close()
+        except Exception as e:
+            logger.error(f"❌ Closing the {name} store failed: {e}")
+
+
 @app.websocket("/ws/voice")
 async def websocket_endpoint(websocket: WebSocket):
-    """WebSocket endpoint that proxies to OpenAI Real-Time API"""
+    """
+    WebSocket endpoint for voice sessions
+    Proxies to OpenAI Real-Time API by default; ?engine=cascaded selects the
+    STT → LLM → TTS pipeline. ?events= limits the forwarded Realtime events
+    (see event_filter.py), ?coalesce_ms= sets the transcript delta interval,
+    ?pacing=false turns off server-side audio pacing and ?flow= (bills, receipt,
+    ...) lets the model router pick a faster model for simple flows
+    """
     await websocket.accept()
+    startup_timeline.mark("first_websocket")
+    
+    # New sessions per client address; refused before any session state or upstream exists
+    wait_s = await rate_limiter.acquire("voice_session_ip", websocket.client.host if websocket.client else None)
+    if wait_s:
+        await websocket.send_json({
+            "type": "error",
+            "error": {"code": "rate_limited", "message": "Too many voice sessions. Please try again shortly.",
+                      "retry_after_s": round(wait_s, 1)}
+        })
+        await websocket.close(code=1008)
+        return
     
     session_id = str(uuid.uuid4())
+    loop_watchdog.bind_session(session_id)
     logger.info(f"🔌 WebSocket client connected - Session: {session_id}")
     
     try:
-        # Get session config if it was pre-configured, otherwise use defaults
-        voice_config = session_configs.get(session_id, VoiceSessionConfig())
+        # Session config: pre-configured, a named preset (?preset=), or the runtime default
+        preset = websocket.query_params.get("preset")
+        if preset is not None and preset not in config_store.presets:
+            await websocket.send_json({
+                "type": "error",
+                "error": {"message": f"Unknown preset '{preset}'. Available: {', '.join(config_store.presets)}"}
+            })
+            return
+        try:
+            coalesce_ms = parse_coalesce_ms(websocket.query_params.get("coalesce_ms"))
+        except ValueError:
+            await websocket.send_json({
+                "type": "error",
+                "error": {"message": "coalesce_ms must be an integer number of milliseconds"}
+            })
+            return
+        custom_config = session_configs.get(session_id)
+        voice_config = custom_config or config_store.get(preset)
+        engine = websocket.query_params.get("engine") or voice_config.engine
+        if engine not in ENGINE_RUNNERS:
+            await websocket.send_json({
+                "type": "error",
+                "error": {"message": f"Unknown engine '{engine}'. Available: {', '.join(VOICE_ENGINES)}"}
+            })
+            return
         
         active_sessions[session_id] = {
             "websocket": websocket,
             "connected_at": asyncio.get_event_loop().time(),
-            "config": voice_config
+            "config": voice_config,
+            "config_version": config_store.version,
+            "preset": preset,
+            "flow": websocket.query_params.get("flow") or preset,
+            "custom_config": custom_config is not None,
+            "engine": engine,
+            "event_filter": EventFilter.from_query(websocket.query_params.get("events")),
+            "coalesce_ms": coalesce_ms,
+            "pacing": websocket.query_params.get("pacing", str(AUDIO_PACING)).lower() in ("1", "true"),
+            "usage": SessionUsage(session_id, engine, preset, voice_config.model_dump())
         }
         
-        # Proxy to OpenAI Real-Time API with configuration
-        await proxy_openai_realtime(websocket, session_id, voice_config)
+        monitor_hub.publish(session_id, "session.started", engine=engine, preset=preset,
+                            flow=active_sessions[session_id]["flow"])
+        
+        session_reaper.register(
+            session_id,
+            close=lambda reason: close_expired_session(session_id, reason),
+            warn=lambda seconds_left: warn_idle_session(session_id, seconds_left)
+        )
+
+        # Run the session on the selected engine
+        await ENGINE_RUNNERS[engine](websocket, session_id, voice_config)
         
     except WebSocketDisconnect:
         logger.info(f"🔌 WebSocket client disconnected - Session: {session_id}")
     except Exception as e:
         logger.exception(f"❗ Error in WebSocket for session {session_id}: {e}")
     finally:
+        session_reaper.unregister(session_id)
+        payment_executor.forget_session(session_id)
         if session_id in active_sessions:
-            del active_sessions[session_id]
+            usage = active_sessions.pop(session_id).get("usage")
+            if usage is not None:  # not yet recorded at shutdown
+                usage_store.record(usage)
+            monitor_hub.publish(session_id, "session.ended")
         logger.info(f"✅ Session closed: {session_id}")
 
 
+@app.websocket("/ws/monitor")
+async def monitor_endpoint(websocket: WebSocket):
+    """
+    Live supervisor feed: caller and assistant transcripts, tool calls and
+    results, errors and session start/end of every session, or of those in
+    ?sessions=id1,id2. Send {"type": "subscribe", "sessions": [...]} (null for
+    all) to change the selection. Requires the admin token as ?token= or the
+    X-Admin-Token header
+    """
+    token = websocket.query_params.get("token") or websocket.headers.get("x-admin-token")
+    if not ADMIN_TOKEN or not token or not hmac.compare_digest(token, ADMIN_TOKEN):
+        await websocket.close(code=1008)
+        return
+    subscriber = monitor_hub.subscribe(parse_sessions(websocket.query_params.get("sessions")))
+    if subscriber is None:
+        await websocket.close(code=1013)  # try again later
+        return
+    await websocket.accept()
+    logger.info(f"👀 Supervisor connected ({len(monitor_hub.subscribers)} watching)")
+
+    async def send_frames():
+        while True:
+            for frame in await subscriber.next_frames():
+                await websocket.send_text(frame)
+
+    now = asyncio.get_event_loop().time()
+    await websocket.send_json({
+        "type": "monitor.sessions",
+        "sessions": [
+            {"session_id": session_id, "engine": session.get("engine"), "preset": session.get("preset"),
+             "flow": session.get("flow"), "model": session.get("model"),
+             "age_s": round(now - session["connected_at"], 1)}
+            for session_id, session in active_sessions.items()
+        ]
+    })
+    sender = asyncio.create_task(send_frames())
+    try:
+        while True:
+            message = await websocket.receive_json()
+            if message.get("type") == "subscribe":
+                monitor_hub.watch(subscriber, parse_sessions(message.get("sessions")))
+    except WebSocketDisconnect:
+        pass
+    except Exception as e:
+        logger.debug(f"Supervisor feed ended: {e}")
+    finally:
+        sender.cancel()
+        monitor_hub.unsubscribe(subscriber)
+        logger.info(f"👀 Supervisor disconnected ({len(monitor_hub.subscribers)} watching)")
+
+
 @app.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -767,10 +1226,187 @@ async def health_check():
         "active_sessions": len(active_sessions),
         "services": {
             "openai": bool(openai_api_key),
-        }
+        },
+        "caches": {
+            "bills": bills_cache.snapshot(),
+            "payment_plans": plan_engine.stats
+        },
+        "session_reaper": session_reaper.snapshot(),
+        "model_routing": model_router.snapshot(),
+        "upstream": upstream_connector.snapshot(),
+        "rate_limits": rate_limiter.snapshot(),
+        "monitor": monitor_hub.snapshot(),
+        "receipts": receipt_dispatcher.snapshot(),
+        "voice_catalog": voice_catalog.snapshot(),
+        "event_loop": {
+            "watchdog": loop_watchdog.enabled,
+            "lag_p99_ms": loop_watchdog.histogram.percentile(99),
+            "lag_max_ms": round(loop_watchdog.histogram.max_ms, 1),
+            "stalls": loop_watchdog.stats["stalls"]
+        },
+        "ready": startup_timeline.ready
     })
 
 
+@app.get("/metrics")
+async def metrics():
+    """Upstream connector and circuit breaker metrics in Prometheus text format"""
+    return PlainTextResponse(upstream_connector.prometheus(), media_type="text/plain; version=0.0.4")
+
+
+@app.get("/ready")
+async def readiness_check():
+    """Readiness: 200 once deferred dependencies are loaded, 503 while warming up"""
+    return JSONResponse(
+        {**startup_timeline.snapshot(), "dependencies": {
+            dependency.name: dependency.load_ms for dependency in (openai_client,)
+        }},
+        status_code=200 if startup_timeline.ready else 503
+    )
+
+
+@app.get("/api/voices")
+async def list_voices():
+    """OpenAI Realtime voices and the cached Cartesia catalog (cascaded engine)"""
+    return Response(voice_catalog.listing(), media_type="application/json")
+
+
+@app.post("/api/chat/stream")
+async def chat_stream(request: ChatRequest):
+    """
+    Text-only chat streamed as Server-Sent Events
+    Uses the Chat Completions API instead of a Realtime session; tool calls
+    are executed on the backend
+    """
+    if not openai_api_key:
+        raise HTTPException(status_code=503, detail="OpenAI API key not configured")
+    client = await openai_client.aget()
+
+    conversation_id, history = chat_conversations.get_or_create(request.conversation_id)
+    logger.info(f"💬 Text chat turn for conversation {conversation_id}")
+
+    async def event_stream():
+        yield f"data: {json.dumps({'type': 'chat.started', 'conversation_id': conversation_id})}\n\n"
+        try:
+            # One turn at a time per conversation, so concurrent requests
+            # cannot interleave their messages in the shared history
+            async with chat_conversations.lock(conversation_id):
+                async for event in stream_chat_reply(
+                    client,
+                    OPENAI_CHAT_MODEL,
+                    get_system_instructions(),
+                    get_tools(),
+                    history,
+                    request.message,
+                    tool_executor=payment_executor.bind(f"chat:{conversation_id}")
+                ):
+                    yield f"data: {json.dumps(event)}\n\n"
+        except Exception as e:
+            logger.error(f"Error in text chat for conversation {conversation_id}: {e}")
+            yield f"data: {json.dumps({'type': 'error', 'error': {'message': str(e)}})}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/api/payment-plans/quote")
+async def quote_payment_plans(request: PlanQuoteRequest):
+    """Eligible payment plans with exact figures for each amount"""
+    if any(amount <= 0 for amount in request.amounts):
+        raise HTTPException(status_code=400, detail="Amounts must be positive")
+    quotes = plan_engine.quote(request.amounts)
+    return JSONResponse({
+        "catalog_version": plan_engine.catalog.version,
+        "quotes": [{"amount": amount, "plans": plans} for amount, plans in zip(request.amounts, quotes)]
+    })
+
+
+@app.get("/api/payment-plans/schedule")
+async def payment_plan_schedule(amount: float = Query(..., gt=0), plan_id: str = Query(...)):
+    """Month-by-month amortization schedule for one amount and plan"""
+    schedule = plan_engine.schedule(amount, plan_id)
+    if schedule is None:
+        raise HTTPException(status_code=404, detail=f"Plan {plan_id} is not available for ${amount}")
+    return JSONResponse({"amount": amount, "plan_id": plan_id, "schedule": schedule})
+
+
+@app.get("/api/usage", dependencies=[Depends(require_admin)])
+async def get_usage(group_by: str = "preset", since: float = 0):
+    """
+    Token usage, bandwidth, time to first audio and estimated cost of finished
+    sessions, aggregated per preset, engine or session config field
+    """
+    if group_by not in GROUP_COLUMNS and group_by not in VoiceSessionConfig.model_fields:
+        raise HTTPException(
+            status_code=400,
+            detail=f"group_by must be one of: {', '.join(dict.fromkeys([*GROUP_COLUMNS, *VoiceSessionConfig.model_fields]))}"
+        )
+    return JSONResponse({
+        "group_by": group_by,
+        "since": since,
+        "groups": await usage_store.aggregate(group_by, since),
+        "active_sessions": [session["usage"].snapshot() for session in active_sessions.values() if "usage" in session]
+    })
+
+
+@app.get("/api/usage/sessions/{session_id}", dependencies=[Depends(require_admin)])
+async def get_session_usage(session_id: str):
+    """Usage of a live session so far"""
+    session = active_sessions.get(session_id)
+    if session is None or "usage" not in session:
+        raise HTTPException(status_code=404, detail=f"No active session {session_id}")
+    return JSONResponse(session["usage"].snapshot())
+
+
+@app.get("/api/admin/loop-watchdog", dependencies=[Depends(require_admin)])
+async def get_loop_watchdog():
+    """Event-loop lag histogram and the most recent stalls with their stacks"""
+    return JSONResponse({**loop_watchdog.snapshot(), "recent_stalls": list(loop_watchdog.recent)})
+
+
+@app.post("/api/admin/loop-watchdog", dependencies=[Depends(require_admin)])
+async def set_loop_watchdog(
+    enabled: bool = True,
+    threshold_ms: Optional[float] = Query(None, ge=10),
+    probe_interval_ms: Optional[float] = Query(None, ge=5)
+):
+    """Turn the loop watchdog on or off, or change its threshold and probe interval"""
+    if enabled:
+        loop_watchdog.start(probe_interval_ms, threshold_ms)
+    else:
+        loop_watchdog.stop()
+    return JSONResponse(loop_watchdog.snapshot())
+
+
+profile_lock = asyncio.Lock()  # one profile per worker at a time
+
+
+@app.post("/api/admin/profile", dependencies=[Depends(require_admin)])
+async def profile_worker(
+    seconds: float = Query(10, gt=0, le=MAX_PROFILE_SECONDS),
+    interval_ms: float = Query(DEFAULT_INTERVAL_MS, ge=1, le=1000),
+    format: Literal["collapsed", "json"] = "collapsed",
+    include_idle: bool = False
+):
+    """
+    Sample this worker's event loop for a number of seconds
+    Returns collapsed stacks for flame graphs (format=collapsed) or per-task
+    and per-function totals (format=json). Only the worker that serves the
+    request is profiled
+    """
+    if profile_lock.locked():
+        raise HTTPException(status_code=409, detail="A profile is already running on this worker")
+    async with profile_lock:
+        logger.info(f"🔬 Profiling worker {os.getpid()} for {seconds} s every {interval_ms} ms")
+        profiler = await profile_for(seconds, interval_ms, include_idle)
+    if format == "json":
+        return JSONResponse({"pid": os.getpid(), **profiler.summary()})
+    return PlainTextResponse(profiler.collapsed(), headers={"X-Profile-Samples": str(profiler.samples)})
+
+
 @app.get("/")
 async def root():
     """Root endpoint"""
@@ -778,13 +1414,25 @@ async def root():
         "message": "Voice AI Pipeline Backend",
         "version": "2.0.0",
         "pipeline": "OpenAI Real-Time API (Proxied with Dynamic Config)",
+        "engines": list(VOICE_ENGINES),
         "endpoints": {
             "websocket": "/ws/voice",
+            "monitor": "/ws/monitor",
+            "chat_stream": "/api/chat/stream",
+            "voices": "/api/voices",
+            "payment_plans": {
+                "quote": "/api/payment-plans/quote",
+                "schedule": "/api/payment-plans/schedule"
+            },
+            "usage": "/api/usage",
             "health": "/health",
+            "ready": "/ready",
+            "metrics": "/metrics",
             "config": {
                 "get_default": "/api/config/default",
                 "update": "/api/config",
-                "get_current": "/api/config"
+                "get_current": "/api/config",
+                "presets": "/api/config/presets"
             }
         }
     })
@@ -802,38 +1450,114 @@ async def get_default_config():
 
 @app.get("/api/config")
 async def get_current_config():
-    """Get current global configuration"""
-    # Return the default config (you can extend this to support per-user configs)
-    default_config = VoiceSessionConfig()
+    """Get current runtime configuration (default config, version and presets)"""
     return JSONResponse({
-        "config": default_config.model_dump(),
+        **config_store.snapshot(),
         "active_sessions": len(active_sessions),
         "session_configs": len(session_configs)
     })
 
 
-@app.post("/api/config")
-async def update_config(config: VoiceSessionConfig):
+@app.post("/api/config", dependencies=[Depends(require_admin)])
+async def update_config(
+    config: VoiceSessionConfig,
+    live: bool = False,
+    session_id: Optional[List[str]] = Query(default=None),
+    expected_version: Optional[int] = None
+):
     """
-    Update configuration for future sessions
-    This sets the default configuration that will be used for new WebSocket connections
+    Update the default configuration for new sessions
+    Only the fields present in the body are changed. With live=true the changed
+    fields are also pushed to live sessions as session.update: the given
+    session_id(s), or every session on the default config
     """
     try:
-        # Validate the config (Pydantic does this automatically)
-        logger.info(f"📝 Updated config: temp={config.temperature}, voice={config.voice}")
-        
-        # Store as default for new sessions (you can extend this to be user-specific)
-        # For now, we'll just return success - in production, you'd store this in a database
-        
-        return JSONResponse({
-            "status": "success",
-            "message": "Configuration updated successfully",
-            "config": config.model_dump()
-        })
+        changed = config_store.update(config.model_dump(exclude_unset=True), expected_version=expected_version)
+    except ConfigVersionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
     except Exception as e:
         logger.error(f"Error updating config: {e}")
         raise HTTPException(status_code=400, detail=str(e))
 
+    pushed = None
+    if live and changed:
+        pushed = await push_config_to_sessions(config_store.default, select_live_sessions(session_id))
+
+    return JSONResponse({
+        "status": "success",
+        "message": "Configuration updated successfully" if changed else "Configuration unchanged",
+        "version": config_store.version,
+        "changed": changed,
+        "live_sessions": pushed,
+        "config": config_store.default.model_dump()
+    })
+
+
+@app.get("/api/config/presets")
+async def list_presets():
+    """List configuration presets"""
+    return JSONResponse({"version": config_store.version, "presets": config_store.snapshot()["presets"]})
+
+
+@app.post("/api/config/presets/{preset}", dependencies=[Depends(require_admin)])
+async def update_preset(
+    preset: str,
+    config: VoiceSessionConfig,
+    live: bool = False,
+    expected_version: Optional[int] = None
+):
+    """Update a preset; with live=true its changed fields are pushed to sessions using it"""
+    if preset not in config_store.presets:
+        raise HTTPException(status_code=404, detail=f"Unknown preset: {preset}")
+    try:
+        changed = config_store.update(config.model_dump(exclude_unset=True), preset=preset, expected_version=expected_version)
+    except ConfigVersionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    pushed = None
+    if live and changed:
+        pushed = await push_config_to_sessions(config_store.presets[preset], select_live_sessions(None, preset))
+
+    return JSONResponse({
+        "status": "success",
+        "preset": preset,
+        "version": config_store.version,
+        "changed": changed,
+        "live_sessions": pushed,
+        "config": config_store.presets[preset].model_dump()
+    })
+
+
+@app.post("/api/config/presets/{preset}/apply", dependencies=[Depends(require_admin)])
+async def apply_preset(
+    preset: str,
+    live: bool = False,
+    session_id: Optional[List[str]] = Query(default=None),
+    expected_version: Optional[int] = None
+):
+    """Make a preset the default configuration, optionally pushing it to live sessions"""
+    if preset not in config_store.presets:
+        raise HTTPException(status_code=404, detail=f"Unknown preset: {preset}")
+    try:
+        changed = config_store.apply_preset(preset, expected_version=expected_version)
+    except ConfigVersionConflict as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+    pushed = None
+    if live and changed:
+        pushed = await push_config_to_sessions(config_store.default, select_live_sessions(session_id))
+
+    return JSONResponse({
+        "status": "success",
+        "message": f"Preset '{preset}' applied: {config_store.preset_descriptions.get(preset, '')}",
+        "version": config_store.version,
+        "changed": changed,
+        "live_sessions": pushed,
+        "config": config_store.default.model_dump()
+    })
+
 
 @app.post("/api/config/session/{session_id}")
 async def set_session_config(session_id: str, config: VoiceSessionConfig):
@@ -856,6 +1580,9 @@ async def set_session_config(session_id: str, config: VoiceSessionConfig):
         raise HTTPException(status_code=400, detail=str(e))
 
 
+startup_timeline.mark("app_built")
+
+
 if __name__ == "__main__":
     host = os.getenv("SERVER_HOST", "0.0.0.0")
     port = int(os.getenv("SERVER_PORT", "8000"))
@@ -865,5 +1592,7 @@ if __name__ == "__main__":
         host=host,
         port=port,
         reload=True,
-        log_level="info"
+        log_level="info",
+        ws_ping_interval=KEEPALIVE_INTERVAL_S,
+        ws_ping_timeout=KEEPALIVE_TIMEOUT_S
     )
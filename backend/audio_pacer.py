@@ -0,0 +1,287 @@
+"""
+Real-time pacing of outbound audio
+The Realtime API sends response.audio.delta much faster than real time. The
+pacer collects the PCM16 audio in a preallocated ring buffer and re-emits it
+as fixed-size frames at playback rate plus a small lead, so the client only
+ever holds a few frames. On barge-in the buffered audio is dropped and the
+played position is reported so the upstream item can be truncated there
+
+Benchmark: python audio_pacer.py
+"""
+import asyncio
+import base64
+import json
+import logging
+import os
+import time
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 24000
+BYTES_PER_MS = SAMPLE_RATE * 2 // 1000  # PCM16 mono
+
+AUDIO_PACING = os.getenv("AUDIO_PACING", "true").lower() == "true"
+PACING_FRAME_MS = int(os.getenv("PACING_FRAME_MS", "100"))
+PACING_LEAD_MS = int(os.getenv("PACING_LEAD_MS", "300"))
+# Audio buffered per session before frames are released early to make room
+RING_BUFFER_MS = 30000
+
+
+class _Segment:
+    """Audio of one item inside the ring buffer, or a held response.audio.done"""
+
+    def __init__(self, response_id: Optional[str], item_id: Optional[str], done_message: Optional[str] = None):
+        self.response_id = response_id
+        self.item_id = item_id
+        self.size = 0
+        self.done_message = done_message
+
+
+class AudioPacer:
+    """Paces response.audio.delta for one client connection"""
+
+    def __init__(self, send: Callable[[str], Awaitable[None]], frame_ms: int = PACING_FRAME_MS,
+                 lead_ms: int = PACING_LEAD_MS, capacity_ms: int = RING_BUFFER_MS):
+        self.send = send
+        self.frame_ms = frame_ms
+        self.lead_ms = lead_ms
+        self.frame_bytes = frame_ms * BYTES_PER_MS
+        self._ring: Optional[bytearray] = None  # allocated with the first audio
+        self._capacity = capacity_ms * BYTES_PER_MS
+        self._read = 0
+        self._size = 0
+        self._segments: Deque[_Segment] = deque()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        # Playback clock of the current run of audio: the client starts playing
+        # the first frame on arrival and plays continuously from there
+        self._clock_start = 0.0
+        self._sent_ms = 0.0
+        self._current: Optional[_Segment] = None
+        # Where the current item starts on that clock and how much of it was sent,
+        # so a cut truncates the item at its own offset
+        self._item_start_ms = 0.0
+        self._item_sent_ms = 0.0
+        self.stats = {"frames": 0, "deltas_in": 0, "cuts": 0, "overflows": 0}
+
+    # ------------------------------------------------------------------------
+    # Ring buffer
+    # ------------------------------------------------------------------------
+
+    def _write(self, data: bytes) -> None:
+        if self._ring is None:
+            self._ring = bytearray(self._capacity)
+        start = (self._read + self._size) % self._capacity
+        first = min(len(data), self._capacity - start)
+        self._ring[start:start + first] = data[:first]
+        self._ring[:len(data) - first] = data[first:]
+        self._size += len(data)
+
+    def _take(self, size: int) -> bytes:
+        end = self._read + size
+        if end <= self._capacity:
+            chunk = bytes(self._ring[self._read:end])
+        else:
+            chunk = bytes(self._ring[self._read:]) + bytes(self._ring[:end - self._capacity])
+        self._read = end % self._capacity
+        self._size -= size
+        return chunk
+
+    # ------------------------------------------------------------------------
+    # Input
+    # ------------------------------------------------------------------------
+
+    async def push(self, message: str) -> None:
+        """Buffer a response.audio.delta event"""
+        data = json.loads(message)
+        audio = base64.b64decode(data.get("delta", ""))
+        self.stats["deltas_in"] += 1
+        if len(audio) > self._capacity:
+            audio = audio[-self._capacity:]
+        while self._size + len(audio) > self._capacity:
+            # Far ahead of playback: release the oldest frame now instead of blocking upstream
+            segment = self._segments[0]
+            if segment.done_message is not None or segment.size == 0:
+                self._segments.popleft()
+                if segment.done_message is not None:
+                    await self.send(segment.done_message)
+                continue
+            self.stats["overflows"] += 1
+            await self._emit_frame()
+
+        segment = self._segments[-1] if self._segments else None
+        if segment is None or segment.done_message is not None or segment.item_id != data.get("item_id"):
+            segment = _Segment(data.get("response_id"), data.get("item_id"))
+            self._segments.append(segment)
+        self._write(audio)
+        segment.size += len(audio)
+        self._start()
+
+    def finish(self, done_message: str) -> None:
+        """Hold response.audio.done until the audio before it has been released"""
+        self._segments.append(_Segment(None, None, done_message))
+        self._start()
+
+    def _start(self) -> None:
+        self._wakeup.set()
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    # ------------------------------------------------------------------------
+    # Output
+    # ------------------------------------------------------------------------
+
+    def _next_frame_ready(self) -> bool:
+        segment = self._segments[0]
+        # A short tail is only sent once its item is complete (something follows it)
+        return segment.size >= self.frame_bytes or (segment.size > 0 and len(self._segments) > 1)
+
+    async def _emit_frame(self) -> None:
+        segment = self._segments[0]
+        size = min(segment.size, self.frame_bytes)
+        frame = self._take(size)
+        segment.size -= size
+
+        now = time.monotonic()
+        if now > self._clock_start + self._sent_ms / 1000:
+            # Client ran dry (or this is the first frame): playback restarts now,
+            # with everything sent so far played
+            self._clock_start = now
+            self._item_start_ms -= self._sent_ms
+            self._sent_ms = 0.0
+        if self._current is None or segment.item_id != self._current.item_id:
+            self._item_start_ms = self._sent_ms
+            self._item_sent_ms = 0.0
+        self._current = segment
+        self._sent_ms += size / BYTES_PER_MS
+        self._item_sent_ms += size / BYTES_PER_MS
+        self.stats["frames"] += 1
+        await self.send(json.dumps({
+            "type": "response.audio.delta",
+            "response_id": segment.response_id,
+            "item_id": segment.item_id,
+            "delta": base64.b64encode(frame).decode("ascii")
+        }))
+
+    async def _run(self) -> None:
+        while True:
+            while self._segments and self._segments[0].done_message is None and self._segments[0].size == 0 \
+                    and len(self._segments) > 1:
+                self._segments.popleft()
+            if not self._segments:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            segment = self._segments[0]
+            if segment.done_message is not None:
+                self._segments.popleft()
+                await self.send(segment.done_message)
+                continue
+            if not self._next_frame_ready():
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            # Frame n may be sent once playback is within lead_ms of reaching it
+            due = self._clock_start + (self._sent_ms - self.lead_ms) / 1000
+            delay = due - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+                continue
+            await self._emit_frame()
+
+    # ------------------------------------------------------------------------
+    # Barge-in
+    # ------------------------------------------------------------------------
+
+    def state(self) -> Dict[str, Any]:
+        """Playback position and buffered audio of the current item"""
+        played_ms = max(0.0, min(self._sent_ms, (time.monotonic() - self._clock_start) * 1000))
+        item_played_ms = max(0.0, min(self._item_sent_ms, played_ms - self._item_start_ms))
+        current = self._current
+        return {
+            "active": self._size > 0 or played_ms < self._sent_ms,
+            "response_id": current.response_id if current else None,
+            "item_id": current.item_id if current else None,
+            "played_ms": int(item_played_ms),
+            "sent_ms": int(self._item_sent_ms),
+            "buffered_ms": self._size // BYTES_PER_MS
+        }
+
+    async def cut(self) -> Dict[str, Any]:
+        """
+        Drop all buffered audio (caller started speaking) and return the state
+        at the cut; held audio.done events are still delivered
+        """
+        state = self.state()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        done_messages = [segment.done_message for segment in self._segments if segment.done_message]
+        self._segments.clear()
+        self._read = self._size = 0
+        self._clock_start, self._sent_ms = 0.0, 0.0
+        self._item_start_ms, self._item_sent_ms = 0.0, 0.0
+        self._current = None
+        if state["active"]:
+            self.stats["cuts"] += 1
+        for message in done_messages:
+            await self.send(message)
+        return state
+
+    def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        self._segments.clear()
+        self._ring = None
+        if self.stats["deltas_in"]:
+            logger.info(f"🎚️ Audio pacing: {self.stats}")
+
+
+async def _benchmark() -> None:
+    """Client backlog for a 10 s reply arriving in 4 bursts, with and without pacing"""
+    reply_ms, burst_ms, bursts = 10000, 50, 4
+    audio = base64.b64encode(bytes(reply_ms // bursts // 20 * BYTES_PER_MS)).decode("ascii")
+
+    async def run(paced: bool) -> List[float]:
+        arrivals: List[tuple] = []
+
+        async def send(message: str) -> None:
+            event = json.loads(message)
+            if event["type"] == "response.audio.delta":
+                arrivals.append((time.monotonic(), len(base64.b64decode(event["delta"])) / BYTES_PER_MS))
+
+        pacer = AudioPacer(send)
+        started = time.monotonic()
+        for _ in range(bursts):
+            for _ in range(20):
+                delta = json.dumps({"type": "response.audio.delta", "response_id": "r", "item_id": "i", "delta": audio})
+                if paced:
+                    await pacer.push(delta)
+                else:
+                    await send(delta)
+            await asyncio.sleep(burst_ms / 1000)
+        if paced:
+            pacer.finish(json.dumps({"type": "response.audio.done"}))
+            while pacer._segments:
+                await asyncio.sleep(0.05)
+        pacer.close()
+
+        # Client-side backlog (unplayed ms) right after each arrival
+        played_until, peak = started, 0.0
+        for arrived, ms in arrivals:
+            played_until = max(played_until, arrived) + ms / 1000
+            peak = max(peak, (played_until - arrived) * 1000)
+        return [len(arrivals), peak, (arrivals[0][0] - started) * 1000]
+
+    for name, paced in (("unpaced", False), ("paced", True)):
+        frames, peak, first = await run(paced)
+        print(f"{name:<8} frames={frames:<4} peak client backlog={peak:7.0f} ms  first audio={first:5.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(_benchmark())
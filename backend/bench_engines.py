@@ -0,0 +1,112 @@
+"""
+Benchmark time-to-first-audio of the Realtime proxy vs the cascaded pipeline
+Runs fully offline: the Realtime engine talks to fake_realtime.py and the
+cascaded engine uses the stub STT/LLM/TTS services
+
+Usage: python bench_engines.py [turns]
+"""
+import asyncio
+import json
+import logging
+import statistics
+import sys
+import time
+from typing import List, Optional
+
+import app
+from cascaded_pipeline import CascadedPipeline, StubLLMService, StubSTTService, StubTTSService
+from fake_realtime import FakeRealtimeServer
+
+UTTERANCE_CHUNKS = 7  # matches the stub STT script and fake upstream VAD
+AUDIO_CHUNK = bytes(4800)
+
+
+class BenchClientWebSocket:
+    """In-memory stand-in for the browser's WebSocket"""
+
+    def __init__(self):
+        self.inbox: asyncio.Queue = asyncio.Queue()
+        self.speech_ended_at: Optional[float] = None
+        self.first_audio_at: Optional[float] = None
+        self.audio_done = asyncio.Event()
+        self.disconnected = False
+
+    async def receive(self):
+        # Same contract as Starlette: the disconnect message is returned once, then receive() raises
+        if self.disconnected:
+            raise RuntimeError('Cannot call "receive" once a disconnect message has been received.')
+        message = await self.inbox.get()
+        self.disconnected = message["type"] == "websocket.disconnect"
+        return message
+
+    async def speak(self) -> None:
+        self.first_audio_at = None
+        self.audio_done.clear()
+        for _ in range(UTTERANCE_CHUNKS):
+            await self.inbox.put({"type": "websocket.receive", "bytes": AUDIO_CHUNK})
+        self.speech_ended_at = time.perf_counter()
+
+    async def hang_up(self) -> None:
+        await self.inbox.put({"type": "websocket.disconnect"})
+
+    def _audio(self) -> None:
+        if self.first_audio_at is None:
+            self.first_audio_at = time.perf_counter()
+
+    async def send_bytes(self, data: bytes) -> None:
+        self._audio()
+
+    async def send_text(self, text: str) -> None:
+        await self.send_json(json.loads(text))
+
+    async def send_json(self, data) -> None:
+        if data.get("type") == "response.audio.delta":
+            self._audio()
+        elif data.get("type") == "response.audio.done":
+            self.audio_done.set()
+
+
+async def measure(runner, turns: int) -> List[float]:
+    client = BenchClientWebSocket()
+    session = asyncio.create_task(runner(client))
+    await asyncio.sleep(0.5)  # session setup is not part of time-to-first-audio
+    samples = []
+    for _ in range(turns):
+        await client.speak()
+        await asyncio.wait_for(client.audio_done.wait(), timeout=10)
+        samples.append((client.first_audio_at - client.speech_ended_at) * 1000)
+    await client.hang_up()
+    await asyncio.wait_for(session, timeout=5)
+    return samples
+
+
+def report(name: str, samples: List[float]) -> None:
+    ordered = sorted(samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f"{name:<10} turns={len(samples):<4} p50={statistics.median(ordered):7.1f} ms  p95={p95:7.1f} ms  max={ordered[-1]:7.1f} ms")
+
+
+async def main(turns: int) -> None:
+    upstream = FakeRealtimeServer(response_latency_ms=500, utterance_chunks=UTTERANCE_CHUNKS)
+    app.OPENAI_REALTIME_URL = await upstream.start()
+    app.openai_api_key = app.openai_api_key or "bench"
+
+    async def realtime(client):
+        await app.proxy_openai_realtime(client, "bench-realtime", app.VoiceSessionConfig())
+
+    async def cascaded(client):
+        pipeline = CascadedPipeline(
+            client, "bench-cascaded",
+            StubSTTService(), StubLLMService(first_token_ms=300), StubTTSService(first_chunk_ms=150)
+        )
+        await pipeline.run()
+
+    print(f"Time to first audio after end of speech ({turns} turns each)")
+    report("realtime", await measure(realtime, turns))
+    report("cascaded", await measure(cascaded, turns))
+    await upstream.stop()
+
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
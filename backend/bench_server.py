@@ -0,0 +1,146 @@
+"""
+Benchmark the production launcher (serve.py) against the plain uvicorn command
+Each launch command runs as a subprocess in front of fake_realtime.py; N
+concurrent WebSocket clients connect to /ws/voice over loopback, speak a
+few turns each, and time the first response audio after end of speech.
+Server CPU time (all worker processes) is read from /proc
+
+Usage: python bench_server.py [clients] [turns]
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from typing import Dict, List, Tuple
+
+import websockets
+
+from fake_realtime import FakeRealtimeServer
+
+UTTERANCE_CHUNKS = 7
+AUDIO_CHUNK = bytes(4800)
+
+LAUNCHERS: Dict[str, Tuple[List[str], Dict[str, str]]] = {
+    # The start command of Procfile / render.yaml before serve.py
+    "uvicorn": (
+        [sys.executable, "-m", "uvicorn", "app:app", "--host", "127.0.0.1", "--port", "{port}",
+         "--ws-ping-interval", "15", "--ws-ping-timeout", "10"],
+        {"UPSTREAM_WS_DEFLATE": "true"}
+    ),
+    "serve.py": (
+        [sys.executable, "serve.py"],
+        {"SERVER_HOST": "127.0.0.1", "PORT": "{port}"}
+    ),
+}
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def cpu_seconds(root_pid: int) -> float:
+    """utime + stime of a process and its live descendants"""
+    ticks = os.sysconf("SC_CLK_TCK")
+    stats: Dict[int, Tuple[int, float]] = {}
+    for entry in os.listdir("/proc"):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+        except OSError:
+            continue
+        stats[int(entry)] = (int(fields[1]), (int(fields[11]) + int(fields[12])) / ticks)
+    total, pids = 0.0, {root_pid}
+    while pids:
+        total += sum(stats[pid][1] for pid in pids if pid in stats)
+        pids = {pid for pid, (ppid, _) in stats.items() if ppid in pids}
+    return total
+
+
+async def wait_for_port(port: int, timeout: float = 20) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise RuntimeError(f"Server did not listen on port {port}")
+
+
+async def caller(url: str, turns: int) -> List[float]:
+    samples: List[float] = []
+    async with websockets.connect(url, max_size=None) as ws:
+        await asyncio.sleep(0.5)  # session setup is not part of time-to-first-audio
+        for _ in range(turns):
+            for _ in range(UTTERANCE_CHUNKS):
+                await ws.send(AUDIO_CHUNK)
+            speech_ended_at, first_audio_at = time.perf_counter(), None
+            while True:
+                message = await asyncio.wait_for(ws.recv(), timeout=10)
+                if isinstance(message, bytes):
+                    continue
+                event_type = json.loads(message).get("type")
+                if event_type == "response.audio.delta" and first_audio_at is None:
+                    first_audio_at = time.perf_counter()
+                elif event_type == "response.audio.done":
+                    break
+            samples.append((first_audio_at - speech_ended_at) * 1000)
+    return samples
+
+
+async def run(name: str, upstream_url: str, clients: int, turns: int) -> None:
+    command, extra_env = LAUNCHERS[name]
+    port = free_port()
+    env = {
+        **os.environ,
+        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "bench"),
+        "OPENAI_REALTIME_URL": upstream_url,
+        "LOG_LEVEL": "warning",
+        "LOOP_WATCHDOG": "false",
+        "RATE_LIMIT_EXEMPT_LOOPBACK": "true",  # every client connects from 127.0.0.1
+        **{key: value.format(port=port) for key, value in extra_env.items()}
+    }
+    process = subprocess.Popen(
+        [part.format(port=port) for part in command], env=env,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        await wait_for_port(port)
+        cpu_before, started = cpu_seconds(process.pid), time.perf_counter()
+        results = await asyncio.gather(*(caller(f"ws://127.0.0.1:{port}/ws/voice?pacing=false", turns)
+                                         for _ in range(clients)))
+        wall = time.perf_counter() - started
+        cpu = cpu_seconds(process.pid) - cpu_before
+    finally:
+        process.terminate()
+        # The fake upstream shares this loop, so wait without blocking it
+        await asyncio.get_running_loop().run_in_executor(None, process.wait, 30)
+
+    ordered = sorted(sample for samples in results for sample in samples)
+    p95 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+    print(f"{name:<9} p50={statistics.median(ordered):7.1f} ms  p95={p95:7.1f} ms  max={ordered[-1]:7.1f} ms  "
+          f"server CPU {cpu:5.2f} s ({100 * cpu / wall:4.1f}% of {wall:.1f} s)")
+
+
+async def main(clients: int, turns: int) -> None:
+    upstream = FakeRealtimeServer(response_latency_ms=200, utterance_chunks=UTTERANCE_CHUNKS, audio_chunks=40)
+    url = await upstream.start()
+    print(f"{clients} concurrent calls × {turns} turns, time to first audio after end of speech")
+    for name in LAUNCHERS:
+        await run(name, url, clients, turns)
+    await upstream.stop()
+
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 50, int(sys.argv[2]) if len(sys.argv) > 2 else 5))
@@ -0,0 +1,88 @@
+"""
+Per-account cache of get_bills results
+LRU with a TTL; entries are invalidated as soon as a payment or plan selection
+touches the account. Cached results carry their JSON encoding so tool
+outputs are sent without re-serializing them
+"""
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+BILLS_CACHE_TTL_S = float(os.getenv("BILLS_CACHE_TTL_S", "60"))
+MAX_CACHED_ACCOUNTS = 10000
+
+
+class SerializedResult(dict):
+    """Tool result that already knows its JSON encoding"""
+
+    def __init__(self, result: Dict[str, Any]):
+        super().__init__(result)
+        self.json = json.dumps(result)
+
+
+def serialize_result(result: Dict[str, Any]) -> str:
+    """JSON for a tool result, reusing the cached encoding when there is one"""
+    if isinstance(result, SerializedResult):
+        return result.json
+    return json.dumps(result)
+
+
+class BillsCache:
+    """account_id → SerializedResult, bounded by TTL and size"""
+
+    def __init__(self, ttl_s: float = BILLS_CACHE_TTL_S, max_accounts: int = MAX_CACHED_ACCOUNTS):
+        self.ttl_s = ttl_s
+        self.max_accounts = max_accounts
+        self._entries: "OrderedDict[str, Tuple[float, SerializedResult]]" = OrderedDict()
+        # Bumped on invalidation so a lookup that raced with a payment is not cached
+        self._generations: Dict[str, int] = {}
+        self.stats = {"hits": 0, "misses": 0, "invalidations": 0, "evictions": 0}
+
+    def generation(self, account_id: str) -> int:
+        return self._generations.get(account_id, 0)
+
+    def get(self, account_id: str) -> Optional[SerializedResult]:
+        entry = self._entries.get(account_id)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                del self._entries[account_id]
+            self.stats["misses"] += 1
+            return None
+        self._entries.move_to_end(account_id)
+        self.stats["hits"] += 1
+        return entry[1]
+
+    def put(self, account_id: str, result: Dict[str, Any], generation: int) -> SerializedResult:
+        serialized = SerializedResult(result)
+        if generation != self.generation(account_id):
+            return serialized
+        self._entries[account_id] = (time.monotonic() + self.ttl_s, serialized)
+        self._entries.move_to_end(account_id)
+        while len(self._entries) > self.max_accounts:
+            self._entries.popitem(last=False)
+            self.stats["evictions"] += 1
+        return serialized
+
+    def invalidate(self, account_id: Optional[str]) -> None:
+        if not account_id:
+            return
+        self._generations[account_id] = self.generation(account_id) + 1
+        if self._entries.pop(account_id, None) is not None:
+            self.stats["invalidations"] += 1
+            logger.info(f"🧹 Bills cache invalidated for account {account_id}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        lookups = self.stats["hits"] + self.stats["misses"]
+        return {
+            **self.stats,
+            "entries": len(self._entries),
+            "hit_rate": round(self.stats["hits"] / lookups, 3) if lookups else None
+        }
+
+
+bills_cache = BillsCache()
@@ -0,0 +1,567 @@
+"""
+Cascaded STT → LLM → TTS voice engine
+Alternative to the OpenAI Realtime proxy: Speechmatics STT, OpenAI chat LLM
+and Cartesia TTS, streamed end to end:
+- partial transcripts start a speculative LLM run before the turn ends
+- LLM output is cut into sentences so TTS starts before the LLM finishes
+- caller speech cancels the in-flight response (barge-in)
+Stub services make the pipeline runnable offline
+"""
+import asyncio
+import base64
+import json
+import logging
+import os
+import re
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+import websockets
+from fastapi import WebSocketDisconnect
+
+from monitor_hub import monitor_hub
+from text_chat import stream_chat_reply
+from tools import execute_tool
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 24000  # PCM16 mono, same format as the Realtime proxy
+BYTES_PER_MS = SAMPLE_RATE * 2 // 1000
+
+# A partial transcript must be unchanged this long before we speculate on it
+SPECULATION_STABLE_MS = 250
+# Shortest text sent to TTS on its own; shorter sentences are merged forward
+MIN_TTS_CHUNK_CHARS = 12
+
+SENTENCE_BOUNDARY = re.compile(r"(?<=[.!?;:])\s+|\n+")
+
+
+def split_sentences(buffer: str) -> Tuple[List[str], str]:
+    """Split complete sentences off the front of buffer, return (sentences, rest)"""
+    parts = SENTENCE_BOUNDARY.split(buffer)
+    rest = parts.pop()
+    sentences: List[str] = []
+    pending = ""
+    for part in parts:
+        pending = f"{pending} {part}".strip() if pending else part.strip()
+        if len(pending) >= MIN_TTS_CHUNK_CHARS:
+            sentences.append(pending)
+            pending = ""
+    if pending:
+        rest = f"{pending} {rest}" if rest else pending
+    return sentences, rest
+
+
+def normalize_utterance(text: str) -> str:
+    return " ".join(re.sub(r"[^\w\s]", "", text.lower()).split())
+
+
+# ============================================================================
+# SERVICE INTERFACES
+# ============================================================================
+
+class STTService:
+    """Streaming speech-to-text; yields speech_started / partial / final events"""
+
+    async def start(self) -> None:
+        pass
+
+    async def send_audio(self, chunk: bytes) -> None:
+        raise NotImplementedError
+
+    def events(self) -> AsyncIterator[Dict[str, Any]]:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+class LLMService:
+    """Streaming LLM turn; yields text_chat events (response.text.delta, function_call, response.text.done)"""
+
+    def respond(
+        self,
+        history: List[Dict[str, Any]],
+        user_text: str,
+        tool_executor: Callable = execute_tool
+    ) -> AsyncIterator[Dict[str, Any]]:
+        raise NotImplementedError
+
+
+class TTSService:
+    """Streaming text-to-speech; yields raw PCM16 chunks for one piece of text"""
+
+    def synthesize(self, text: str) -> AsyncIterator[bytes]:
+        raise NotImplementedError
+
+    async def close(self) -> None:
+        pass
+
+
+# ============================================================================
+# PRODUCTION SERVICES
+# ============================================================================
+
+class SpeechmaticsSTTService(STTService):
+    """Speechmatics real-time API over WebSocket"""
+
+    def __init__(self, api_key: str, url: str = "wss://eu2.rt.speechmatics.com/v2", language: str = "en"):
+        self.api_key = api_key
+        self.url = url
+        self.language = language
+        self.ws = None
+        self.seq_no = 0
+
+    async def start(self) -> None:
+        self.ws = await websockets.connect(
+            self.url,
+            extra_headers={"Authorization": f"Bearer {self.api_key}"},
+            open_timeout=10
+        )
+        await self.ws.send(json.dumps({
+            "message": "StartRecognition",
+            "audio_format": {"type": "raw", "encoding": "pcm_s16le", "sample_rate": SAMPLE_RATE},
+            "transcription_config": {
+                "language": self.language,
+                "enable_partials": True,
+                "max_delay": 1.0,
+                "conversation_config": {"end_of_utterance_silence_trigger": 0.5}
+            }
+        }))
+        while True:
+            message = json.loads(await asyncio.wait_for(self.ws.recv(), timeout=10.0))
+            if message.get("message") == "RecognitionStarted":
+                logger.info("✅ Speechmatics recognition started")
+                return
+            if message.get("message") == "Error":
+                raise Exception(f"Speechmatics error: {message.get('reason')}")
+
+    async def send_audio(self, chunk: bytes) -> None:
+        self.seq_no += 1
+        await self.ws.send(chunk)
+
+    async def events(self) -> AsyncIterator[Dict[str, Any]]:
+        utterance = ""
+        in_speech = False
+        async for raw in self.ws:
+            message = json.loads(raw)
+            kind = message.get("message")
+            transcript = message.get("metadata", {}).get("transcript", "")
+            if kind == "AddPartialTranscript" and transcript.strip():
+                if not in_speech:
+                    in_speech = True
+                    yield {"type": "speech_started"}
+                yield {"type": "partial", "text": f"{utterance}{transcript}".strip()}
+            elif kind == "AddTranscript" and transcript:
+                utterance += transcript
+            elif kind == "EndOfUtterance":
+                if utterance.strip():
+                    yield {"type": "final", "text": utterance.strip()}
+                utterance = ""
+                in_speech = False
+            elif kind == "Error":
+                logger.error(f"Speechmatics error: {message.get('reason')}")
+                return
+
+    async def close(self) -> None:
+        if self.ws is not None:
+            try:
+                await self.ws.send(json.dumps({"message": "EndOfStream", "last_seq_no": self.seq_no}))
+                await self.ws.close()
+            except Exception:
+                pass
+
+
+class OpenAILLMService(LLMService):
+    """Chat Completions LLM, shared with the text chat endpoint"""
+
+    def __init__(self, client, model: str, instructions: str, tools: List[Dict[str, Any]]):
+        self.client = client
+        self.model = model
+        self.instructions = instructions
+        self.tools = tools
+
+    def respond(self, history, user_text, tool_executor=execute_tool):
+        return stream_chat_reply(
+            self.client, self.model, self.instructions, self.tools, history, user_text,
+            tool_executor=tool_executor
+        )
+
+
+class CartesiaTTSService(TTSService):
+    """Cartesia streaming TTS over pooled HTTP connections"""
+
+    def __init__(self, api_key: str, voice_id: str, model_id: str = "sonic-english"):
+        self.api_key = api_key
+        self.voice_id = voice_id
+        self.model_id = model_id
+        self._session = None
+
+    async def _get_session(self):
+        if self._session is None or self._session.closed:
+            import aiohttp
+            self._session = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=0, keepalive_timeout=60),
+                headers={"X-API-Key": self.api_key, "Cartesia-Version": "2024-06-10"}
+            )
+        return self._session
+
+    async def synthesize(self, text: str) -> AsyncIterator[bytes]:
+        session = await self._get_session()
+        payload = {
+            "model_id": self.model_id,
+            "transcript": text,
+            "voice": {"mode": "id", "id": self.voice_id},
+            "output_format": {"container": "raw", "encoding": "pcm_s16le", "sample_rate": SAMPLE_RATE}
+        }
+        async with session.post("https://api.cartesia.ai/tts/bytes", json=payload) as response:
+            response.raise_for_status()
+            async for chunk in response.content.iter_chunked(4800):
+                yield chunk
+
+    async def close(self) -> None:
+        if self._session is not None:
+            await self._session.close()
+
+
+# ============================================================================
+# STUB SERVICES (offline testing and benchmarks)
+# ============================================================================
+
+class StubSTTService(STTService):
+    """Reveals one word of a scripted utterance per audio chunk, then finalizes"""
+
+    def __init__(self, script: str = "I would like to view my bills", final_delay_ms: int = 0):
+        self.words = script.split()
+        self.final_delay_ms = final_delay_ms
+        self.position = 0
+        self._events: asyncio.Queue = asyncio.Queue()
+
+    async def send_audio(self, chunk: bytes) -> None:
+        if self.position == 0:
+            await self._events.put({"type": "speech_started"})
+        self.position += 1
+        await self._events.put({"type": "partial", "text": " ".join(self.words[:self.position])})
+        if self.position == len(self.words):
+            self.position = 0
+            if self.final_delay_ms:
+                await asyncio.sleep(self.final_delay_ms / 1000)
+            await self._events.put({"type": "final", "text": " ".join(self.words)})
+
+    async def events(self) -> AsyncIterator[Dict[str, Any]]:
+        while True:
+            event = await self._events.get()
+            if event is None:
+                return
+            yield event
+
+    async def close(self) -> None:
+        await self._events.put(None)
+
+
+class StubLLMService(LLMService):
+    """Streams a canned reply word by word"""
+
+    def __init__(self, reply: str = "I can see your bills are displayed. What would you like to do next?",
+                 first_token_ms: int = 300, token_ms: int = 20):
+        self.reply = reply
+        self.first_token_ms = first_token_ms
+        self.token_ms = token_ms
+
+    async def respond(self, history, user_text, tool_executor=execute_tool):
+        history.append({"role": "user", "content": user_text})
+        await asyncio.sleep(self.first_token_ms / 1000)
+        words = self.reply.split(" ")
+        for index, word in enumerate(words):
+            if index:
+                await asyncio.sleep(self.token_ms / 1000)
+            yield {"type": "response.text.delta", "delta": word if index == 0 else f" {word}"}
+        history.append({"role": "assistant", "content": self.reply})
+        yield {"type": "response.text.done", "text": self.reply}
+
+
+class StubTTSService(TTSService):
+    """Emits silent PCM16 audio, roughly 60 ms per character"""
+
+    def __init__(self, first_chunk_ms: int = 150, chunk_ms: int = 100):
+        self.first_chunk_ms = first_chunk_ms
+        self.chunk_ms = chunk_ms
+
+    async def synthesize(self, text: str) -> AsyncIterator[bytes]:
+        await asyncio.sleep(self.first_chunk_ms / 1000)
+        total_ms = max(len(text) * 60, self.chunk_ms)
+        for _ in range(0, total_ms, self.chunk_ms):
+            yield bytes(self.chunk_ms * BYTES_PER_MS)
+            await asyncio.sleep(0)
+
+
+def create_cascaded_services(openai_client, model: str, instructions: str, tools: List[Dict[str, Any]],
+                             voice_id: Optional[str] = None):
+    """Build (stt, llm, tts) from the environment; CASCADED_USE_STUBS=true selects the offline stubs"""
+    if os.getenv("CASCADED_USE_STUBS", "false").lower() == "true":
+        return StubSTTService(), StubLLMService(), StubTTSService()
+
+    speechmatics_key = os.getenv("SPEECHMATICS_API_KEY")
+    cartesia_key = os.getenv("CARTESIA_API_KEY")
+    voice_id = voice_id or os.getenv("CARTESIA_VOICE_ID")
+    if not all([speechmatics_key, cartesia_key, voice_id, openai_client]):
+        raise Exception("Cascaded pipeline requires SPEECHMATICS_API_KEY, CARTESIA_API_KEY, CARTESIA_VOICE_ID and OPENAI_API_KEY")
+
+    return (
+        SpeechmaticsSTTService(speechmatics_key, os.getenv("SPEECHMATICS_URL", "wss://eu2.rt.speechmatics.com/v2")),
+        OpenAILLMService(openai_client, model, instructions, tools),
+        CartesiaTTSService(cartesia_key, voice_id)
+    )
+
+
+# ============================================================================
+# PIPELINE
+# ============================================================================
+
+class _Speculation:
+    """An LLM run started from a stable partial transcript, buffered until committed"""
+
+    def __init__(self, text: str, history: List[Dict[str, Any]], tool_executor: Callable = execute_tool):
+        self.text = text
+        self.key = normalize_utterance(text)
+        self.history = history
+        self.events: asyncio.Queue = asyncio.Queue()
+        self.committed = asyncio.Event()
+        self.task: Optional[asyncio.Task] = None
+        self.tool_executor = tool_executor
+
+    async def gated_tool_executor(self, name: str, arguments: str) -> Dict[str, Any]:
+        # Tools may have side effects, so they only run once the turn is confirmed
+        await self.committed.wait()
+        return await self.tool_executor(name, arguments)
+
+
+class CascadedPipeline:
+    """Runs one client session through STT → LLM → TTS"""
+
+    def __init__(self, client_ws, session_id: str, stt: STTService, llm: LLMService, tts: TTSService,
+                 tool_executor: Callable = execute_tool, on_activity: Optional[Callable[[], None]] = None):
+        self.client_ws = client_ws
+        self.session_id = session_id
+        self.tool_executor = tool_executor
+        # Called on caller speech and text input (idle tracking)
+        self.on_activity = on_activity
+        self.stt = stt
+        self.llm = llm
+        self.tts = tts
+        self.history: List[Dict[str, Any]] = []
+        self.speculation: Optional[_Speculation] = None
+        self.speculation_timer: Optional[asyncio.Task] = None
+        self.response_task: Optional[asyncio.Task] = None
+        self.spoken_text = ""
+        self.turn_ended_at: Optional[float] = None
+        self.metrics: Dict[str, Any] = {"turns": 0, "barge_ins": 0, "speculation_hits": 0, "time_to_first_audio_ms": []}
+
+    async def run(self) -> None:
+        await self.stt.start()
+        await self.client_ws.send_json({
+            "type": "message",
+            "text": "Voice mode activated. I can hear you now!",
+            "sender": "bot"
+        })
+        transcripts = asyncio.create_task(self._transcript_loop())
+        try:
+            await self._receive_loop()
+        finally:
+            transcripts.cancel()
+            await self._cancel_response()
+            self._discard_speculation()
+            await self.stt.close()
+            await self.tts.close()
+
+    # ---- client input -----------------------------------------------------
+
+    async def _receive_loop(self) -> None:
+        while True:
+            try:
+                data = await self.client_ws.receive()
+            except (WebSocketDisconnect, RuntimeError):
+                logger.info(f"Client disconnected from cascaded pipeline - Session: {self.session_id}")
+                return
+            if data.get("type") == "websocket.disconnect":
+                return
+
+            if data.get("bytes"):
+                await self.stt.send_audio(data["bytes"])
+            elif data.get("text"):
+                await self._handle_client_event(data["text"])
+
+    async def _handle_client_event(self, text: str) -> None:
+        try:
+            event = json.loads(text)
+        except json.JSONDecodeError:
+            event = None
+
+        event_type = event.get("type") if isinstance(event, dict) else None
+        if self.on_activity is not None and event_type != "input_audio_buffer.append":
+            self.on_activity()
+        if event is None:
+            await self._start_turn(text)
+        elif event_type == "input_audio_buffer.append":
+            await self.stt.send_audio(base64.b64decode(event.get("audio", "")))
+        elif event_type == "conversation.item.create":
+            item = event.get("item", {})
+            # Tool outputs are produced by the backend here, so the frontend's copy is ignored
+            if item.get("type") == "message":
+                texts = [c.get("text", "") for c in item.get("content", []) if c.get("type") == "input_text"]
+                if any(texts):
+                    await self._start_turn(" ".join(texts))
+        elif event_type == "response.cancel":
+            await self._barge_in()
+
+    # ---- transcripts ------------------------------------------------------
+
+    async def _transcript_loop(self) -> None:
+        async for event in self.stt.events():
+            if self.on_activity is not None and event["type"] in ("speech_started", "final"):
+                self.on_activity()
+            if event["type"] == "speech_started":
+                if self.response_task and not self.response_task.done():
+                    await self._barge_in()
+            elif event["type"] == "partial":
+                self._schedule_speculation(event["text"])
+            elif event["type"] == "final":
+                await self._start_turn(event["text"])
+
+    def _schedule_speculation(self, text: str) -> None:
+        if self.speculation and self.speculation.key == normalize_utterance(text):
+            return
+        if self.speculation_timer:
+            self.speculation_timer.cancel()
+        self.speculation_timer = asyncio.create_task(self._speculate_when_stable(text))
+
+    async def _speculate_when_stable(self, text: str) -> None:
+        await asyncio.sleep(SPECULATION_STABLE_MS / 1000)
+        self._discard_speculation()
+        speculation = _Speculation(text, list(self.history), self.tool_executor)
+        speculation.task = asyncio.create_task(self._produce(speculation))
+        self.speculation = speculation
+        logger.debug(f"Speculative LLM run started for: {text!r}")
+
+    def _discard_speculation(self) -> None:
+        if self.speculation_timer:
+            self.speculation_timer.cancel()
+            self.speculation_timer = None
+        if self.speculation:
+            if self.speculation.task:
+                self.speculation.task.cancel()
+            self.speculation = None
+
+    async def _produce(self, speculation: _Speculation) -> None:
+        try:
+            async for event in self.llm.respond(speculation.history, speculation.text, speculation.gated_tool_executor):
+                await speculation.events.put(event)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            logger.error(f"LLM error in cascaded pipeline: {e}")
+            await speculation.events.put({"type": "error", "error": {"message": str(e)}})
+        await speculation.events.put(None)
+
+    # ---- responses --------------------------------------------------------
+
+    async def _start_turn(self, text: str) -> None:
+        self.turn_ended_at = time.perf_counter()
+        self.metrics["turns"] += 1
+        await self._cancel_response()
+        await self.client_ws.send_json({
+            "type": "conversation.item.input_audio_transcription.completed",
+            "transcript": text
+        })
+        monitor_hub.publish(self.session_id, "transcript.caller", item_id=None, text=text)
+
+        speculation = self.speculation
+        if self.speculation_timer:
+            self.speculation_timer.cancel()
+            self.speculation_timer = None
+        if speculation and speculation.key == normalize_utterance(text):
+            self.metrics["speculation_hits"] += 1
+        else:
+            self._discard_speculation()
+            speculation = _Speculation(text, list(self.history), self.tool_executor)
+            speculation.task = asyncio.create_task(self._produce(speculation))
+        self.speculation = None
+
+        speculation.committed.set()
+        self.response_task = asyncio.create_task(self._speak(speculation))
+
+    async def _speak(self, speculation: _Speculation) -> None:
+        sentences: asyncio.Queue = asyncio.Queue()
+        tts_task = asyncio.create_task(self._tts_loop(sentences))
+        buffer = ""
+        self.spoken_text = ""
+        try:
+            while True:
+                event = await speculation.events.get()
+                if event is None:
+                    break
+                if event["type"] == "response.text.delta":
+                    await self.client_ws.send_json({"type": "response.audio_transcript.delta", "delta": event["delta"]})
+                    buffer += event["delta"]
+                    ready, buffer = split_sentences(buffer)
+                    for sentence in ready:
+                        await sentences.put(sentence)
+                elif event["type"] == "function_call":
+                    # Already executed in the backend; the frontend only applies UI side effects
+                    duplicate = bool(event.get("result", {}).get("duplicate"))
+                    await self.client_ws.send_json({**event, "handled": True, "duplicate": duplicate})
+                    if monitor_hub.watching(self.session_id):
+                        monitor_hub.publish(self.session_id, "tool.call", name=event.get("name"),
+                                            call_id=event.get("call_id"), arguments=event.get("arguments"))
+                        monitor_hub.publish_tool_result(self.session_id, event.get("name"), event.get("call_id"),
+                                                        event.get("result", {}), duplicate)
+                elif event["type"] == "error":
+                    await self.client_ws.send_json(event)
+            if buffer.strip():
+                await sentences.put(buffer.strip())
+            await sentences.put(None)
+            await tts_task
+            self.history[:] = speculation.history
+            await self.client_ws.send_json({"type": "response.audio_transcript.done", "transcript": self.spoken_text.strip()})
+            monitor_hub.publish(self.session_id, "transcript.assistant", item_id=None, text=self.spoken_text.strip())
+            await self.client_ws.send_json({"type": "response.audio.done"})
+        except asyncio.CancelledError:
+            tts_task.cancel()
+            if speculation.task:
+                speculation.task.cancel()
+            # Keep what the caller actually heard so the conversation stays coherent
+            self.history.append({"role": "user", "content": speculation.text})
+            if self.spoken_text.strip():
+                self.history.append({"role": "assistant", "content": f"{self.spoken_text.strip()}..."})
+            raise
+
+    async def _tts_loop(self, sentences: asyncio.Queue) -> None:
+        first_audio = True
+        while True:
+            sentence = await sentences.get()
+            if sentence is None:
+                return
+            async for chunk in self.tts.synthesize(sentence):
+                if first_audio and self.turn_ended_at is not None:
+                    first_audio = False
+                    latency_ms = (time.perf_counter() - self.turn_ended_at) * 1000
+                    self.metrics["time_to_first_audio_ms"].append(latency_ms)
+                    logger.info(f"🔊 First audio after {latency_ms:.0f} ms - Session: {self.session_id}")
+                await self.client_ws.send_bytes(chunk)
+            self.spoken_text += f" {sentence}"
+
+    async def _cancel_response(self) -> None:
+        task = self.response_task
+        self.response_task = None
+        if task and not task.done():
+            task.cancel()
+            try:
+                await task
+            except (asyncio.CancelledError, Exception):
+                pass
+
+    async def _barge_in(self) -> None:
+        self.metrics["barge_ins"] += 1
+        logger.info(f"✋ Barge-in - cancelling response for session {self.session_id}")
+        await self._cancel_response()
+        await self.client_ws.send_json({"type": "input_audio_buffer.speech_started"})
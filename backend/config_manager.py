@@ -2,37 +2,100 @@
 """
 Configuration Manager for Voice AI Backend
 Easily update temperature and other settings without touching the UI
+
+Works against one node or a whole fleet: commands run concurrently on every
+node over pooled connections and results/errors are reported per node
 """
-import requests
+import asyncio
 import json
+import os
+import statistics
 import sys
+import time
+from typing import Any, Dict, List, Optional
+
+import aiohttp
 
 BACKEND_URL = "http://localhost:8000"
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=10)
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN")  # sent as X-Admin-Token for config changes
+
+
+def get_nodes(options: Dict[str, Any]) -> List[str]:
+    """Nodes from --nodes, then BACKEND_NODES, then BACKEND_URL"""
+    nodes = options.get("nodes") or os.getenv("BACKEND_NODES") or os.getenv("BACKEND_URL", BACKEND_URL)
+    return [node.strip().rstrip("/") for node in nodes.split(",") if node.strip()]
+
+
+def create_session() -> aiohttp.ClientSession:
+    """One pooled, keep-alive session shared by all requests of a command"""
+    return aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=100, limit_per_host=20, keepalive_timeout=30),
+        timeout=REQUEST_TIMEOUT
+    )
+
+
+async def request_node(session: aiohttp.ClientSession, node: str, method: str, path: str,
+                       payload: Optional[Dict] = None) -> Dict[str, Any]:
+    """Call one node and capture either its JSON body or the error"""
+    started = time.perf_counter()
+    try:
+        headers = {"X-Admin-Token": ADMIN_TOKEN} if ADMIN_TOKEN else None
+        async with session.request(method, f"{node}{path}", json=payload, headers=headers) as response:
+            body = await response.text()
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            try:
+                data = json.loads(body)
+            except json.JSONDecodeError:
+                data = body
+            if response.status != 200:
+                return {"node": node, "ok": False, "error": f"{response.status} - {body}", "ms": elapsed_ms}
+            return {"node": node, "ok": True, "data": data, "ms": elapsed_ms}
+    except aiohttp.ClientConnectionError:
+        return {"node": node, "ok": False, "error": "Cannot connect to backend. Is it running?", "ms": None}
+    except asyncio.TimeoutError:
+        return {"node": node, "ok": False, "error": "Timed out", "ms": None}
+    except Exception as e:
+        return {"node": node, "ok": False, "error": str(e), "ms": None}
 
-def get_default_config():
+
+async def run_on_nodes(nodes: List[str], method: str, path: str, payload: Optional[Dict] = None) -> List[Dict[str, Any]]:
+    async with create_session() as session:
+        return await asyncio.gather(*(request_node(session, node, method, path, payload) for node in nodes))
+
+
+def print_results(title: str, results: List[Dict[str, Any]], select=None) -> bool:
+    """Print per-node results and a fleet summary; returns True if every node succeeded"""
+    ok = [r for r in results if r["ok"]]
+    for result in results:
+        if result["ok"]:
+            print(f"✅ {result['node']} ({result['ms']:.0f} ms) - {title}")
+            data = select(result["data"]) if select else result["data"]
+            print(json.dumps(data, indent=2))
+        else:
+            print(f"❌ {result['node']} - {result['error']}")
+    if len(results) > 1:
+        print(f"\n📊 {len(ok)}/{len(results)} nodes succeeded")
+    return len(ok) == len(results)
+
+
+def get_default_config(nodes: List[str]) -> bool:
     """Get default configuration"""
-    response = requests.get(f"{BACKEND_URL}/api/config/default")
-    if response.status_code == 200:
-        data = response.json()
-        print("✅ Default Configuration:")
-        print(json.dumps(data["config"], indent=2))
-    else:
-        print(f"❌ Error: {response.status_code}")
+    results = asyncio.run(run_on_nodes(nodes, "GET", "/api/config/default"))
+    return print_results("Default Configuration:", results, lambda data: data["config"])
 
-def get_current_config():
+
+def get_current_config(nodes: List[str]) -> bool:
     """Get current configuration"""
-    response = requests.get(f"{BACKEND_URL}/api/config")
-    if response.status_code == 200:
-        data = response.json()
-        print("✅ Current Configuration:")
-        print(json.dumps(data, indent=2))
-    else:
-        print(f"❌ Error: {response.status_code}")
+    results = asyncio.run(run_on_nodes(nodes, "GET", "/api/config"))
+    return print_results("Current Configuration:", results)
 
-def update_config(temperature=None, voice=None, vad_threshold=None, max_tokens=None):
+
+def update_config(nodes: List[str], temperature=None, voice=None, vad_threshold=None, max_tokens=None,
+                  silence_ms=None, live=False) -> bool:
     """Update configuration"""
     config = {}
-    
+
     if temperature is not None:
         config["temperature"] = float(temperature)
     if voice is not None:
@@ -41,76 +104,130 @@ def update_config(temperature=None, voice=None, vad_threshold=None, max_tokens=N
         config["vad_threshold"] = float(vad_threshold)
     if max_tokens is not None:
         config["max_response_output_tokens"] = int(max_tokens)
-    
+    if silence_ms is not None:
+        config["vad_silence_duration_ms"] = int(silence_ms)
+
     if not config:
         print("❌ No configuration provided")
-        return
-    
-    response = requests.post(f"{BACKEND_URL}/api/config", json=config)
-    if response.status_code == 200:
-        data = response.json()
-        print("✅ Configuration Updated:")
-        print(json.dumps(data["config"], indent=2))
-    else:
-        print(f"❌ Error: {response.status_code} - {response.text}")
-
-def set_preset(preset_name):
-    """Set a configuration preset"""
-    presets = {
-        "payment": {
-            "temperature": 0.5,
-            "vad_threshold": 0.5,
-            "vad_silence_duration_ms": 1500,
-            "description": "Precise and focused for payment processing"
-        },
-        "conversation": {
-            "temperature": 0.7,
-            "vad_threshold": 0.4,
-            "vad_silence_duration_ms": 1800,
-            "description": "Balanced for general conversation"
-        },
-        "creative": {
-            "temperature": 0.9,
-            "vad_threshold": 0.3,
-            "vad_silence_duration_ms": 2000,
-            "description": "Creative and engaging"
-        },
-        "default": {
-            "temperature": 0.8,
-            "vad_threshold": 0.3,
-            "vad_silence_duration_ms": 2000,
-            "description": "Default settings"
-        }
-    }
-    
-    if preset_name not in presets:
-        print(f"❌ Unknown preset: {preset_name}")
-        print(f"Available presets: {', '.join(presets.keys())}")
-        return
-    
-    preset = presets[preset_name]
-    description = preset.pop("description")
-    
-    response = requests.post(f"{BACKEND_URL}/api/config", json=preset)
-    if response.status_code == 200:
-        print(f"✅ Preset '{preset_name}' applied: {description}")
-        print(json.dumps(preset, indent=2))
-    else:
-        print(f"❌ Error: {response.status_code} - {response.text}")
+        return False
+
+    path = "/api/config?live=true" if live else "/api/config"
+    results = asyncio.run(run_on_nodes(nodes, "POST", path, config))
+    return print_results(
+        "Configuration Updated:", results,
+        lambda data: {k: data.get(k) for k in ("version", "changed", "live_sessions", "config")}
+    )
 
-def check_health():
+
+def set_preset(nodes: List[str], preset_name: str, live=False) -> bool:
+    """Make a server-side preset the default configuration"""
+    path = f"/api/config/presets/{preset_name}/apply" + ("?live=true" if live else "")
+    results = asyncio.run(run_on_nodes(nodes, "POST", path))
+    return print_results(
+        f"Preset '{preset_name}' applied:", results,
+        lambda data: {k: data.get(k) for k in ("message", "version", "changed", "live_sessions")}
+    )
+
+
+def check_health(nodes: List[str]) -> bool:
     """Check backend health"""
-    try:
-        response = requests.get(f"{BACKEND_URL}/health")
-        if response.status_code == 200:
-            data = response.json()
-            print("✅ Backend is healthy")
-            print(json.dumps(data, indent=2))
-        else:
-            print(f"❌ Backend unhealthy: {response.status_code}")
-    except requests.exceptions.ConnectionError:
-        print("❌ Cannot connect to backend. Is it running?")
+    results = asyncio.run(run_on_nodes(nodes, "GET", "/health"))
+    healthy = print_results("Backend is healthy", results)
+    if not healthy:
         print(f"   Start it with: cd backend && python app.py")
+    return healthy
+
+
+# ============================================================================
+# BENCHMARK
+# ============================================================================
+
+def percentile(values: List[float], pct: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))]
+
+
+def describe_latencies(name: str, values: List[float]) -> str:
+    if not values:
+        return f"{name:<18} no samples"
+    return (f"{name:<18} p50={percentile(values, 50):7.1f}  p90={percentile(values, 90):7.1f}  "
+            f"p99={percentile(values, 99):7.1f}  max={max(values):7.1f} ms")
+
+
+async def bench_session(session: aiohttp.ClientSession, url: str, hold_s: float, audio_chunks: int) -> Dict[str, Any]:
+    """Open one /ws/voice session and time connect, first event and (optionally) first audio"""
+    result: Dict[str, Any] = {"ok": False}
+    started = time.perf_counter()
+    try:
+        async with session.ws_connect(url, heartbeat=None, max_msg_size=0) as ws:
+            result["connect_ms"] = (time.perf_counter() - started) * 1000
+            first = await ws.receive(timeout=30)
+            result["first_event_ms"] = (time.perf_counter() - started) * 1000
+            if first.type == aiohttp.WSMsgType.TEXT and json.loads(first.data).get("type") == "error":
+                result["error"] = json.loads(first.data)["error"].get("message")
+                return result
+
+            if audio_chunks:
+                silence = bytes(4800)  # 100 ms of 24 kHz PCM16
+                for _ in range(audio_chunks):
+                    await ws.send_bytes(silence)
+                spoke_at = time.perf_counter()
+                while True:
+                    message = await ws.receive(timeout=30)
+                    if message.type == aiohttp.WSMsgType.BINARY or (
+                        message.type == aiohttp.WSMsgType.TEXT and '"response.audio.delta"' in message.data
+                    ):
+                        result["first_audio_ms"] = (time.perf_counter() - spoke_at) * 1000
+                        break
+                    if message.type in (aiohttp.WSMsgType.CLOSE, aiohttp.WSMsgType.CLOSED, aiohttp.WSMsgType.ERROR):
+                        break
+
+            if hold_s:
+                await asyncio.sleep(hold_s)
+            result["ok"] = True
+    except Exception as e:
+        result["error"] = str(e) or type(e).__name__
+    return result
+
+
+async def run_bench(node: str, sessions: int, engine: Optional[str], hold_s: float, audio_chunks: int) -> Dict[str, Any]:
+    ws_url = node.replace("https://", "wss://").replace("http://", "ws://") + "/ws/voice"
+    if engine:
+        ws_url += f"?engine={engine}"
+    connector = aiohttp.TCPConnector(limit=0)
+    started = time.perf_counter()
+    async with aiohttp.ClientSession(connector=connector) as session:
+        results = await asyncio.gather(*(bench_session(session, ws_url, hold_s, audio_chunks) for _ in range(sessions)))
+    return {"results": results, "wall_s": time.perf_counter() - started}
+
+
+def bench(nodes: List[str], sessions=20, engine=None, hold=0, audio_chunks=0) -> bool:
+    """Open N concurrent /ws/voice sessions against a node and report latency percentiles"""
+    node = nodes[0]
+    if len(nodes) > 1:
+        print(f"⚠️  bench targets one node, using {node}")
+    sessions = int(sessions)
+    print(f"🏁 Opening {sessions} concurrent sessions against {node}...")
+    outcome = asyncio.run(run_bench(node, sessions, engine, float(hold), int(audio_chunks)))
+
+    results = outcome["results"]
+    ok = [r for r in results if r["ok"]]
+    errors: Dict[str, int] = {}
+    for r in results:
+        if not r["ok"]:
+            errors[r.get("error", "unknown")] = errors.get(r.get("error", "unknown"), 0) + 1
+
+    print(f"\n📊 {len(ok)}/{len(results)} sessions succeeded in {outcome['wall_s']:.2f} s")
+    print(describe_latencies("connect", [r["connect_ms"] for r in results if "connect_ms" in r]))
+    print(describe_latencies("first event", [r["first_event_ms"] for r in results if "first_event_ms" in r]))
+    if int(audio_chunks):
+        print(describe_latencies("first audio", [r["first_audio_ms"] for r in results if "first_audio_ms" in r]))
+    if ok:
+        print(f"mean first event: {statistics.mean(r['first_event_ms'] for r in ok):.1f} ms")
+    for error, count in errors.items():
+        print(f"❌ {count}x {error}")
+    return len(ok) == len(results)
+
 
 def print_help():
     """Print help message"""
@@ -118,79 +235,130 @@ def print_help():
 🎛️  Voice AI Configuration Manager
 
 Usage:
-    python config_manager.py [command] [options]
+    python config_manager.py [command] [options] [--nodes URL1,URL2,...]
+
+Nodes default to $BACKEND_NODES (comma-separated) or $BACKEND_URL or
+http://localhost:8000. Every command runs concurrently on all nodes.
+update and preset need $ADMIN_TOKEN, the server's admin token.
 
 Commands:
     health                          Check backend health
     get                            Get current configuration
     default                        Get default configuration
-    
+
     update --temp 0.7              Update temperature
-    update --voice nova            Update voice
+    update --voice coral           Update voice
     update --vad 0.5               Update VAD threshold
+    update --silence 800           Update VAD silence duration (ms)
     update --tokens 2048           Update max tokens
-    
+    update ... --live              Also push changed fields (not the voice) to live sessions
+
     preset payment                 Use payment processing preset (temp=0.5)
     preset conversation            Use conversation preset (temp=0.7)
     preset creative                Use creative preset (temp=0.9)
     preset default                 Reset to default preset (temp=0.8)
+    preset ... --live              Also push changed fields to live sessions
+
+    bench --sessions 50            Open N concurrent /ws/voice sessions and report
+                                   connect / first-event latency percentiles
+          --engine cascaded        Engine to benchmark (default: server default)
+          --audio 7                Also send N audio chunks and time first audio
+          --hold 5                 Keep each session open N seconds
+                                   (start the server with RATE_LIMIT_EXEMPT_LOOPBACK=true
+                                   or a higher voice_session_ip in RATE_LIMITS: all
+                                   sessions come from one address)
 
 Examples:
     # Check if backend is running
     python config_manager.py health
-    
+
     # Get current config
     python config_manager.py get
-    
+
     # Update temperature only
     python config_manager.py update --temp 0.6
-    
+
     # Update multiple settings
-    python config_manager.py update --temp 0.7 --voice nova --vad 0.4
-    
+    python config_manager.py update --temp 0.7 --voice coral --vad 0.4
+
+    # Cut turn latency on every node and every live call
+    python config_manager.py update --silence 800 --live --nodes http://node1:8000,http://node2:8000
+
     # Use preset for payment processing
     python config_manager.py preset payment
+
+    # 100 concurrent sessions against one node
+    python config_manager.py bench --sessions 100
     """)
 
+
+def parse_options(argv: List[str]) -> Dict[str, Any]:
+    """Parse --key value pairs; a --key followed by another --key (or nothing) is a flag"""
+    options: Dict[str, Any] = {}
+    positional: List[str] = []
+    i = 0
+    while i < len(argv):
+        if argv[i].startswith("--"):
+            key = argv[i].lstrip('-')
+            if i + 1 < len(argv) and not argv[i + 1].startswith("--"):
+                options[key] = argv[i + 1]
+                i += 2
+                continue
+            options[key] = True
+        else:
+            positional.append(argv[i])
+        i += 1
+    options["_positional"] = positional
+    return options
+
+
 if __name__ == "__main__":
     if len(sys.argv) < 2:
         print_help()
         sys.exit(0)
-    
+
     command = sys.argv[1]
-    
+    options = parse_options(sys.argv[2:])
+    nodes = get_nodes(options)
+    live = bool(options.get("live"))
+    success = True
+
     if command == "health":
-        check_health()
+        success = check_health(nodes)
     elif command == "get":
-        get_current_config()
+        success = get_current_config(nodes)
     elif command == "default":
-        get_default_config()
+        success = get_default_config(nodes)
     elif command == "update":
-        # Parse arguments
-        args = {}
-        for i in range(2, len(sys.argv), 2):
-            if i + 1 < len(sys.argv):
-                key = sys.argv[i].lstrip('-')
-                value = sys.argv[i + 1]
-                
-                if key == "temp":
-                    args["temperature"] = value
-                elif key == "voice":
-                    args["voice"] = value
-                elif key == "vad":
-                    args["vad_threshold"] = value
-                elif key == "tokens":
-                    args["max_tokens"] = value
-        
-        update_config(**args)
+        success = update_config(
+            nodes,
+            temperature=options.get("temp"),
+            voice=options.get("voice"),
+            vad_threshold=options.get("vad"),
+            max_tokens=options.get("tokens"),
+            silence_ms=options.get("silence"),
+            live=live
+        )
     elif command == "preset":
-        if len(sys.argv) < 3:
+        if not options["_positional"]:
             print("❌ Please specify a preset name")
             print("Available: payment, conversation, creative, default")
+            success = False
         else:
-            set_preset(sys.argv[2])
+            success = set_preset(nodes, options["_positional"][0], live=live)
+    elif command == "bench":
+        success = bench(
+            nodes,
+            sessions=options.get("sessions", 20),
+            engine=options.get("engine"),
+            hold=options.get("hold", 0),
+            audio_chunks=options.get("audio", 0)
+        )
     elif command == "help":
         print_help()
     else:
         print(f"❌ Unknown command: {command}")
         print_help()
+        success = False
+
+    sys.exit(0 if success else 1)
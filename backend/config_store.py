@@ -0,0 +1,110 @@
+"""
+Runtime configuration store for voice sessions
+Holds the versioned default session config and named presets; every change
+reports exactly which fields changed so live sessions can be patched with a
+minimal session.update
+"""
+import logging
+from typing import Any, Dict, List, Optional, Type
+
+from pydantic import BaseModel
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PRESETS: Dict[str, Dict[str, Any]] = {
+    "payment": {
+        "temperature": 0.5,
+        "vad_threshold": 0.5,
+        "vad_silence_duration_ms": 1500,
+        "description": "Precise and focused for payment processing"
+    },
+    "conversation": {
+        "temperature": 0.7,
+        "vad_threshold": 0.4,
+        "vad_silence_duration_ms": 1800,
+        "description": "Balanced for general conversation"
+    },
+    "creative": {
+        "temperature": 0.9,
+        "vad_threshold": 0.3,
+        "vad_silence_duration_ms": 2000,
+        "description": "Creative and engaging"
+    },
+    "default": {
+        "temperature": 0.8,
+        "vad_threshold": 0.3,
+        "vad_silence_duration_ms": 2000,
+        "description": "Default settings"
+    }
+}
+
+
+class ConfigVersionConflict(Exception):
+    """Raised when an update was based on an outdated config version"""
+
+
+def diff_configs(old: BaseModel, new: BaseModel) -> List[str]:
+    """Names of the fields whose values differ between two configs"""
+    old_values = old.model_dump()
+    return [name for name, value in new.model_dump().items() if old_values.get(name) != value]
+
+
+class ConfigStore:
+    """Versioned default config plus named presets"""
+
+    def __init__(self, model_cls: Type[BaseModel], presets: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.model_cls = model_cls
+        self.default = model_cls()
+        self.version = 1
+        self.presets: Dict[str, BaseModel] = {}
+        self.preset_descriptions: Dict[str, str] = {}
+        for name, values in (presets if presets is not None else DEFAULT_PRESETS).items():
+            values = dict(values)
+            self.preset_descriptions[name] = values.pop("description", "")
+            self.presets[name] = model_cls(**values)
+
+    def get(self, preset: Optional[str] = None) -> BaseModel:
+        if preset is None:
+            return self.default
+        if preset not in self.presets:
+            raise KeyError(preset)
+        return self.presets[preset]
+
+    def _check_version(self, expected_version: Optional[int]) -> None:
+        if expected_version is not None and expected_version != self.version:
+            raise ConfigVersionConflict(f"Config is at version {self.version}, update was based on {expected_version}")
+
+    def update(self, changes: Dict[str, Any], preset: Optional[str] = None,
+               expected_version: Optional[int] = None) -> List[str]:
+        """
+        Merge changes into the default (or a preset) and return the changed fields
+        Validation errors from the model propagate unchanged
+        """
+        self._check_version(expected_version)
+        current = self.get(preset)
+        updated = self.model_cls(**{**current.model_dump(), **changes})
+        changed = diff_configs(current, updated)
+        if not changed:
+            return []
+
+        if preset is None:
+            self.default = updated
+        else:
+            self.presets[preset] = updated
+        self.version += 1
+        logger.info(f"📝 Config v{self.version} ({preset or 'default'}): changed {', '.join(changed)}")
+        return changed
+
+    def apply_preset(self, name: str, expected_version: Optional[int] = None) -> List[str]:
+        """Make a preset the default config and return the changed fields"""
+        return self.update(self.get(name).model_dump(), expected_version=expected_version)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "version": self.version,
+            "config": self.default.model_dump(),
+            "presets": {
+                name: {"description": self.preset_descriptions.get(name, ""), "config": config.model_dump()}
+                for name, config in self.presets.items()
+            }
+        }
@@ -0,0 +1,217 @@
+"""
+Context windowing for long Realtime conversations
+The proxy indexes the upstream conversation from conversation.item.created
+events (id, role, type, size). Once a call grows past CONTEXT_MAX_ITEMS, the
+oldest items are removed with conversation.item.delete down to
+CONTEXT_KEEP_ITEMS, and the facts the rest of the call depends on (account,
+selected plans, transactions) are kept in a pinned system summary item at the
+root of the conversation
+
+Benchmark: python conversation_window.py [turns]
+"""
+import asyncio
+import json
+import logging
+import os
+import statistics
+import sys
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# 0 disables windowing
+CONTEXT_MAX_ITEMS = int(os.getenv("CONTEXT_MAX_ITEMS", "40"))
+CONTEXT_KEEP_ITEMS = int(os.getenv("CONTEXT_KEEP_ITEMS", "16"))
+
+SUMMARY_ID_PREFIX = "pinned_summary_"
+
+# Upstream events the window is fed from
+WINDOW_EVENTS = {
+    "conversation.item.created",
+    "conversation.item.deleted",
+    "conversation.item.input_audio_transcription.completed",
+    "response.output_item.done",
+}
+
+
+def _item_size(item: Dict[str, Any]) -> int:
+    """Characters of text in an item (transcripts, arguments, outputs)"""
+    size = len(item.get("arguments") or "") + len(item.get("output") or "")
+    for part in item.get("content") or []:
+        size += len(part.get("text") or part.get("transcript") or "")
+    return size
+
+
+class ConversationWindow:
+    """Index of one session's upstream conversation plus its retention policy"""
+
+    def __init__(self, max_items: int = CONTEXT_MAX_ITEMS, keep_items: int = CONTEXT_KEEP_ITEMS):
+        self.max_items = max_items
+        self.keep_items = max(2, min(keep_items, max_items))
+        self._items: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._calls: Dict[str, str] = {}  # call_id → tool name
+        self.account_id: Optional[str] = None
+        self.plans: Dict[str, str] = {}  # bill_id → plan_id
+        self.transactions: List[Dict[str, Any]] = []
+        self._summary_id: Optional[str] = None
+        self._summary_text: Optional[str] = None
+        self.stats = {"items": 0, "pruned": 0, "pruned_chars": 0, "summaries": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_items > 0
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+    # ------------------------------------------------------------------------
+    # Index
+    # ------------------------------------------------------------------------
+
+    def observe(self, data: Dict[str, Any]) -> None:
+        """Update the index from an upstream event in WINDOW_EVENTS"""
+        event_type = data.get("type")
+        if event_type == "conversation.item.created":
+            self._on_created(data.get("item") or {})
+        elif event_type == "conversation.item.deleted":
+            self._items.pop(data.get("item_id"), None)
+        elif event_type == "conversation.item.input_audio_transcription.completed":
+            entry = self._items.get(data.get("item_id"))
+            if entry is not None:
+                entry["size"] = len(data.get("transcript") or "")
+        elif event_type == "response.output_item.done":
+            item = data.get("item") or {}
+            entry = self._items.get(item.get("id"))
+            if entry is not None:
+                entry["size"] = _item_size(item)
+            if item.get("type") == "function_call" and item.get("call_id"):
+                self._calls[item["call_id"]] = item.get("name")
+
+    def _on_created(self, item: Dict[str, Any]) -> None:
+        item_id = item.get("id")
+        if not item_id or item_id.startswith(SUMMARY_ID_PREFIX):
+            return
+        self._items[item_id] = {
+            "type": item.get("type"),
+            "role": item.get("role"),
+            "call_id": item.get("call_id"),
+            "size": _item_size(item)
+        }
+        self.stats["items"] += 1
+        if item.get("type") == "function_call" and item.get("name"):
+            self._calls[item["call_id"]] = item["name"]
+        elif item.get("type") == "function_call_output":
+            self._record_facts(self._calls.get(item.get("call_id")), item.get("output"))
+
+    def _record_facts(self, name: Optional[str], output: Optional[str]) -> None:
+        """Keep what later turns need from tool results that may be pruned"""
+        try:
+            result = json.loads(output or "")
+        except ValueError:
+            return
+        if not isinstance(result, dict) or not result.get("success") or result.get("duplicate"):
+            return
+        if name == "lookup_account":
+            self.account_id = (result.get("account") or {}).get("id") or self.account_id
+        elif name == "select_payment_plan" and result.get("bill_id"):
+            self.plans[result["bill_id"]] = (result.get("plan") or {}).get("id")
+        elif name == "process_payment" and result.get("transaction_id"):
+            self.transactions.append({
+                "transaction_id": result["transaction_id"],
+                "bill_id": result.get("bill_id"),
+                "amount": result.get("amount")
+            })
+
+    # ------------------------------------------------------------------------
+    # Retention
+    # ------------------------------------------------------------------------
+
+    def summary(self) -> Optional[str]:
+        lines = []
+        if self.account_id:
+            lines.append(f"- Verified account_id: {self.account_id}")
+        for bill_id, plan_id in self.plans.items():
+            lines.append(f"- Selected payment plan for bill {bill_id}: {plan_id}")
+        for txn in self.transactions:
+            lines.append(f"- Payment processed: transaction_id {txn['transaction_id']}, "
+                         f"bill {txn['bill_id']}, amount ${txn['amount']}")
+        if not lines:
+            return None
+        return "Facts from earlier in this call (older messages were removed):\n" + "\n".join(lines)
+
+    def prune_events(self) -> List[str]:
+        """
+        Client events that bring the conversation back to keep_items: a refreshed
+        pinned summary first, then deletes of the oldest items. Call between turns
+        """
+        if not self.enabled or len(self._items) <= self.max_items:
+            return []
+        ids = list(self._items)
+        cut = len(ids) - self.keep_items
+        # Never keep a tool output without the call it answers
+        while cut > 0 and self._items[ids[cut]]["type"] == "function_call_output":
+            cut -= 1
+
+        events = []
+        text = self.summary()
+        if text is not None and text != self._summary_text:
+            old_id = self._summary_id
+            self.stats["summaries"] += 1
+            self._summary_id, self._summary_text = f"{SUMMARY_ID_PREFIX}{self.stats['summaries']}", text
+            events.append(json.dumps({
+                "type": "conversation.item.create",
+                "previous_item_id": "root",
+                "item": {
+                    "id": self._summary_id,
+                    "type": "message",
+                    "role": "system",
+                    "content": [{"type": "input_text", "text": text}]
+                }
+            }))
+            if old_id:
+                events.append(json.dumps({"type": "conversation.item.delete", "item_id": old_id}))
+
+        for item_id in ids[:cut]:
+            entry = self._items.pop(item_id)
+            self.stats["pruned"] += 1
+            self.stats["pruned_chars"] += entry["size"]
+            events.append(json.dumps({"type": "conversation.item.delete", "item_id": item_id}))
+        logger.info(f"🪟 Context window: pruned {cut} items, {len(self._items)} kept")
+        return events
+
+
+async def _benchmark(turns: int) -> None:
+    """Turn latency over a long replayed call, with and without windowing"""
+    import app
+    from bench_engines import UTTERANCE_CHUNKS, measure
+    from fake_realtime import FakeRealtimeServer
+
+    # The fake upstream's prefill cost grows with every item in the conversation
+    upstream = FakeRealtimeServer(
+        response_latency_ms=100, per_item_latency_ms=5, audio_chunks=2, utterance_chunks=UTTERANCE_CHUNKS,
+        tool_calls=[("lookup_account", {"identifier": "9166065168"})]
+    )
+    app.OPENAI_REALTIME_URL = await upstream.start()
+    app.openai_api_key = app.openai_api_key or "bench"
+
+    print(f"Time to first audio over a {turns}-turn call")
+    for name, max_items in (("full", 0), ("windowed", CONTEXT_MAX_ITEMS)):
+        upstream.tool_calls = [("lookup_account", {"identifier": "9166065168"})]
+        session_id = f"bench-window-{name}"
+        app.active_sessions[session_id] = {"pacing": False, "context_max_items": max_items}
+
+        async def realtime(client):
+            await app.proxy_openai_realtime(client, session_id, app.VoiceSessionConfig())
+
+        samples = await measure(realtime, turns)
+        app.active_sessions.pop(session_id, None)
+        tenth = max(1, turns // 10)
+        print(f"{name:<9} first {tenth} turns p50={statistics.median(samples[:tenth]):7.1f} ms  "
+              f"last {tenth} turns p50={statistics.median(samples[-tenth:]):7.1f} ms")
+    await upstream.stop()
+
+
+if __name__ == "__main__":
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 60))
@@ -228,3 +228,7 @@ def get_receipt_html(transaction_id, amount, date, payment_method):
 </body>
 </html>
 """
+
+
+def get_receipt_sms(transaction_id, amount, date):
+    return f"CareCredit: payment of ${amount} received on {date}. Confirmation: {transaction_id}. Thank you!"
@@ -0,0 +1,140 @@
+"""
+Downstream event filtering for the Realtime proxy
+Each client subscribes to the upstream event types it consumes, negotiated at
+connect with ?events=; everything else is dropped in the proxy after a cheap
+type check, without parsing the event
+
+Benchmark: python event_filter.py [trace.jsonl]
+(a trace is one upstream event per line; without one, turns are recorded
+from fake_realtime.py)
+"""
+import asyncio
+import json
+import logging
+import sys
+from typing import Dict, FrozenSet, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upstream events handled by src/services/backend/voiceService.ts and VoiceModeContext
+DEFAULT_CLIENT_EVENTS: FrozenSet[str] = frozenset({
+    "error",
+    "session.created",
+    "session.updated",
+    "input_audio_buffer.speech_started",
+    "conversation.item.input_audio_transcription.completed",
+    "response.created",
+    "response.audio.delta",
+    "response.audio.done",
+    "response.audio_transcript.delta",
+    "response.audio_transcript.done",
+})
+
+_TYPE_PREFIXES = ('{"type":"', '{"type": "')
+
+
+def event_type_of(message: str) -> Optional[str]:
+    """Type of a serialized event, without parsing it when type is the first key"""
+    for prefix in _TYPE_PREFIXES:
+        if message.startswith(prefix):
+            end = message.find('"', len(prefix))
+            if end != -1:
+                return message[len(prefix):end]
+    try:
+        return json.loads(message).get("type")
+    except (ValueError, AttributeError):
+        return None
+
+
+class EventFilter:
+    """Per-session subscription: exact event types plus "prefix.*" patterns"""
+
+    def __init__(self, types: Optional[Iterable[str]] = DEFAULT_CLIENT_EVENTS, prefixes: Iterable[str] = ()):
+        # types=None subscribes to everything
+        self.types: Optional[FrozenSet[str]] = frozenset(types) if types is not None else None
+        self.prefixes: Tuple[str, ...] = tuple(prefixes)
+        self.stats = {"forwarded": 0, "dropped": 0, "forwarded_bytes": 0, "dropped_bytes": 0}
+
+    @classmethod
+    def from_query(cls, value: Optional[str]) -> "EventFilter":
+        """
+        Parse ?events=: omitted → defaults, "all" or "*" → everything,
+        otherwise comma-separated types, "prefix.*" patterns and "default"
+        """
+        if not value:
+            return cls()
+        types, prefixes = set(), []
+        for item in (part.strip() for part in value.split(",")):
+            if item in ("all", "*"):
+                return cls(types=None)
+            if item == "default":
+                types |= DEFAULT_CLIENT_EVENTS
+            elif item.endswith(".*"):
+                prefixes.append(item[:-1])
+            elif item:
+                types.add(item)
+        # Errors always reach the client
+        types.add("error")
+        return cls(types, prefixes)
+
+    def allows(self, event_type: Optional[str]) -> bool:
+        if self.types is None or event_type in self.types:
+            return True
+        return bool(self.prefixes) and event_type is not None and event_type.startswith(self.prefixes)
+
+    def check(self, event_type: Optional[str], size: int) -> bool:
+        """allows() plus frame/byte accounting"""
+        if self.allows(event_type):
+            self.stats["forwarded"] += 1
+            self.stats["forwarded_bytes"] += size
+            return True
+        self.stats["dropped"] += 1
+        self.stats["dropped_bytes"] += size
+        return False
+
+    def describe(self) -> Dict[str, object]:
+        return {
+            "events": "all" if self.types is None else sorted(self.types),
+            "prefixes": [f"{prefix}*" for prefix in self.prefixes]
+        }
+
+
+async def _record_trace(turns: int):
+    import websockets
+    from fake_realtime import FakeRealtimeServer
+
+    server = FakeRealtimeServer(response_latency_ms=0)
+    url = await server.start()
+    trace = []
+    async with websockets.connect(url) as ws:
+        for _ in range(turns):
+            for _ in range(server.utterance_chunks):
+                await ws.send(json.dumps({"type": "input_audio_buffer.append", "audio": ""}))
+            async for message in ws:
+                trace.append(message)
+                if event_type_of(message) == "response.done":
+                    break
+    await server.stop()
+    return trace
+
+
+def _benchmark(trace) -> None:
+    everything, default = EventFilter(types=None), EventFilter()
+    for message in trace:
+        event_type = event_type_of(message)
+        everything.check(event_type, len(message))
+        default.check(event_type, len(message))
+
+    total, kept = everything.stats, default.stats
+    print(f"{len(trace)} upstream events, {total['forwarded_bytes']:,} bytes")
+    print(f"  default filter: {kept['forwarded']} frames ({kept['forwarded'] / total['forwarded']:.0%}), "
+          f"{kept['forwarded_bytes']:,} bytes ({kept['forwarded_bytes'] / total['forwarded_bytes']:.0%})")
+    print(f"  dropped:        {kept['dropped']} frames, {kept['dropped_bytes']:,} bytes")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 1:
+        with open(sys.argv[1], encoding="utf-8") as f:
+            _benchmark([line.rstrip("\n") for line in f if line.strip()])
+    else:
+        _benchmark(asyncio.run(_record_trace(5)))
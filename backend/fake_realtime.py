@@ -0,0 +1,300 @@
+"""
+Local fake of the OpenAI Realtime WebSocket API
+Speaks enough of the protocol (session.created/updated, server VAD, input
+transcription, conversation items and client item create/delete, content
+parts, audio and transcript deltas, scripted function calls, response.done
+with usage, rate limits) to exercise the proxy offline.
+Latency is configurable, optionally growing with the conversation length, so
+engines, routing and context windowing can be benchmarked. Faults can be
+injected into a share of connections: rejected handshakes (503), hangs
+before session.created, error events and slow connects
+
+Usage: python fake_realtime.py [port]
+Then run the backend with OPENAI_REALTIME_URL=ws://localhost:<port>
+"""
+import asyncio
+import base64
+import json
+import logging
+import random
+import sys
+import uuid
+from http import HTTPStatus
+from typing import Any, Dict, List, Optional, Tuple
+
+import websockets
+
+logger = logging.getLogger(__name__)
+
+SAMPLE_RATE = 24000
+AUDIO_CHUNK_MS = 100
+
+
+class FakeRealtimeServer:
+    """Fake Realtime upstream with a fixed latency profile"""
+
+    def __init__(
+        self,
+        connect_delay_ms: int = 50,
+        response_latency_ms: int = 500,
+        utterance_chunks: int = 7,
+        reply: str = "I can see your bills are displayed. What would you like to do next?",
+        user_transcript: str = "I would like to view my bills",
+        audio_chunks: int = 20,
+        tool_calls: Optional[List[Tuple[str, Dict[str, Any]]]] = None,
+        per_item_latency_ms: float = 0,
+        fault: Optional[str] = None,
+        fault_rate: float = 0.0,
+        slow_connect_ms: int = 3000,
+        seed: Optional[int] = None
+    ):
+        self.connect_delay_ms = connect_delay_ms
+        self.response_latency_ms = response_latency_ms
+        self.utterance_chunks = utterance_chunks
+        self.reply = reply
+        self.user_transcript = user_transcript
+        self.audio_chunks = audio_chunks
+        # Response latency grows with the conversation, like a real model's prefill
+        self.per_item_latency_ms = per_item_latency_ms
+        # Each end of speech answers with the next scripted call before speaking again
+        self.tool_calls = list(tool_calls or [])
+        self.function_outputs: List[Dict[str, Any]] = []
+        self.truncations: List[Dict[str, Any]] = []
+        # "reject", "hang", "error" or "slow" for a fault_rate share of connections; both can be changed live
+        self.fault = fault
+        self.fault_rate = fault_rate
+        self.slow_connect_ms = slow_connect_ms
+        self.faults_injected = 0
+        self._random = random.Random(seed)
+        self.connections = 0
+        self._server = None
+        self.url: Optional[str] = None
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        self._server = await websockets.serve(
+            self._handle, host, port, max_size=None, process_request=self._process_request
+        )
+        port = self._server.sockets[0].getsockname()[1]
+        self.url = f"ws://{host}:{port}/v1/realtime"
+        logger.info(f"🧪 Fake Realtime upstream listening on {self.url}")
+        return self.url
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+
+    def _inject(self, fault: str) -> bool:
+        if self.fault != fault or self._random.random() >= self.fault_rate:
+            return False
+        self.faults_injected += 1
+        return True
+
+    async def _process_request(self, path, headers):
+        if self._inject("reject"):
+            return HTTPStatus.SERVICE_UNAVAILABLE, [], b"Upstream overloaded\n"
+        return None
+
+    async def _handle(self, ws) -> None:
+        self.connections += 1
+        if self._inject("hang"):
+            await ws.wait_closed()
+            return
+        if self._inject("error"):
+            await ws.send(json.dumps({
+                "type": "error",
+                "error": {"type": "server_error", "message": "The server had an error while processing your request"}
+            }))
+            await ws.close()
+            return
+        delay_ms = self.connect_delay_ms + (self.slow_connect_ms if self._inject("slow") else 0)
+        await asyncio.sleep(delay_ms / 1000)
+        try:
+            await ws.send(json.dumps({"type": "session.created", "session": {"id": f"sess_{uuid.uuid4().hex[:12]}"}}))
+        except websockets.ConnectionClosed:
+            return  # client gave up, e.g. a hedged connect that lost
+
+        buffered_chunks = 0
+        response: Optional[asyncio.Task] = None
+        conversation: List[str] = []  # item ids, oldest first
+        try:
+            async for raw in ws:
+                event = json.loads(raw)
+                event_type = event.get("type")
+                if event_type == "session.update":
+                    await ws.send(json.dumps({"type": "session.updated", "session": event.get("session", {})}))
+                elif event_type == "input_audio_buffer.append":
+                    buffered_chunks += 1
+                    if buffered_chunks == 1:
+                        if response and not response.done():
+                            response.cancel()
+                        await ws.send(json.dumps({"type": "input_audio_buffer.speech_started"}))
+                    if buffered_chunks >= self.utterance_chunks:
+                        buffered_chunks = 0
+                        await ws.send(json.dumps({"type": "input_audio_buffer.speech_stopped"}))
+                        await self._commit_user_turn(ws, conversation)
+                        if self.tool_calls:
+                            response = asyncio.create_task(
+                                self._call_tool(ws, conversation, *self.tool_calls.pop(0))
+                            )
+                        else:
+                            response = asyncio.create_task(self._respond(ws, conversation))
+                elif event_type == "conversation.item.create":
+                    item = {"id": f"item_{uuid.uuid4().hex[:12]}", **event.get("item", {})}
+                    if item.get("type") == "function_call_output":
+                        self.function_outputs.append(item)
+                    if event.get("previous_item_id") == "root":
+                        conversation.insert(0, item["id"])
+                    else:
+                        conversation.append(item["id"])
+                    await ws.send(json.dumps({"type": "conversation.item.created", "item": item}))
+                elif event_type == "conversation.item.delete":
+                    item_id = event.get("item_id")
+                    if item_id in conversation:
+                        conversation.remove(item_id)
+                        await ws.send(json.dumps({"type": "conversation.item.deleted", "item_id": item_id}))
+                    else:
+                        await ws.send(json.dumps({
+                            "type": "error",
+                            "error": {"type": "invalid_request_error", "message": f"Item {item_id} not found"}
+                        }))
+                elif event_type == "conversation.item.truncate":
+                    self.truncations.append(event)
+                elif event_type == "response.create":
+                    response = asyncio.create_task(self._respond(ws, conversation))
+                elif event_type == "response.cancel" and response:
+                    response.cancel()
+        except websockets.ConnectionClosed:
+            pass
+        finally:
+            if response:
+                response.cancel()
+
+    def _latency_s(self, conversation: List[str]) -> float:
+        return (self.response_latency_ms + self.per_item_latency_ms * len(conversation)) / 1000
+
+    async def _commit_user_turn(self, ws, conversation: List[str]) -> None:
+        item_id = f"item_{uuid.uuid4().hex[:12]}"
+        conversation.append(item_id)
+        await ws.send(json.dumps({"type": "input_audio_buffer.committed", "item_id": item_id}))
+        await ws.send(json.dumps({
+            "type": "conversation.item.created",
+            "item": {"id": item_id, "type": "message", "role": "user",
+                     "content": [{"type": "input_audio", "transcript": None}]}
+        }))
+        await ws.send(json.dumps({
+            "type": "conversation.item.input_audio_transcription.completed",
+            "item_id": item_id,
+            "content_index": 0,
+            "transcript": self.user_transcript
+        }))
+
+    async def _rate_limits(self, ws) -> None:
+        await ws.send(json.dumps({
+            "type": "rate_limits.updated",
+            "rate_limits": [
+                {"name": "requests", "limit": 5000, "remaining": 4999, "reset_seconds": 0.012},
+                {"name": "tokens", "limit": 400000, "remaining": 399000, "reset_seconds": 0.15}
+            ]
+        }))
+
+    async def _call_tool(self, ws, conversation: List[str], name: str, arguments: Dict[str, Any]) -> None:
+        response_id = f"resp_{uuid.uuid4().hex[:12]}"
+        call_id = f"call_{uuid.uuid4().hex[:12]}"
+        item = {"id": f"item_{uuid.uuid4().hex[:12]}", "type": "function_call", "name": name, "call_id": call_id}
+        arguments_str = json.dumps(arguments)
+        await asyncio.sleep(self._latency_s(conversation))
+        conversation.append(item["id"])
+        await ws.send(json.dumps({"type": "response.created", "response": {"id": response_id}}))
+        await ws.send(json.dumps({"type": "response.output_item.added", "response_id": response_id, "item": item}))
+        await ws.send(json.dumps({"type": "conversation.item.created", "item": item}))
+        for start in range(0, len(arguments_str), 8):
+            await ws.send(json.dumps({
+                "type": "response.function_call_arguments.delta",
+                "response_id": response_id,
+                "call_id": call_id,
+                "delta": arguments_str[start:start + 8]
+            }))
+        await ws.send(json.dumps({
+            "type": "response.function_call_arguments.done",
+            "response_id": response_id,
+            "call_id": call_id,
+            "name": name,
+            "arguments": arguments_str
+        }))
+        await ws.send(json.dumps({"type": "response.done", "response": {"id": response_id, "status": "completed"}}))
+
+    async def _respond(self, ws, conversation: List[str]) -> None:
+        response_id = f"resp_{uuid.uuid4().hex[:12]}"
+        item_id = f"item_{uuid.uuid4().hex[:12]}"
+        await asyncio.sleep(self._latency_s(conversation))
+        conversation.append(item_id)
+        await ws.send(json.dumps({"type": "response.created", "response": {"id": response_id}}))
+        await self._rate_limits(ws)
+        item = {"id": item_id, "type": "message", "role": "assistant", "content": []}
+        part = {"type": "audio", "transcript": ""}
+        await ws.send(json.dumps({"type": "response.output_item.added", "response_id": response_id,
+                                  "output_index": 0, "item": item}))
+        await ws.send(json.dumps({"type": "conversation.item.created", "item": item}))
+        await ws.send(json.dumps({"type": "response.content_part.added", "response_id": response_id,
+                                  "item_id": item_id, "part": part}))
+
+        words = self.reply.split(" ")
+        audio = base64.b64encode(bytes(SAMPLE_RATE * 2 * AUDIO_CHUNK_MS // 1000)).decode("ascii")
+        for index in range(max(self.audio_chunks, len(words))):
+            if index < len(words):
+                await ws.send(json.dumps({
+                    "type": "response.audio_transcript.delta",
+                    "response_id": response_id,
+                    "item_id": item_id,
+                    "delta": words[index] if index == 0 else f" {words[index]}"
+                }))
+            if index < self.audio_chunks:
+                await ws.send(json.dumps({
+                    "type": "response.audio.delta",
+                    "response_id": response_id,
+                    "item_id": item_id,
+                    "delta": audio
+                }))
+            await asyncio.sleep(0)
+
+        await ws.send(json.dumps({"type": "response.audio.done", "response_id": response_id, "item_id": item_id}))
+        await ws.send(json.dumps({
+            "type": "response.audio_transcript.done",
+            "response_id": response_id,
+            "item_id": item_id,
+            "transcript": self.reply
+        }))
+        part["transcript"] = self.reply
+        item.update({"status": "completed", "content": [part]})
+        await ws.send(json.dumps({"type": "response.content_part.done", "response_id": response_id,
+                                  "item_id": item_id, "part": part}))
+        await ws.send(json.dumps({"type": "response.output_item.done", "response_id": response_id,
+                                  "output_index": 0, "item": item}))
+        await ws.send(json.dumps({
+            "type": "response.done",
+            "response": {
+                "id": response_id,
+                "status": "completed",
+                "output": [item],
+                "usage": {
+                    "total_tokens": 180,
+                    "input_tokens": 120,
+                    "output_tokens": 60,
+                    "input_token_details": {"text_tokens": 100, "audio_tokens": 20, "cached_tokens": 64},
+                    "output_token_details": {"text_tokens": 15, "audio_tokens": 45}
+                }
+            }
+        }))
+
+
+async def main(port: int) -> None:
+    server = FakeRealtimeServer()
+    await server.start(port=port)
+    print(f"Fake Realtime upstream: {server.url}")
+    await asyncio.Future()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(main(int(sys.argv[1]) if len(sys.argv) > 1 else 8765))
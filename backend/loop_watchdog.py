@@ -0,0 +1,273 @@
+"""
+Event-loop lag watchdog
+A probe task wakes every LOOP_PROBE_INTERVAL_MS and records how late it ran
+in a fixed-bucket histogram. A watchdog thread checks the probe's heartbeat;
+when the loop has not come back for LOOP_STALL_THRESHOLD_MS it captures the
+loop thread's stack and the task running there while the stall is still in
+progress. When the loop recovers, the stall is logged as a structured event
+(duration, task, session id, stack) and kept in a short history.
+Tasks inherit the session id of the code that created them through a task
+factory, so stalls inside a voice session are attributed to it
+
+Benchmark: python loop_watchdog.py
+"""
+import asyncio
+import contextvars
+import json
+import logging
+import os
+import sys
+import threading
+import time
+import weakref
+from array import array
+from bisect import bisect_left
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+LOOP_WATCHDOG = os.getenv("LOOP_WATCHDOG", "true").lower() == "true"
+LOOP_PROBE_INTERVAL_MS = float(os.getenv("LOOP_PROBE_INTERVAL_MS", "50"))
+LOOP_STALL_THRESHOLD_MS = float(os.getenv("LOOP_STALL_THRESHOLD_MS", "100"))
+MAX_RECENT_STALLS = 50
+MAX_STACK_DEPTH = 40
+
+# Upper bounds (ms) of the lag histogram buckets; the last bucket is open-ended
+LAG_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000)
+
+_CALLBACK_RUNNER = asyncio.events.Handle._run.__code__
+
+current_session_id: contextvars.ContextVar = contextvars.ContextVar("current_session_id", default=None)
+
+
+class LagHistogram:
+    """Counts per LAG_BUCKETS_MS bucket plus running max and sum"""
+
+    def __init__(self):
+        self.counts = array("q", bytes(8 * (len(LAG_BUCKETS_MS) + 1)))
+        self.total = 0
+        self.sum_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, lag_ms: float) -> None:
+        self.counts[bisect_left(LAG_BUCKETS_MS, lag_ms)] += 1
+        self.total += 1
+        self.sum_ms += lag_ms
+        self.max_ms = max(self.max_ms, lag_ms)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Upper bound of the bucket holding the p-th percentile"""
+        if not self.total:
+            return None
+        rank, seen = p / 100 * self.total, 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if seen >= rank and count:
+                bound = LAG_BUCKETS_MS[index] if index < len(LAG_BUCKETS_MS) else self.max_ms
+                return round(min(bound, self.max_ms), 1)
+        return round(self.max_ms, 1)
+
+    def snapshot(self) -> Dict[str, Any]:
+        labels = [f"<={bound}" for bound in LAG_BUCKETS_MS] + [f">{LAG_BUCKETS_MS[-1]}"]
+        return {
+            "samples": self.total,
+            "mean_ms": round(self.sum_ms / self.total, 2) if self.total else None,
+            "p50_ms": self.percentile(50),
+            "p99_ms": self.percentile(99),
+            "max_ms": round(self.max_ms, 1),
+            "buckets_ms": dict(zip(labels, self.counts))
+        }
+
+
+class LoopWatchdog:
+    """Lag histogram and stall tracer for one event loop"""
+
+    def __init__(self, probe_interval_ms: float = LOOP_PROBE_INTERVAL_MS,
+                 threshold_ms: float = LOOP_STALL_THRESHOLD_MS):
+        self.probe_interval_s = probe_interval_ms / 1000
+        self.threshold_s = threshold_ms / 1000
+        self.histogram = LagHistogram()
+        self.recent: Deque[Dict[str, Any]] = deque(maxlen=MAX_RECENT_STALLS)
+        self.stats = {"stalls": 0, "captured": 0}
+        self._task_sessions: "weakref.WeakKeyDictionary[asyncio.Task, str]" = weakref.WeakKeyDictionary()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._loop_thread = 0
+        self._probe: Optional[asyncio.Task] = None
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._heartbeat = 0.0
+        self._capture: Optional[Dict[str, Any]] = None
+
+    @property
+    def enabled(self) -> bool:
+        return self._probe is not None and not self._probe.done()
+
+    # ------------------------------------------------------------------------
+    # Session attribution
+    # ------------------------------------------------------------------------
+
+    def bind_session(self, session_id: str) -> None:
+        """Attribute the current task, and every task it creates from now on, to a session"""
+        current_session_id.set(session_id)
+        task = asyncio.current_task()
+        if task is not None:
+            self._task_sessions[task] = session_id
+
+    def _task_factory(self, loop, coro, **kwargs):
+        task = asyncio.Task(coro, loop=loop, **kwargs)
+        session_id = current_session_id.get()
+        if session_id is not None:
+            self._task_sessions[task] = session_id
+        return task
+
+    # ------------------------------------------------------------------------
+    # Start / stop (runtime toggle)
+    # ------------------------------------------------------------------------
+
+    def start(self, probe_interval_ms: Optional[float] = None, threshold_ms: Optional[float] = None) -> None:
+        """Start on the running loop; call again with new settings to change them"""
+        if probe_interval_ms is not None:
+            self.probe_interval_s = probe_interval_ms / 1000
+        if threshold_ms is not None:
+            self.threshold_s = threshold_ms / 1000
+        if self.enabled:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._loop_thread = threading.get_ident()
+        if self._loop.get_task_factory() is None:
+            self._loop.set_task_factory(self._task_factory)
+        self._heartbeat = time.monotonic()
+        # A fresh event, so a thread from an earlier start that has not exited yet still stops
+        self._stop = threading.Event()
+        self._probe = asyncio.create_task(self._probe_loop())
+        self._thread = threading.Thread(target=self._watch, args=(self._stop,), name="loop-watchdog", daemon=True)
+        self._thread.start()
+        logger.info(f"🐕 Loop watchdog on: probe every {self.probe_interval_s * 1000:.0f} ms, "
+                    f"stalls over {self.threshold_s * 1000:.0f} ms traced")
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._probe is not None:
+            self._probe.cancel()
+            self._probe = None
+        self._thread = None
+        logger.info("🐕 Loop watchdog off")
+
+    # ------------------------------------------------------------------------
+    # Loop side
+    # ------------------------------------------------------------------------
+
+    async def _probe_loop(self) -> None:
+        while True:
+            expected = time.monotonic() + self.probe_interval_s
+            await asyncio.sleep(self.probe_interval_s)
+            now = time.monotonic()
+            self._heartbeat = now
+            lag_s = max(0.0, now - expected)
+            self.histogram.add(lag_s * 1000)
+            if lag_s >= self.threshold_s:
+                self._report_stall(lag_s)
+
+    def _report_stall(self, lag_s: float) -> None:
+        capture, self._capture = self._capture, None
+        event = {
+            "event": "loop_stall",
+            "duration_ms": round(lag_s * 1000, 1),
+            "at": time.time(),
+            **(capture or {"task": None, "session_id": None, "stack": []})
+        }
+        self.stats["stalls"] += 1
+        self.recent.append(event)
+        logger.warning(f"🐢 Event loop stalled {event['duration_ms']} ms "
+                       f"(task {event['task']}, session {event['session_id']}): {json.dumps(event)}")
+
+    # ------------------------------------------------------------------------
+    # Watchdog thread
+    # ------------------------------------------------------------------------
+
+    def _watch(self, stop: threading.Event) -> None:
+        captured_for = None
+        while not stop.wait(self.threshold_s / 2):
+            heartbeat = self._heartbeat
+            if time.monotonic() - heartbeat < self.probe_interval_s + self.threshold_s:
+                continue
+            if captured_for == heartbeat:
+                continue  # one capture per stall
+            captured_for = heartbeat
+            self._capture = self._capture_stack()
+            self.stats["captured"] += 1
+
+    def _capture_stack(self) -> Dict[str, Any]:
+        frame = sys._current_frames().get(self._loop_thread)
+        stack: List[str] = []
+        # Frames of the loop itself (run_forever, _run_once, Handle._run) are left out
+        while frame is not None and len(stack) < MAX_STACK_DEPTH and frame.f_code is not _CALLBACK_RUNNER:
+            code = frame.f_code
+            stack.append(f"{getattr(code, 'co_qualname', code.co_name)} "
+                         f"({os.path.basename(code.co_filename)}:{frame.f_lineno})")
+            frame = frame.f_back
+        task = getattr(asyncio.tasks, "_current_tasks", {}).get(self._loop)
+        coro = task.get_coro() if task is not None else None
+        return {
+            "task": getattr(coro, "__qualname__", None) or (task.get_name() if task is not None else None),
+            "session_id": self._task_sessions.get(task) if task is not None else None,
+            "stack": stack  # innermost first
+        }
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "probe_interval_ms": self.probe_interval_s * 1000,
+            "threshold_ms": self.threshold_s * 1000,
+            **self.stats,
+            "lag": self.histogram.snapshot()
+        }
+
+
+loop_watchdog = LoopWatchdog()
+
+
+async def _benchmark() -> None:
+    """Watchdog overhead on a busy loop, and a traced stall inside a session task"""
+    async def busy(seconds: float) -> int:
+        ticks, deadline = 0, time.monotonic() + seconds
+        while time.monotonic() < deadline:
+            json.dumps({"type": "response.audio.delta", "delta": "x" * 256})
+            ticks += 1
+            if ticks % 100 == 0:
+                await asyncio.sleep(0)
+        return ticks
+
+    # Best of three 1 s runs each, interleaved, to keep CPU frequency noise out
+    watchdog = LoopWatchdog()
+    baseline = watched = 0
+    for _ in range(3):
+        baseline = max(baseline, await busy(1))
+        watchdog.start()
+        watched = max(watched, await busy(1))
+        watchdog.stop()
+    watchdog.start()
+
+    async def session():
+        watchdog.bind_session("bench-session")
+
+        async def handler():
+            time.sleep(0.3)  # a blocking call inside a task the session created
+
+        await asyncio.create_task(handler())
+
+    await session()
+    await asyncio.sleep(0.2)
+    watchdog.stop()
+
+    stall = watchdog.recent[-1] if watchdog.recent else {}
+    print(f"busy loop throughput: {baseline:,.0f}/s unwatched, {watched:,.0f}/s watched "
+          f"({(watched / baseline - 1) * 100:+.1f}%)")
+    print(f"lag: {json.dumps(watchdog.histogram.snapshot())}")
+    print(f"stall: {stall.get('duration_ms')} ms in task {stall.get('task')} "
+          f"(session {stall.get('session_id')}), innermost frame {(stall.get('stack') or ['-'])[0]}")
+
+
+if __name__ == "__main__":
+    asyncio.run(_benchmark())
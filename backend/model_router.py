@@ -0,0 +1,174 @@
+"""
+Realtime model routing
+Each voice session is routed to a Realtime model when it connects: the
+model pinned in its config if any, the fast model for simple flows (bill
+display, receipts), otherwise the default model. The router keeps the
+time to first audio of recent turns per model; while the default model's
+p95 is above REALTIME_SLO_FIRST_AUDIO_MS, new sessions are downgraded to the
+fast model for ROUTER_COOLDOWN_S. Live sessions keep the model they started on
+
+Benchmark: python model_router.py [sessions]
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, Optional, Tuple
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_REALTIME_MODEL = os.getenv("REALTIME_MODEL", "gpt-4o-realtime-preview")
+FAST_REALTIME_MODEL = os.getenv("REALTIME_FAST_MODEL", "gpt-4o-mini-realtime-preview")
+REALTIME_MODELS = tuple(dict.fromkeys((
+    DEFAULT_REALTIME_MODEL, FAST_REALTIME_MODEL, "gpt-4o-realtime-preview", "gpt-4o-mini-realtime-preview"
+)))
+
+# Per-model upstream URLs, e.g. '{"gpt-4o-mini-realtime-preview": "ws://127.0.0.1:9001/v1/realtime"}';
+# other models use OPENAI_REALTIME_URL with their model query parameter
+REALTIME_MODEL_URLS: Dict[str, str] = json.loads(os.getenv("REALTIME_MODEL_URLS", "{}"))
+
+# Flows (?flow= or the preset name) simple enough for the fast model
+FAST_FLOWS = {"bills", "receipt"}
+
+REALTIME_SLO_FIRST_AUDIO_MS = float(os.getenv("REALTIME_SLO_FIRST_AUDIO_MS", "1200"))  # 0 disables downgrades
+ROUTER_WINDOW_S = float(os.getenv("ROUTER_WINDOW_S", "60"))
+ROUTER_MIN_SAMPLES = int(os.getenv("ROUTER_MIN_SAMPLES", "20"))
+ROUTER_COOLDOWN_S = float(os.getenv("ROUTER_COOLDOWN_S", "60"))
+MAX_SAMPLES_PER_MODEL = 2000
+
+
+def model_url(base_url: str, model: str) -> str:
+    """base_url with its model query parameter set to model"""
+    if model in REALTIME_MODEL_URLS:
+        return REALTIME_MODEL_URLS[model]
+    parts = urlsplit(base_url)
+    query = [(key, value) for key, value in parse_qsl(parts.query) if key != "model"] + [("model", model)]
+    return urlunsplit(parts._replace(query=urlencode(query)))
+
+
+class ModelRouter:
+    """Chooses the Realtime model of new sessions and tracks per-model latency"""
+
+    def __init__(self, default_model: str = DEFAULT_REALTIME_MODEL, fast_model: str = FAST_REALTIME_MODEL,
+                 slo_ms: float = REALTIME_SLO_FIRST_AUDIO_MS, window_s: float = ROUTER_WINDOW_S,
+                 min_samples: int = ROUTER_MIN_SAMPLES, cooldown_s: float = ROUTER_COOLDOWN_S):
+        self.default_model = default_model
+        self.fast_model = fast_model
+        self.slo_ms = slo_ms
+        self.window_s = window_s
+        self.min_samples = min_samples
+        self.cooldown_s = cooldown_s
+        # (monotonic time, first audio ms) per model, oldest first
+        self._samples: Dict[str, Deque[Tuple[float, float]]] = {}
+        self._downgraded_until = 0.0
+        self.routed: Counter = Counter()  # (model, reason) -> sessions
+
+    def choose(self, pinned_model: Optional[str] = None, flow: Optional[str] = None) -> Tuple[str, str]:
+        """(model, reason) for a new session"""
+        if pinned_model:
+            model, reason = pinned_model, "config"
+        elif flow in FAST_FLOWS:
+            model, reason = self.fast_model, f"flow:{flow}"
+        elif self.downgraded():
+            model, reason = self.fast_model, "slo"
+        else:
+            model, reason = self.default_model, "default"
+        self.routed[(model, reason)] += 1
+        return model, reason
+
+    def observe(self, model: str, first_audio_ms: float) -> None:
+        """Time to first audio of one turn"""
+        samples = self._samples.get(model)
+        if samples is None:
+            samples = self._samples[model] = deque(maxlen=MAX_SAMPLES_PER_MODEL)
+        samples.append((time.monotonic(), first_audio_ms))
+
+    def p95_ms(self, model: str) -> Optional[float]:
+        """p95 time to first audio within the window, None with too few samples"""
+        samples = self._samples.get(model)
+        if not samples:
+            return None
+        horizon = time.monotonic() - self.window_s
+        while samples and samples[0][0] < horizon:
+            samples.popleft()
+        if len(samples) < self.min_samples:
+            return None
+        ordered = sorted(ms for _, ms in samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))]
+
+    def downgraded(self) -> bool:
+        now = time.monotonic()
+        if now < self._downgraded_until:
+            return True
+        if self.slo_ms <= 0 or self.fast_model == self.default_model:
+            return False
+        p95 = self.p95_ms(self.default_model)
+        if p95 is not None and p95 > self.slo_ms:
+            self._downgraded_until = now + self.cooldown_s
+            logger.warning(f"📉 {self.default_model} p95 time to first audio {p95:.0f} ms > SLO {self.slo_ms:.0f} ms: "
+                           f"new sessions use {self.fast_model} for {self.cooldown_s:.0f} s")
+            return True
+        return False
+
+    def snapshot(self) -> Dict[str, Any]:
+        models = dict.fromkeys([self.default_model, self.fast_model, *self._samples])
+        return {
+            "default_model": self.default_model,
+            "fast_model": self.fast_model,
+            "slo_first_audio_ms": self.slo_ms,
+            "downgraded": self.downgraded(),
+            "p95_first_audio_ms": {model: self.p95_ms(model) for model in models},
+            "routed": [{"model": model, "reason": reason, "sessions": count}
+                       for (model, reason), count in self.routed.most_common()]
+        }
+
+
+model_router = ModelRouter()
+
+
+async def _benchmark(sessions: int) -> None:
+    """Two fake upstreams: bills sessions go to the fast one, default sessions are downgraded on an SLO breach"""
+    import app
+    import model_router as routing  # the module app uses, not __main__
+    from bench_engines import measure
+    from fake_realtime import FakeRealtimeServer
+
+    logging.getLogger().setLevel(logging.WARNING)
+    slow = FakeRealtimeServer(response_latency_ms=900)
+    fast = FakeRealtimeServer(response_latency_ms=250)
+    app.OPENAI_REALTIME_URL = "ws://127.0.0.1:9/v1/realtime"  # only the two fakes are reachable
+    routing.REALTIME_MODEL_URLS[DEFAULT_REALTIME_MODEL] = await slow.start()
+    routing.REALTIME_MODEL_URLS[FAST_REALTIME_MODEL] = await fast.start()
+    app.openai_api_key = app.openai_api_key or "bench"
+    app.model_router = router = ModelRouter(slo_ms=700, min_samples=10, cooldown_s=30)
+
+    async def session(index: int, flow: Optional[str]) -> Tuple[str, float]:
+        session_id = f"bench-route-{flow}-{index}"
+        app.active_sessions[session_id] = {"pacing": False, "flow": flow}
+
+        async def realtime(client):
+            await app.proxy_openai_realtime(client, session_id, app.VoiceSessionConfig())
+
+        samples = await measure(realtime, 3)
+        model = app.active_sessions.pop(session_id)["model"]
+        return model, sum(samples) / len(samples)
+
+    print(f"Fake upstreams: {DEFAULT_REALTIME_MODEL} 900 ms, {FAST_REALTIME_MODEL} 250 ms; SLO 700 ms")
+    for label, flow in (("bills flow", "bills"), ("default flow, 1st wave", None), ("default flow, 2nd wave", None)):
+        results = await asyncio.gather(*(session(i, flow) for i in range(sessions)))
+        models = Counter(model for model, _ in results)
+        mean = sum(ms for _, ms in results) / len(results)
+        print(f"  {label:<24} {dict(models)}  mean first audio {mean:5.0f} ms")
+    snapshot = router.snapshot()
+    print(f"  downgraded={snapshot['downgraded']} p95={snapshot['p95_first_audio_ms']}")
+    print(f"  routed={snapshot['routed']}")
+    await slow.stop()
+    await fast.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 5))
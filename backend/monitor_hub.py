@@ -0,0 +1,251 @@
+"""
+Supervisor monitoring feed
+Voice sessions publish a few events per turn to the hub: caller and
+assistant transcripts, tool calls and results, upstream errors, session
+start and end. Each event is serialized once and the same frame is queued
+for every supervisor watching that session (all sessions or selected ones).
+Queues are bounded per subscriber: when a supervisor's socket falls behind,
+its oldest frames are dropped and counted, so publishing never waits on a
+monitor. With nobody watching a session, publishing it is a set lookup
+
+Benchmark: python monitor_hub.py [subscribers]
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+MONITOR_QUEUE_SIZE = int(os.getenv("MONITOR_QUEUE_SIZE", "256"))  # frames per subscriber
+MONITOR_MAX_SUBSCRIBERS = int(os.getenv("MONITOR_MAX_SUBSCRIBERS", "50"))
+
+# Upstream Realtime events relayed to supervisors, by monitor event type
+MONITORED_EVENTS = {
+    "conversation.item.input_audio_transcription.completed": "transcript.caller",
+    "response.audio_transcript.done": "transcript.assistant",
+    "error": "error",
+}
+
+
+def parse_sessions(value: Any) -> Optional[Set[str]]:
+    """?sessions=a,b or a JSON list -> session ids; empty, "all" or None -> every session"""
+    if value is None or value == "all":
+        return None
+    if isinstance(value, str):
+        value = value.split(",")
+    sessions = {str(session_id).strip() for session_id in value if str(session_id).strip()}
+    return sessions or None
+
+
+class Subscriber:
+    """One supervisor connection: the sessions it watches and its bounded frame queue"""
+
+    def __init__(self, sessions: Optional[Set[str]] = None, queue_size: int = MONITOR_QUEUE_SIZE):
+        self.sessions = sessions  # None watches every session
+        self.frames: Deque[str] = deque(maxlen=queue_size)
+        self._pending = asyncio.Event()
+        self.stats = {"queued": 0, "dropped": 0}
+
+    def offer(self, frame: str) -> None:
+        """Queue a frame, dropping the oldest when full; never blocks"""
+        if len(self.frames) == self.frames.maxlen:
+            self.stats["dropped"] += 1
+        self.frames.append(frame)
+        self.stats["queued"] += 1
+        self._pending.set()
+
+    async def next_frames(self) -> List[str]:
+        """Every frame queued since the last call, waiting for at least one"""
+        await self._pending.wait()
+        self._pending.clear()
+        frames = list(self.frames)
+        self.frames.clear()
+        return frames
+
+
+class MonitorHub:
+    """Fans session events out to the subscribers watching each session"""
+
+    def __init__(self, max_subscribers: int = MONITOR_MAX_SUBSCRIBERS, queue_size: int = MONITOR_QUEUE_SIZE):
+        self.max_subscribers = max_subscribers
+        self.queue_size = queue_size
+        self.subscribers: Set[Subscriber] = set()
+        # Index by watched session, so a publish touches only its own watchers
+        self._all: Set[Subscriber] = set()
+        self._by_session: Dict[str, Set[Subscriber]] = {}
+        self.stats = {"published": 0, "frames": 0}
+
+    # ---- subscriptions ----------------------------------------------------
+
+    def subscribe(self, sessions: Optional[Set[str]] = None) -> Optional[Subscriber]:
+        """A new subscriber, or None when MONITOR_MAX_SUBSCRIBERS are connected"""
+        if len(self.subscribers) >= self.max_subscribers:
+            return None
+        subscriber = Subscriber(queue_size=self.queue_size)
+        self.subscribers.add(subscriber)
+        self.watch(subscriber, sessions)
+        return subscriber
+
+    def watch(self, subscriber: Subscriber, sessions: Optional[Set[str]]) -> None:
+        """Change the sessions a subscriber watches (None: all)"""
+        self._unindex(subscriber)
+        subscriber.sessions = sessions
+        if sessions is None:
+            self._all.add(subscriber)
+        else:
+            for session_id in sessions:
+                self._by_session.setdefault(session_id, set()).add(subscriber)
+
+    def unsubscribe(self, subscriber: Subscriber) -> None:
+        self._unindex(subscriber)
+        self.subscribers.discard(subscriber)
+        if subscriber.stats["dropped"]:
+            logger.warning(f"👀 Monitor subscriber dropped {subscriber.stats['dropped']} of "
+                           f"{subscriber.stats['queued']} frames (slow consumer)")
+
+    def _unindex(self, subscriber: Subscriber) -> None:
+        self._all.discard(subscriber)
+        for session_id in subscriber.sessions or ():
+            watchers = self._by_session.get(session_id)
+            if watchers is not None:
+                watchers.discard(subscriber)
+                if not watchers:
+                    del self._by_session[session_id]
+
+    # ---- publishing -------------------------------------------------------
+
+    def watching(self, session_id: str) -> bool:
+        """Whether anyone would receive events of this session"""
+        return bool(self._all) or session_id in self._by_session
+
+    def publish(self, session_id: str, event_type: str, **fields) -> None:
+        """Serialize one event once and queue it for every watcher of the session"""
+        watchers = self._by_session.get(session_id, ())
+        if not self._all and not watchers:
+            return
+        frame = json.dumps({"type": event_type, "session_id": session_id, "ts": round(time.time(), 3), **fields})
+        self.stats["published"] += 1
+        self.stats["frames"] += len(self._all) + len(watchers)
+        for subscriber in self._all:
+            subscriber.offer(frame)
+        for subscriber in watchers:
+            subscriber.offer(frame)
+
+    def publish_upstream(self, session_id: str, event_type: str, message: str) -> None:
+        """Relay a MONITORED_EVENTS upstream event; parsed only when someone watches"""
+        if not self.watching(session_id):
+            return
+        data = json.loads(message)
+        if event_type == "error":
+            self.publish(session_id, "error", message=data.get("error", {}).get("message"))
+        else:
+            self.publish(session_id, MONITORED_EVENTS[event_type],
+                         item_id=data.get("item_id"), text=data.get("transcript"))
+
+    def publish_tool_result(self, session_id: str, name: str, call_id: Optional[str], result: Dict,
+                            duplicate: bool = False) -> None:
+        """Outcome of a backend tool call; results themselves stay out of the feed"""
+        if self.watching(session_id):
+            self.publish(session_id, "tool.result", name=name, call_id=call_id, success=result.get("success"),
+                         error=result.get("error"), duplicate=duplicate)
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "subscribers": len(self.subscribers),
+            "watching_all": len(self._all),
+            "watched_sessions": len(self._by_session),
+            **self.stats,
+            "dropped": sum(subscriber.stats["dropped"] for subscriber in self.subscribers)
+        }
+
+
+monitor_hub = MonitorHub()
+
+
+async def _drain(subscriber: Subscriber, delay_s: float, received: List[int]) -> None:
+    """A supervisor socket that takes delay_s per frame (0: keeps up)"""
+    while True:
+        for _ in await subscriber.next_frames():
+            received[0] += 1
+            if delay_s:
+                await asyncio.sleep(delay_s)
+
+
+async def _benchmark(subscribers: int) -> None:
+    """Publish cost on the caller's path, fan-out, slow consumers, and voice turns with supervisors watching"""
+    import app
+    from bench_engines import measure
+    from fake_realtime import FakeRealtimeServer
+
+    logging.getLogger().setLevel(logging.ERROR)
+    event = {"item_id": "item_0123456789ab", "text": "I would like to view my bills and pay the oldest one"}
+    n = 20000
+
+    hub = MonitorHub(max_subscribers=subscribers + 1)
+    started = time.perf_counter()
+    for _ in range(n):
+        hub.publish("unwatched", "transcript.caller", **event)
+    print(f"publish, nobody watching:            {(time.perf_counter() - started) / n * 1e9:7.0f} ns")
+
+    for _ in range(subscribers):
+        hub.subscribe()
+    started = time.perf_counter()
+    for _ in range(n // 10):
+        hub.publish("s1", "transcript.caller", **event)
+    hub_us = (time.perf_counter() - started) / (n // 10) * 1e6
+    started = time.perf_counter()
+    for _ in range(n // 10):
+        # Without the hub: one serialization per subscriber
+        for _ in range(subscribers):
+            json.dumps({"type": "transcript.caller", "session_id": "s1", "ts": round(time.time(), 3), **event})
+    naive_us = (time.perf_counter() - started) / (n // 10) * 1e6
+    print(f"publish to {subscribers} subscribers:            {hub_us:7.1f} µs  "
+          f"(serializing per subscriber: {naive_us:7.1f} µs)")
+
+    # One stalled supervisor among fast ones: it loses its oldest frames, the others get everything
+    hub = MonitorHub(max_subscribers=subscribers + 1, queue_size=64)
+    counts = [[0] for _ in range(subscribers + 1)]
+    tasks = [asyncio.create_task(_drain(hub.subscribe(), 0, counts[i])) for i in range(subscribers)]
+    slow = hub.subscribe()
+    tasks.append(asyncio.create_task(_drain(slow, 0.01, counts[-1])))
+    worst_us = 0.0
+    for i in range(2000):
+        started = time.perf_counter()
+        hub.publish(f"s{i % 10}", "transcript.caller", **event)
+        worst_us = max(worst_us, (time.perf_counter() - started) * 1e6)
+        if i % 20 == 0:
+            await asyncio.sleep(0)
+    await asyncio.sleep(0.05)
+    print(f"2,000 events, {subscribers} fast + 1 slow subscriber: fast received "
+          f"{min(count[0] for count in counts[:-1]):,} each, slow received {counts[-1][0]:,} "
+          f"and dropped {slow.stats['dropped']:,}; worst publish {worst_us:.0f} µs")
+    for task in tasks:
+        task.cancel()
+
+    # Voice turns through the proxy with and without supervisors watching every session
+    upstream = FakeRealtimeServer(response_latency_ms=300)
+    app.OPENAI_REALTIME_URL = await upstream.start()
+    app.openai_api_key = app.openai_api_key or "bench"
+    for label, watchers in (("no supervisors", 0), (f"{subscribers} supervisors", subscribers)):
+        app.monitor_hub = hub = MonitorHub(max_subscribers=watchers)
+        received = [0]
+        tasks = [asyncio.create_task(_drain(hub.subscribe(), 0, received)) for _ in range(watchers)]
+
+        async def realtime(client):
+            await app.proxy_openai_realtime(client, f"bench-monitor-{watchers}", app.VoiceSessionConfig())
+
+        samples = sorted(await measure(realtime, 10))
+        print(f"voice turns, {label:<16} p50 first audio {samples[len(samples) // 2]:6.1f} ms  "
+              f"max {samples[-1]:6.1f} ms  ({received[0]:,} frames delivered)")
+        for task in tasks:
+            task.cancel()
+    await upstream.stop()
+
+
+if __name__ == "__main__":
+    asyncio.run(_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 20))
@@ -0,0 +1,293 @@
+"""
+Idempotent payment execution
+Side-effecting tools (process_payment, select_payment_plan) run at most once
+per operation: results are indexed by call_id and by an operation key of
+(session, bill, amount, plan), so a call the model re-issues after a barge-in
+or retry is answered from the index instead of running again. Every executed
+payment is appended to a group-committed ledger before it is returned, and
+processed payments are recorded in the transaction store for receipts
+"""
+import asyncio
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, List, Optional, Tuple
+
+from bills_cache import bills_cache
+from plan_engine import to_cents
+from rate_limiter import RateLimiter
+from tools import CALLER_SCOPED_TOOLS, execute_tool, find_bill
+from transactions import TransactionStore
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENT_TOOLS = ("process_payment", "select_payment_plan")
+
+# How long an executed operation is remembered, and how many keys are kept
+IDEMPOTENCY_TTL_S = float(os.getenv("PAYMENT_IDEMPOTENCY_TTL_S", "900"))
+MAX_IDEMPOTENCY_KEYS = 10000
+
+LEDGER_PATH = os.getenv(
+    "PAYMENT_LEDGER_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "payment_ledger.jsonl")
+)
+MAX_COMMIT_BATCH = 512
+
+
+class PaymentLedger:
+    """
+    Append-only JSON-lines ledger
+    Appends that arrive while a write is in flight are committed together with
+    a single write + fsync (group commit); append() returns once durable
+    """
+
+    def __init__(self, path: str = LEDGER_PATH, fsync: bool = True):
+        self.path = path
+        self.fsync = fsync
+        self._queue: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._writer: Optional[asyncio.Task] = None
+        self._file = None
+        self.stats = {"records": 0, "commits": 0}
+
+    async def append(self, record: Dict[str, Any]) -> None:
+        future = asyncio.get_running_loop().create_future()
+        self._queue.append((record, future))
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._commit_loop())
+        await asyncio.shield(future)
+
+    async def _commit_loop(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._queue:
+            batch, self._queue = self._queue[:MAX_COMMIT_BATCH], self._queue[MAX_COMMIT_BATCH:]
+            data = "".join(json.dumps(record, separators=(",", ":")) + "\n" for record, _ in batch)
+            try:
+                await loop.run_in_executor(None, self._write, data)
+            except Exception as e:
+                logger.error(f"❌ Ledger commit of {len(batch)} records failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.stats["records"] += len(batch)
+            self.stats["commits"] += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+    def _write(self, data: str) -> None:
+        if self._file is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._file = open(self.path, "a", encoding="utf-8")
+        self._file.write(data)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+
+    def read(self) -> List[Dict[str, Any]]:
+        """All committed records, oldest first (a torn last line is skipped)"""
+        if not os.path.exists(self.path):
+            return []
+        records = []
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    records.append(json.loads(line))
+                except json.JSONDecodeError:
+                    logger.warning(f"⚠️ Skipping unreadable ledger line in {self.path}")
+        return records
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            await self._writer
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class IdempotencyIndex:
+    """Key → value map bounded by a TTL and a maximum size (oldest evicted first)"""
+
+    def __init__(self, ttl_s: float = IDEMPOTENCY_TTL_S, max_keys: int = MAX_IDEMPOTENCY_KEYS):
+        self.ttl_s = ttl_s
+        self.max_keys = max_keys
+        self._entries: "OrderedDict[Hashable, Tuple[float, Any]]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable) -> Any:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del self._entries[key]
+            return None
+        return entry[1]
+
+    def put(self, key: Hashable, value: Any) -> None:
+        now = time.monotonic()
+        self._entries[key] = (now + self.ttl_s, value)
+        self._entries.move_to_end(key)
+        # Entries share one TTL, so expiry order is insertion order
+        while self._entries:
+            oldest_key, (expires_at, _) = next(iter(self._entries.items()))
+            if expires_at >= now and len(self._entries) <= self.max_keys:
+                break
+            del self._entries[oldest_key]
+
+    def discard(self, *keys: Hashable) -> None:
+        for key in keys:
+            self._entries.pop(key, None)
+
+
+class PaymentExecutor:
+    """Runs IDEMPOTENT_TOOLS at most once per call_id and per operation"""
+
+    def __init__(self, ledger: Optional[PaymentLedger] = None, executor: Callable = execute_tool,
+                 ttl_s: float = IDEMPOTENCY_TTL_S, max_keys: int = MAX_IDEMPOTENCY_KEYS,
+                 transactions: Optional[TransactionStore] = None, limiter: Optional[RateLimiter] = None):
+        self.ledger = ledger
+        self.transactions = transactions
+        self.limiter = limiter
+        self.executor = executor
+        self.index = IdempotencyIndex(ttl_s, max_keys)
+        # Per-session state for as long as the session lives: verified account and
+        # selected plan by bill. Kept out of the index so it does not expire mid-call
+        self.sessions: Dict[str, Dict[str, Any]] = {}
+        self.stats = {"executed": 0, "duplicates": 0}
+
+    @staticmethod
+    def handles(name: str) -> bool:
+        return name in IDEMPOTENT_TOOLS
+
+    def remember_account(self, session_id: str, account_id: str) -> None:
+        """Account looked up in a session; its payments are recorded against it"""
+        self.sessions.setdefault(session_id, {"plans": {}})["account_id"] = account_id
+
+    def account_of(self, session_id: str) -> Optional[str]:
+        return self.sessions.get(session_id, {}).get("account_id")
+
+    def plan_of(self, session_id: str, bill_id: Optional[str]) -> Optional[str]:
+        return self.sessions.get(session_id, {}).get("plans", {}).get(bill_id)
+
+    def forget_session(self, session_id: str) -> None:
+        """Drop the state of a closed session"""
+        self.sessions.pop(session_id, None)
+
+    def caller(self, session_id: str) -> Dict[str, Any]:
+        """Scope for CALLER_SCOPED_TOOLS: the session and the account it verified"""
+        return {"session_id": session_id, "account_id": self.account_of(session_id)}
+
+    def operation_key(self, session_id: str, name: str, args: Dict[str, Any]) -> Tuple:
+        bill = find_bill(args.get("bill_id"))
+        bill_id = bill["id"] if bill else args.get("bill_id")
+        if name == "select_payment_plan":
+            return ("op", session_id, name, bill_id, args.get("plan_id"))
+        try:
+            amount_cents = to_cents(args.get("amount") or 0)
+        except Exception:
+            amount_cents = args.get("amount")
+        plan_id = self.plan_of(session_id, bill_id)
+        return ("op", session_id, name, bill_id, amount_cents, plan_id)
+
+    async def execute(self, session_id: str, name: str, call_id: Optional[str],
+                      arguments_str: str) -> Tuple[Dict[str, Any], bool]:
+        """Run the tool, or return the earlier result; the flag is True for duplicates"""
+        try:
+            args = json.loads(arguments_str or "{}")
+        except json.JSONDecodeError:
+            args = {}
+
+        call_key = ("call", call_id) if call_id else None
+        op_key = self.operation_key(session_id, name, args)
+        existing = (self.index.get(call_key) if call_key else None) or self.index.get(op_key)
+        if existing is not None:
+            self.stats["duplicates"] += 1
+            result = await asyncio.shield(existing)
+            logger.info(f"♻️ Duplicate {name} (call {call_id}) answered from idempotency index")
+            return {**result, "duplicate": True}, True
+
+        # Register before running so concurrent duplicates wait for this execution
+        future = asyncio.get_running_loop().create_future()
+        keys = [key for key in (call_key, op_key) if key]
+        for key in keys:
+            self.index.put(key, future)
+
+        try:
+            result = await self.executor(name, json.dumps(args))
+        except BaseException as e:
+            # Duplicates waiting on this execution get a failed result rather than
+            # the exception; only this caller sees it
+            self.index.discard(*keys)
+            future.set_result({"success": False, "error": f"{name} did not complete: {type(e).__name__}"})
+            raise
+        # Answer waiting duplicates now: the bookkeeping below awaits, and a
+        # cancelled session must not leave the future pending in the index
+        future.set_result(result)
+
+        if not result.get("success"):
+            # Failed calls are not remembered, so a corrected retry runs again
+            self.index.discard(*keys)
+        else:
+            self.stats["executed"] += 1
+            if name == "select_payment_plan":
+                plans = self.sessions.setdefault(session_id, {"plans": {}})["plans"]
+                plans[result.get("bill_id")] = args.get("plan_id")
+            # Bills of the account change with its payments and plans; invalidating
+            # again after the write keeps a lookup racing with it from being cached
+            account_id = self.account_of(session_id)
+            bills_cache.invalidate(account_id)
+            if name == "process_payment" and self.transactions is not None:
+                await self._record_transaction(session_id, args, result)
+                bills_cache.invalidate(account_id)
+            if self.ledger is not None:
+                try:
+                    await self.ledger.append({
+                        "ts": time.time(),
+                        "session_id": session_id,
+                        "call_id": call_id,
+                        "tool": name,
+                        "arguments": args,
+                        "result": result
+                    })
+                except Exception as e:
+                    logger.error(f"❌ {name} for session {session_id} executed but not recorded in ledger: {e}")
+        return result, False
+
+    async def _record_transaction(self, session_id: str, args: Dict[str, Any], result: Dict[str, Any]) -> None:
+        bill = find_bill(result.get("bill_id"))
+        try:
+            await self.transactions.add({
+                "transaction_id": result["transaction_id"],
+                "account_id": self.account_of(session_id),
+                "session_id": session_id,
+                "bill_id": bill["id"] if bill else result.get("bill_id"),
+                "provider": bill["provider"] if bill else None,
+                "amount": result.get("amount"),
+                "payment_method": args.get("payment_method"),
+                "plan_id": self.plan_of(session_id, bill["id"] if bill else result.get("bill_id"))
+            })
+        except Exception as e:
+            logger.error(f"❌ Transaction {result.get('transaction_id')} not stored: {e}")
+
+    def bind(self, session_id: str) -> Callable:
+        """tool_executor for one session: idempotent tools go through this executor"""
+        async def run(name: str, arguments: str) -> Dict[str, Any]:
+            if self.handles(name):
+                result, _ = await self.execute(session_id, name, None, arguments)
+                return result
+            if self.limiter is not None:
+                denied = await self.limiter.check_tool(name, session_id, self.account_of(session_id))
+                if denied is not None:
+                    return denied
+            if name in CALLER_SCOPED_TOOLS:
+                result = await self.executor(name, arguments, self.caller(session_id))
+            else:
+                result = await self.executor(name, arguments)
+            if name == "lookup_account" and result.get("success"):
+                self.remember_account(session_id, result["account"]["id"])
+            return result
+        return run
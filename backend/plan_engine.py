@@ -0,0 +1,231 @@
+"""
+Payment plan computation engine
+Prices every (bill amount × plan) pair of the plan catalog in one vectorized
+NumPy pass. Amounts enter as exact integer cents and monthly/final payments
+leave as exact cents, so every schedule sums to its total cost to the cent.
+Quotes are cached per (amount, catalog version)
+
+Benchmark: python plan_engine.py [n_amounts]
+"""
+import logging
+import sys
+import time
+from collections import OrderedDict
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Plans offered on CareCredit-style financing; min_amount gates eligibility
+DEFAULT_PLAN_CATALOG: List[Dict[str, Any]] = [
+    {"id": "plan_6mo", "type": "no_interest", "months": 6, "apr": 0.0, "min_amount": 0,
+     "label": "6 Months No Interest", "details": "No interest if paid in full within 6 months"},
+    {"id": "plan_12mo", "type": "no_interest", "months": 12, "apr": 0.0, "min_amount": 500,
+     "label": "12 Months No Interest", "details": "No interest if paid in full within 12 months"},
+    {"id": "plan_18mo", "type": "no_interest", "months": 18, "apr": 0.0, "min_amount": 1000,
+     "label": "18 Months No Interest", "details": "No interest if paid in full within 18 months"},
+    {"id": "plan_24mo_reduced", "type": "reduced_apr", "months": 24, "apr": 0.149, "min_amount": 1000,
+     "label": "24 Months Reduced APR", "details": "14.90% APR for 24 months"},
+]
+
+# Quotes kept per (amount in cents, catalog version)
+MAX_CACHED_QUOTES = 10000
+
+
+def to_cents(amount: Any) -> int:
+    """Exact conversion of a dollar amount to integer cents (half-up)"""
+    return int((Decimal(str(amount)) * 100).quantize(Decimal("1"), rounding=ROUND_HALF_UP))
+
+
+def _round_half_up(values: np.ndarray) -> np.ndarray:
+    # Tolerance absorbs float noise so values like x.5 - 1e-12 still round up
+    return np.floor(values + 0.5 + 1e-9).astype(np.int64)
+
+
+class PlanCatalog:
+    """Plan definitions as parallel arrays, versioned for cache invalidation"""
+
+    def __init__(self, plans: List[Dict[str, Any]], version: int = 1):
+        self.plans = plans
+        self.version = version
+        self.index = {plan["id"]: i for i, plan in enumerate(plans)}
+        self.months = np.array([plan["months"] for plan in plans], dtype=np.int64)
+        self.monthly_rates = np.array([plan["apr"] / 12 for plan in plans], dtype=np.float64)
+        self.min_cents = np.array([to_cents(plan["min_amount"]) for plan in plans], dtype=np.int64)
+
+
+class PlanEngine:
+    """Vectorized pricing of payment plans with a per-amount quote cache"""
+
+    def __init__(self, plans: Optional[List[Dict[str, Any]]] = None):
+        self.catalog = PlanCatalog(plans or DEFAULT_PLAN_CATALOG)
+        self._cache: "OrderedDict[tuple, List[Dict[str, Any]]]" = OrderedDict()
+        self.stats = {"hits": 0, "misses": 0}
+
+    def set_catalog(self, plans: List[Dict[str, Any]]) -> int:
+        """Replace the catalog (e.g. after an APR change); cached quotes become stale"""
+        self.catalog = PlanCatalog(plans, self.catalog.version + 1)
+        self._cache.clear()
+        logger.info(f"💳 Plan catalog updated to version {self.catalog.version}")
+        return self.catalog.version
+
+    def price(self, amount_cents: np.ndarray) -> Dict[str, np.ndarray]:
+        """
+        Price all amounts against all plans at once
+        Returns (n_amounts × n_plans) integer-cent arrays plus the eligibility mask
+        """
+        catalog = self.catalog
+        amounts = np.asarray(amount_cents, dtype=np.int64)[:, None]
+        principal = amounts.astype(np.float64)
+        months = catalog.months[None, :]
+        rate = catalog.monthly_rates[None, :]
+
+        # Level payment P = A·r / (1 - (1 + r)^-n), or A / n without interest
+        interest_free = rate == 0
+        safe_rate = np.where(interest_free, 1.0, rate)
+        annuity = safe_rate / (1 - np.power(1 + safe_rate, -months))
+        payment = np.where(interest_free, principal / months, principal * annuity)
+        monthly = _round_half_up(payment)
+        # Rounding up must leave the final interest-free payment at least a cent
+        most = (amounts - 1) // np.maximum(months - 1, 1)
+        monthly = np.where(interest_free & (months > 1), np.minimum(monthly, most), monthly)
+
+        # Interest-free plans: the final payment absorbs the rounding remainder
+        final = amounts - monthly * (months - 1)
+
+        # Interest-bearing plans: walk the balance month by month (vectorized over
+        # every amount), rounding interest to the cent exactly like the schedule
+        cols = np.flatnonzero(catalog.monthly_rates)
+        if cols.size:
+            col_rate = rate[:, cols]
+            col_months = months[:, cols]
+            col_monthly = monthly[:, cols].astype(np.float64)
+            balance = np.repeat(principal, cols.size, axis=1)
+            for month in range(1, int(col_months.max())):
+                step = balance + np.floor(balance * col_rate + 0.5 + 1e-9) - col_monthly
+                balance = np.where(month < col_months, step, balance)
+            final[:, cols] = _round_half_up(balance + balance * col_rate)
+
+        total = monthly * (months - 1) + final
+        # At least one cent per instalment
+        eligible = (amounts >= catalog.min_cents[None, :]) & (amounts >= months)
+        return {"monthly": monthly, "final": final, "total": total, "eligible": eligible}
+
+    def quote(self, amounts: Iterable[Any]) -> List[List[Dict[str, Any]]]:
+        """Eligible plans with exact figures for each amount (cached per amount and catalog version)"""
+        cents = [to_cents(amount) for amount in amounts]
+        version = self.catalog.version
+        results: List[Optional[List[Dict[str, Any]]]] = []
+        missing: Dict[int, List[int]] = {}
+        for position, value in enumerate(cents):
+            cached = self._cache.get((value, version))
+            if cached is not None:
+                self._cache.move_to_end((value, version))
+                self.stats["hits"] += 1
+            else:
+                missing.setdefault(value, []).append(position)
+            results.append(cached)
+
+        if missing:
+            self.stats["misses"] += len(missing)
+            unique = np.fromiter(missing.keys(), dtype=np.int64, count=len(missing))
+            priced = self.price(unique)
+            for row, value in enumerate(unique.tolist()):
+                plans = self._build_quotes(value, priced, row)
+                self._cache[(value, version)] = plans
+                for position in missing[value]:
+                    results[position] = plans
+            while len(self._cache) > MAX_CACHED_QUOTES:
+                self._cache.popitem(last=False)
+        return results
+
+    def _build_quotes(self, amount_cents: int, priced: Dict[str, np.ndarray], row: int) -> List[Dict[str, Any]]:
+        plans = []
+        for col, plan in enumerate(self.catalog.plans):
+            if not priced["eligible"][row, col]:
+                continue
+            total = int(priced["total"][row, col])
+            plans.append({
+                "id": plan["id"],
+                "type": plan["type"],
+                "months": plan["months"],
+                "apr": plan["apr"],
+                "monthlyPayment": int(priced["monthly"][row, col]) / 100,
+                "finalPayment": int(priced["final"][row, col]) / 100,
+                "totalCost": total / 100,
+                "totalInterest": (total - amount_cents) / 100,
+                "label": plan["label"],
+                "details": plan["details"]
+            })
+        return plans
+
+    def find_plan(self, amount: Any, plan_id: str) -> Optional[Dict[str, Any]]:
+        return next((plan for plan in self.quote([amount])[0] if plan["id"] == plan_id), None)
+
+    def schedule(self, amount: Any, plan_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Month-by-month amortization schedule for one amount and plan"""
+        plan = self.find_plan(amount, plan_id)
+        if plan is None:
+            return None
+        months = plan["months"]
+        rate = self.catalog.monthly_rates[self.catalog.index[plan_id]]
+        payments = np.full(months, to_cents(plan["monthlyPayment"]), dtype=np.int64)
+        payments[-1] = to_cents(plan["finalPayment"])
+
+        # Interest accrues on the running balance, rounded to the cent each month
+        balance = to_cents(amount)
+        rows = []
+        for month, payment in enumerate(payments.tolist(), start=1):
+            interest = int(_round_half_up(np.array([balance * rate]))[0]) if rate else 0
+            principal = payment - interest
+            balance = max(balance - principal, 0)
+            rows.append({
+                "month": month,
+                "payment": payment / 100,
+                "principal": principal / 100,
+                "interest": interest / 100,
+                "balance": balance / 100
+            })
+        return rows
+
+
+plan_engine = PlanEngine()
+
+
+def _benchmark(n: int) -> None:
+    engine = PlanEngine()
+    rng = np.random.default_rng(7)
+    amounts = rng.integers(5000, 2_000_000, size=n)  # $50 - $20,000 in cents
+
+    started = time.perf_counter()
+    priced = engine.price(amounts)
+    vectorized_s = time.perf_counter() - started
+    pairs = priced["monthly"].size
+
+    sample = amounts[:min(n, 20000)]
+    started = time.perf_counter()
+    for value in sample.tolist():
+        for plan in engine.catalog.plans:
+            rate = plan["apr"] / 12
+            months = plan["months"]
+            if rate:
+                float(Decimal(value) * Decimal(rate) / (1 - (1 + Decimal(rate)) ** -months))
+            else:
+                float(Decimal(value) / months)
+    loop_s = (time.perf_counter() - started) * n / len(sample)
+
+    started = time.perf_counter()
+    engine.set_catalog([{**plan, "apr": plan["apr"] + 0.01 if plan["apr"] else 0.0} for plan in engine.catalog.plans])
+    engine.price(amounts)
+    reprice_s = time.perf_counter() - started
+
+    print(f"Priced {n:,} amounts × {len(engine.catalog.plans)} plans = {pairs:,} quotes")
+    print(f"  vectorized:           {vectorized_s * 1000:9.1f} ms ({pairs / vectorized_s / 1e6:.1f} M quotes/s)")
+    print(f"  per-item Decimal loop: {loop_s * 1000:9.1f} ms (extrapolated)")
+    print(f"  APR change + reprice: {reprice_s * 1000:9.1f} ms")
+
+
+if __name__ == "__main__":
+    _benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1_000_000)
@@ -0,0 +1,295 @@
+"""
+Token-bucket rate limiting
+Each limited resource has a burst size and a refill rate (RATE_LIMITS), and a
+bucket per key: client address for new voice sessions, session and account
+id for outbound email. A check is O(1): refill by elapsed time, take a token
+or report how long until one is available. The memory backend keeps buckets
+in a dict of the worker; the SQLite backend keeps them in one table shared by
+all workers on the host, updated with a single atomic upsert per check on a
+dedicated thread. RATE_LIMIT_BACKEND selects it (serve.py picks sqlite when it
+starts several workers)
+
+Benchmark: python rate_limiter.py [checks]
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# resource: (burst, tokens per second); override with RATE_LIMITS='{"voice_session_ip": [20, 0.5]}'
+RATE_LIMITS: Dict[str, Tuple[float, float]] = {
+    "voice_session_ip": (10, 10 / 60),
+    "email_session": (3, 1 / 60),
+    "email_account": (10, 10 / 3600),
+    **{resource: tuple(limit) for resource, limit in json.loads(os.getenv("RATE_LIMITS", "{}")).items()}
+}
+RATE_LIMIT_BACKEND = os.getenv("RATE_LIMIT_BACKEND", "memory")
+RATE_LIMIT_DB_PATH = os.getenv(
+    "RATE_LIMIT_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "rate_limits.db")
+)
+MAX_MEMORY_BUCKETS = 100000
+# Load testing only: sessions from loopback skip voice_session_ip (the local harnesses set it)
+RATE_LIMIT_EXEMPT_LOOPBACK = os.getenv("RATE_LIMIT_EXEMPT_LOOPBACK", "false").lower() in ("1", "true")
+LOOPBACK_ADDRESSES = ("127.0.0.1", "::1")
+
+EMAIL_TOOLS = ("send_email", "send_receipt")
+
+
+class MemoryBuckets:
+    """Buckets of one worker: key -> [tokens, last refill, burst, rate], least recently used first"""
+
+    def __init__(self, max_buckets: int = MAX_MEMORY_BUCKETS):
+        self.max_buckets = max_buckets
+        self._buckets: "OrderedDict[str, List[float]]" = OrderedDict()
+
+    def take(self, key: str, burst: float, rate: float, cost: float = 1) -> float:
+        """0 when granted, otherwise seconds until cost tokens are available"""
+        now = time.monotonic()
+        bucket = self._buckets.get(key)
+        if bucket is None:
+            if len(self._buckets) >= self.max_buckets:
+                self._sweep(now)
+            bucket = self._buckets[key] = [burst, now, burst, rate]
+        else:
+            bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * rate)
+            bucket[1] = now
+            self._buckets.move_to_end(key)
+        if bucket[0] >= cost:
+            bucket[0] -= cost
+            return 0.0
+        return (cost - bucket[0]) / rate if rate > 0 else float("inf")
+
+    def _sweep(self, now: float) -> None:
+        # A bucket that has refilled at its own rate is the same as a new one
+        for key in [key for key, (tokens, stamp, burst, rate) in self._buckets.items()
+                    if tokens + (now - stamp) * rate >= burst]:
+            del self._buckets[key]
+        # Still full of partly drained buckets: evict the least recently used tenth,
+        # so the next sweep is as many new keys away
+        while len(self._buckets) >= self.max_buckets - self.max_buckets // 10:
+            self._buckets.popitem(last=False)
+
+    def give_back(self, key: str, burst: float, cost: float = 1) -> None:
+        """Return tokens taken for a request that was refused by another limit"""
+        bucket = self._buckets.get(key)
+        if bucket is not None:
+            bucket[0] = min(burst, bucket[0] + cost)
+
+    def __len__(self) -> int:
+        return len(self._buckets)
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS rate_buckets (
+    key TEXT PRIMARY KEY,
+    tokens REAL NOT NULL,
+    stamp REAL NOT NULL,
+    granted INTEGER NOT NULL,
+    full_at REAL NOT NULL
+);
+"""
+# Seconds between deletes of buckets that have refilled (and so equal a new one)
+SQLITE_SWEEP_INTERVAL_S = 60
+
+# Refill and take in one statement; SET expressions see the row as it was before the update
+_TAKE = """
+INSERT INTO rate_buckets (key, tokens, stamp, granted, full_at) VALUES (:key, :burst - :cost, :now, 1, :full_at)
+ON CONFLICT (key) DO UPDATE SET
+    full_at = :full_at,
+    tokens = MIN(:burst, tokens + (:now - stamp) * :rate)
+             - (CASE WHEN MIN(:burst, tokens + (:now - stamp) * :rate) >= :cost THEN :cost ELSE 0 END),
+    stamp = :now,
+    granted = MIN(:burst, tokens + (:now - stamp) * :rate) >= :cost
+RETURNING tokens, granted
+"""
+
+
+class SQLiteBuckets:
+    """Buckets shared by the worker processes of one host"""
+
+    def __init__(self, path: str = RATE_LIMIT_DB_PATH):
+        self.path = path
+        self._db: Optional[sqlite3.Connection] = None
+        # One thread owns the connection, so every database call runs on it
+        self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="rate-limits")
+        self._swept_at = time.time()
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False, timeout=1.0, isolation_level=None)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=OFF")  # buckets are cheap to lose
+            columns = {row[1] for row in self._db.execute("PRAGMA table_info(rate_buckets)")}
+            if columns and "full_at" not in columns:
+                self._db.execute("DROP TABLE rate_buckets")  # older layout
+            self._db.executescript(_SCHEMA)
+        return self._db
+
+    def take_sync(self, key: str, burst: float, rate: float, cost: float = 1) -> float:
+        now = time.time()
+        db = self._connect()
+        if now - self._swept_at > SQLITE_SWEEP_INTERVAL_S:
+            self._swept_at = now
+            db.execute("DELETE FROM rate_buckets WHERE full_at < ?", (now,))
+        # Untouched from now on, the bucket is full again by full_at at the latest
+        full_at = now + burst / rate if rate > 0 else float("inf")
+        tokens, granted = db.execute(
+            _TAKE, {"key": key, "burst": burst, "rate": rate, "cost": cost, "now": now, "full_at": full_at}
+        ).fetchone()
+        if granted:
+            return 0.0
+        return (cost - tokens) / rate if rate > 0 else float("inf")
+
+    async def take(self, key: str, burst: float, rate: float, cost: float = 1) -> float:
+        return await asyncio.get_running_loop().run_in_executor(self._thread, self.take_sync, key, burst, rate, cost)
+
+    def give_back_sync(self, key: str, burst: float, cost: float = 1) -> None:
+        self._connect().execute(
+            "UPDATE rate_buckets SET tokens = MIN(:burst, tokens + :cost) WHERE key = :key",
+            {"key": key, "burst": burst, "cost": cost}
+        )
+
+    async def give_back(self, key: str, burst: float, cost: float = 1) -> None:
+        await asyncio.get_running_loop().run_in_executor(self._thread, self.give_back_sync, key, burst, cost)
+
+    def close(self) -> None:
+        if self._db is not None:
+            self._thread.submit(self._db.close).result()
+            self._db = None
+        self._thread.shutdown(wait=True)
+
+
+class RateLimiter:
+    """Checks RATE_LIMITS resources against the configured backend"""
+
+    def __init__(self, backend: str = RATE_LIMIT_BACKEND, limits: Optional[Dict[str, Tuple[float, float]]] = None,
+                 path: str = RATE_LIMIT_DB_PATH, exempt_loopback: bool = RATE_LIMIT_EXEMPT_LOOPBACK):
+        self.limits = dict(RATE_LIMITS if limits is None else limits)
+        self.backend = backend
+        self.exempt_loopback = exempt_loopback
+        self._memory = MemoryBuckets() if backend == "memory" else None
+        self._shared = SQLiteBuckets(path) if backend == "sqlite" else None
+        self.stats = {"checks": 0, "denied": 0, "errors": 0}
+
+    async def acquire(self, resource: str, key: Optional[str], cost: float = 1) -> float:
+        """Take from the resource's bucket for key: 0 when allowed, else seconds to wait"""
+        limit = self.limits.get(resource)
+        if limit is None or key is None:
+            return 0.0
+        if self.exempt_loopback and resource == "voice_session_ip" and key in LOOPBACK_ADDRESSES:
+            return 0.0
+        self.stats["checks"] += 1
+        bucket_key = f"{resource}:{key}"
+        if self._memory is not None:
+            wait_s = self._memory.take(bucket_key, limit[0], limit[1], cost)
+        else:
+            try:
+                wait_s = await self._shared.take(bucket_key, limit[0], limit[1], cost)
+            except sqlite3.Error as e:
+                # The limiter must not take the service down with it
+                self.stats["errors"] += 1
+                logger.error(f"❌ Rate limit check for {resource} failed, allowing: {e}")
+                return 0.0
+        if wait_s:
+            self.stats["denied"] += 1
+            logger.warning(f"🚦 {resource} limit reached for {key}: retry in {wait_s:.0f} s")
+        return wait_s
+
+    async def release(self, resource: str, key: Optional[str], cost: float = 1) -> None:
+        """Give back what acquire took, when the request was refused by another limit"""
+        limit = self.limits.get(resource)
+        if limit is None or key is None:
+            return
+        bucket_key = f"{resource}:{key}"
+        if self._memory is not None:
+            self._memory.give_back(bucket_key, limit[0], cost)
+        else:
+            try:
+                await self._shared.give_back(bucket_key, limit[0], cost)
+            except sqlite3.Error as e:
+                logger.error(f"❌ Rate limit release for {resource} failed: {e}")
+
+    async def check_tool(self, name: str, session_id: str, account_id: Optional[str] = None) -> Optional[Dict]:
+        """Error result for a rate-limited email tool call, or None to run it"""
+        if name not in EMAIL_TOOLS:
+            return None
+        wait_s = await self.acquire("email_session", session_id)
+        if not wait_s:
+            wait_s = await self.acquire("email_account", account_id)
+            if not wait_s:
+                return None
+            # Refused by the account limit: the session's token was not used
+            await self.release("email_session", session_id)
+        return {
+            "success": False,
+            "rate_limited": True,
+            "error": f"Too many emails sent. Please try again in {max(1, round(wait_s / 60))} minute(s)."
+        }
+
+    def snapshot(self) -> Dict:
+        return {
+            "backend": self.backend,
+            "exempt_loopback": self.exempt_loopback,
+            **self.stats,
+            "buckets": len(self._memory) if self._memory is not None else None,
+            "limits": {resource: {"burst": burst, "per_minute": round(rate * 60, 3)}
+                       for resource, (burst, rate) in self.limits.items()}
+        }
+
+    def close(self) -> None:
+        if self._shared is not None:
+            self._shared.close()
+
+
+rate_limiter = RateLimiter()
+
+
+def _shared_worker(path: str, attempts: int) -> int:
+    buckets = SQLiteBuckets(path)
+    granted = sum(1 for _ in range(attempts) if buckets.take_sync("bench:shared", 20, 0.0) == 0)
+    buckets.close()
+    return granted
+
+
+async def _benchmark(n: int) -> None:
+    """Per-check cost of both backends, and one limit enforced across processes"""
+    from concurrent.futures import ProcessPoolExecutor
+
+    limits = {"voice_session_ip": (10, 10 / 60)}
+    keys = [f"10.0.{i // 256 % 256}.{i % 256}" for i in range(10000)]
+    with tempfile.TemporaryDirectory() as tmp:
+        print(f"{n:,} checks over {len(keys):,} client addresses")
+        for backend, count in (("memory", n), ("sqlite", n // 10)):
+            limiter = RateLimiter(backend, limits, path=os.path.join(tmp, "limits.db"))
+            await limiter.acquire("voice_session_ip", "warm-up")
+            started = time.perf_counter()
+            for i in range(count):
+                await limiter.acquire("voice_session_ip", keys[i % len(keys)])
+            per_check_us = (time.perf_counter() - started) / count * 1e6
+            print(f"  {backend:<7} {per_check_us:7.2f} µs per check  "
+                  f"({limiter.stats['denied']:,} of {count:,} denied)")
+            limiter.close()
+
+        # Four processes race for one bucket of 20 tokens
+        path = os.path.join(tmp, "shared.db")
+        SQLiteBuckets(path).close()
+        loop = asyncio.get_running_loop()
+        with ProcessPoolExecutor(max_workers=4) as pool:
+            granted = await asyncio.gather(*(loop.run_in_executor(pool, _shared_worker, path, 50) for _ in range(4)))
+        print(f"  shared bucket of 20 across 4 processes × 50 attempts: granted {granted} = {sum(granted)}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.ERROR)
+    asyncio.run(_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200000))
@@ -0,0 +1,452 @@
+"""
+Receipt delivery channels
+Email and SMS go through one async interface: a provider per channel
+(Resend for email, Twilio for SMS, or a local stub) and a dispatcher that
+runs on its own thread and event loop, so deliveries never run on the loop
+serving voice sessions. Messages are micro-batched for providers with a
+bulk endpoint (up to max_batch per request, collected for
+RECEIPT_BATCH_WINDOW_MS), sent over one pooled HTTP session, capped per
+channel (RECEIPT_CONCURRENCY) and retried with full jitter on throttling,
+server errors and timeouts. Each message carries an idempotency key that
+stays the same across retries; providers without one (Twilio) are retried
+only when the request surely was not accepted. A batch the provider rejects
+is resent message by message, so one bad address fails only its own receipt
+
+Benchmark: python receipt_channels.py [receipts] [per_second]
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import random
+import sys
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+EMAIL_SENDER = "CareCredit Support <onboarding@resend.dev>"
+EMAIL_PROVIDER = os.getenv("EMAIL_PROVIDER", "resend")  # resend | stub
+SMS_PROVIDER = os.getenv("SMS_PROVIDER", "twilio")  # twilio | stub
+RESEND_API_URL = os.getenv("RESEND_API_URL", "https://api.resend.com")
+TWILIO_API_URL = os.getenv("TWILIO_API_URL", "https://api.twilio.com/2010-04-01")
+
+RECEIPT_DISPATCH_THREAD = os.getenv("RECEIPT_DISPATCH_THREAD", "true").lower() in ("1", "true")
+RECEIPT_BATCH_WINDOW_MS = float(os.getenv("RECEIPT_BATCH_WINDOW_MS", "20"))
+# In-flight provider requests per channel, e.g. RECEIPT_CONCURRENCY='{"sms": 32}'
+RECEIPT_CONCURRENCY: Dict[str, int] = {"email": 8, "sms": 16, **json.loads(os.getenv("RECEIPT_CONCURRENCY", "{}"))}
+RECEIPT_MAX_RETRIES = int(os.getenv("RECEIPT_MAX_RETRIES", "3"))
+RECEIPT_RETRY_BASE_S = float(os.getenv("RECEIPT_RETRY_BASE_S", "0.25"))
+RECEIPT_SEND_TIMEOUT_S = float(os.getenv("RECEIPT_SEND_TIMEOUT_S", "10"))
+
+
+class DeliveryError(Exception):
+    """A provider request failed; retryable for throttling, server errors and timeouts"""
+
+    def __init__(self, message: str, retryable: bool = False, retry_after_s: Optional[float] = None,
+                 status: Optional[int] = None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.retry_after_s = retry_after_s
+        self.status = status
+
+
+async def _read_response(response) -> Dict[str, Any]:
+    body = await response.text()
+    if response.status == 429 or response.status >= 500:
+        try:
+            retry_after_s = float(response.headers.get("Retry-After", ""))
+        except ValueError:
+            retry_after_s = None
+        raise DeliveryError(f"{response.status} {body[:200]}", retryable=True, retry_after_s=retry_after_s,
+                            status=response.status)
+    if response.status >= 400:
+        raise DeliveryError(f"{response.status} {body[:200]}", status=response.status)
+    return json.loads(body) if body else {}
+
+
+# ============================================================================
+# PROVIDERS
+# ============================================================================
+
+class ReceiptProvider:
+    """
+    A delivery channel; send_batch sends up to max_batch messages in one request
+    idempotent: the provider dedupes requests by idempotency_key, so a request
+    that may have been accepted (timeout, server error) can be sent again
+    """
+
+    channel = "email"
+    max_batch = 1
+    idempotent = False
+
+    def configured(self) -> bool:
+        return True
+
+    async def send_batch(self, http, messages: List[Dict[str, Any]], idempotency_key: str) -> List[str]:
+        """Provider message ids in order; raises DeliveryError for the whole batch"""
+        raise NotImplementedError
+
+
+class ResendEmailProvider(ReceiptProvider):
+    """Resend HTTP API: /emails for one message, /emails/batch for up to 100"""
+
+    channel = "email"
+    max_batch = 100
+    idempotent = True
+
+    def __init__(self, api_key: Optional[str] = None, base_url: str = RESEND_API_URL, sender: str = EMAIL_SENDER):
+        self._api_key = api_key
+        self.base_url = base_url.rstrip("/")
+        self.sender = sender
+
+    @property
+    def api_key(self) -> Optional[str]:
+        # Read on use: the module-level dispatcher is built before app.py loads .env
+        return self._api_key if self._api_key is not None else os.getenv("RESEND_API_KEY")
+
+    def configured(self) -> bool:
+        return bool(self.api_key)
+
+    async def send_batch(self, http, messages: List[Dict[str, Any]], idempotency_key: str) -> List[str]:
+        headers = {"Authorization": f"Bearer {self.api_key}", "Idempotency-Key": idempotency_key}
+        emails = [{"from": self.sender, **message} for message in messages]
+        if len(emails) == 1:
+            async with http.post(f"{self.base_url}/emails", json=emails[0], headers=headers) as response:
+                return [(await _read_response(response)).get("id")]
+        async with http.post(f"{self.base_url}/emails/batch", json=emails, headers=headers) as response:
+            return [item.get("id") for item in (await _read_response(response)).get("data", [])]
+
+
+class TwilioSMSProvider(ReceiptProvider):
+    """
+    Twilio Messages API; one message per request, so throughput comes from concurrency
+    Twilio has no idempotency key, so only refused requests are retried
+    """
+
+    channel = "sms"
+    max_batch = 1
+
+    def __init__(self, account_sid: Optional[str] = None, auth_token: Optional[str] = None,
+                 from_number: Optional[str] = None, base_url: str = TWILIO_API_URL):
+        self._credentials = (account_sid, auth_token, from_number)
+        self.base_url = base_url.rstrip("/")
+
+    # Read on use, like ResendEmailProvider.api_key
+    @property
+    def account_sid(self) -> Optional[str]:
+        return self._credentials[0] or os.getenv("TWILIO_ACCOUNT_SID")
+
+    @property
+    def auth_token(self) -> Optional[str]:
+        return self._credentials[1] or os.getenv("TWILIO_AUTH_TOKEN")
+
+    @property
+    def from_number(self) -> Optional[str]:
+        return self._credentials[2] or os.getenv("TWILIO_FROM_NUMBER")
+
+    def configured(self) -> bool:
+        return bool(self.account_sid and self.auth_token and self.from_number)
+
+    async def send_batch(self, http, messages: List[Dict[str, Any]], idempotency_key: str) -> List[str]:
+        import aiohttp
+
+        ids = []
+        for message in messages:
+            async with http.post(
+                f"{self.base_url}/Accounts/{self.account_sid}/Messages.json",
+                data={"To": message["to"], "From": self.from_number, "Body": message["body"]},
+                auth=aiohttp.BasicAuth(self.account_sid, self.auth_token)
+            ) as response:
+                ids.append((await _read_response(response)).get("sid"))
+        return ids
+
+
+class StubProvider(ReceiptProvider):
+    """Local provider for tests and benchmarks: records messages, with optional latency and failures"""
+
+    idempotent = True
+
+    def __init__(self, channel: str = "email", max_batch: int = 100, latency_ms: float = 0,
+                 failure_rate: float = 0.0, seed: Optional[int] = None):
+        self.channel = channel
+        self.max_batch = max_batch
+        self.latency_ms = latency_ms
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self.sent: List[Dict[str, Any]] = []
+        self.requests = 0
+
+    async def send_batch(self, http, messages: List[Dict[str, Any]], idempotency_key: str) -> List[str]:
+        self.requests += 1
+        json.dumps(messages)  # request encoding, as a real provider would
+        if self.latency_ms:
+            await asyncio.sleep(self.latency_ms / 1000)
+        if self._random.random() < self.failure_rate:
+            raise DeliveryError("503 stub provider unavailable", retryable=True)
+        first = len(self.sent)
+        self.sent.extend(messages)
+        return [f"stub_{self.channel}_{first + index}" for index in range(len(messages))]
+
+
+PROVIDERS = {
+    "resend": ResendEmailProvider,
+    "twilio": TwilioSMSProvider,
+}
+
+
+def create_provider(channel: str, name: str) -> ReceiptProvider:
+    if name == "stub":
+        return StubProvider(channel)
+    return PROVIDERS[name]()
+
+
+# ============================================================================
+# DISPATCHER
+# ============================================================================
+
+class _Channel:
+    """Pending messages of one channel, flushed in batches under a concurrency cap"""
+
+    def __init__(self, provider: ReceiptProvider, concurrency: int):
+        self.provider = provider
+        self.concurrency = concurrency
+        self.pending: List[Tuple[Dict[str, Any], str, asyncio.Future]] = []  # message, idempotency key, result
+        self.flush_timer: Optional[asyncio.TimerHandle] = None
+        self.semaphore: Optional[asyncio.Semaphore] = None
+        self.stats = {"sent": 0, "failed": 0, "requests": 0, "retries": 0, "split": 0}
+
+
+class ReceiptDispatcher:
+    """Delivers messages through the channel providers, on a dedicated thread by default"""
+
+    def __init__(self, providers: Optional[Dict[str, ReceiptProvider]] = None, thread: bool = RECEIPT_DISPATCH_THREAD,
+                 batch_window_ms: float = RECEIPT_BATCH_WINDOW_MS, concurrency: Optional[Dict[str, int]] = None,
+                 max_retries: int = RECEIPT_MAX_RETRIES, retry_base_s: float = RECEIPT_RETRY_BASE_S):
+        if providers is None:
+            providers = {"email": create_provider("email", EMAIL_PROVIDER), "sms": create_provider("sms", SMS_PROVIDER)}
+        concurrency = {**RECEIPT_CONCURRENCY, **(concurrency or {})}
+        self.channels = {name: _Channel(provider, concurrency.get(name, 8)) for name, provider in providers.items()}
+        self.thread = thread
+        self.batch_window_s = batch_window_ms / 1000
+        self.max_retries = max_retries
+        self.retry_base_s = retry_base_s
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[threading.Thread] = None
+        self._http = None
+        self._deliveries: set = set()
+        self._lock = threading.Lock()
+
+    def configured(self, channel: str) -> bool:
+        return channel in self.channels and self.channels[channel].provider.configured()
+
+    async def send(self, channel: str, message: Dict[str, Any]) -> Dict[str, Any]:
+        """Deliver one message: {"success": True, "id": ...} or {"success": False, "error": ...}"""
+        if not self.thread:
+            self._loop = asyncio.get_running_loop()
+            return await self._submit(channel, message)
+        loop = self._dispatch_loop()
+        return await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._submit(channel, message), loop))
+
+    def _dispatch_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    self._thread = threading.Thread(target=loop.run_forever, name="receipt-dispatch", daemon=True)
+                    self._thread.start()
+                    self._loop = loop
+        return self._loop
+
+    # ---- on the dispatch loop --------------------------------------------
+
+    async def _submit(self, channel_name: str, message: Dict[str, Any]) -> Dict[str, Any]:
+        channel = self.channels.get(channel_name)
+        if channel is None:
+            return {"success": False, "error": f"Unknown receipt channel: {channel_name}"}
+        future = asyncio.get_running_loop().create_future()
+        channel.pending.append((message, uuid.uuid4().hex, future))
+        if len(channel.pending) >= channel.provider.max_batch or not self.batch_window_s:
+            self._flush(channel)
+        elif channel.flush_timer is None:
+            channel.flush_timer = asyncio.get_running_loop().call_later(self.batch_window_s, self._flush, channel)
+        return await future
+
+    def _flush(self, channel: _Channel) -> None:
+        if channel.flush_timer is not None:
+            channel.flush_timer.cancel()
+            channel.flush_timer = None
+        size = channel.provider.max_batch
+        pending, channel.pending = channel.pending, []
+        for start in range(0, len(pending), size):
+            task = asyncio.get_running_loop().create_task(self._deliver(channel, pending[start:start + size]))
+            self._deliveries.add(task)
+            task.add_done_callback(self._deliveries.discard)
+
+    async def _session(self):
+        if self._http is None:
+            import aiohttp
+            self._http = aiohttp.ClientSession(
+                connector=aiohttp.TCPConnector(limit=100, keepalive_timeout=60),
+                timeout=aiohttp.ClientTimeout(total=RECEIPT_SEND_TIMEOUT_S)
+            )
+        return self._http
+
+    def _may_retry(self, channel: _Channel, error: Exception) -> bool:
+        """Whether sending again cannot deliver a message twice, or the provider dedupes it"""
+        import aiohttp
+
+        if isinstance(error, DeliveryError):
+            if not error.retryable:
+                return False
+            return error.status == 429 or channel.provider.idempotent
+        if isinstance(error, aiohttp.ClientConnectorError):
+            return True  # never reached the provider
+        return channel.provider.idempotent
+
+    async def _deliver(self, channel: _Channel, batch: List[Tuple[Dict[str, Any], str, asyncio.Future]]) -> None:
+        import aiohttp
+
+        if channel.semaphore is None:
+            channel.semaphore = asyncio.Semaphore(channel.concurrency)
+        messages = [message for message, _, _ in batch]
+        # Derived from the message keys, so every retry of this batch sends the same key
+        keys = [key for _, key, _ in batch]
+        key = keys[0] if len(keys) == 1 else hashlib.sha256("".join(keys).encode()).hexdigest()
+        http = await self._session()
+        for attempt in range(self.max_retries + 1):
+            try:
+                async with channel.semaphore:
+                    channel.stats["requests"] += 1
+                    ids = await asyncio.wait_for(channel.provider.send_batch(http, messages, key),
+                                                 RECEIPT_SEND_TIMEOUT_S)
+                channel.stats["sent"] += len(batch)
+                for (_, _, future), message_id in zip(batch, ids + [None] * (len(batch) - len(ids))):
+                    if not future.done():
+                        future.set_result({"success": True, "id": message_id})
+                return
+            except (DeliveryError, aiohttp.ClientError, asyncio.TimeoutError, OSError) as e:
+                if isinstance(e, DeliveryError) and not e.retryable and len(batch) > 1:
+                    # The whole batch was refused (e.g. one invalid address): send each on its own
+                    channel.stats["split"] += 1
+                    logger.warning(f"⚠️ {channel.provider.channel} batch of {len(batch)} refused ({e}), "
+                                   f"sending one by one")
+                    await asyncio.gather(*(self._deliver(channel, [item]) for item in batch))
+                    return
+                if not self._may_retry(channel, e) or attempt == self.max_retries:
+                    error = str(e) or type(e).__name__
+                    break
+                channel.stats["retries"] += 1
+                # Full jitter, unless the provider said when to come back
+                delay = getattr(e, "retry_after_s", None) or random.uniform(0, self.retry_base_s * 2 ** attempt)
+                await asyncio.sleep(delay)
+            except Exception as e:
+                error = str(e) or type(e).__name__
+                break
+        channel.stats["failed"] += len(batch)
+        logger.error(f"❌ {channel.provider.channel} delivery of {len(batch)} message(s) failed: {error}")
+        for _, _, future in batch:
+            if not future.done():
+                future.set_result({"success": False, "error": error})
+
+    async def _drain(self) -> None:
+        for channel in self.channels.values():
+            if channel.pending:
+                self._flush(channel)
+        if self._deliveries:
+            await asyncio.gather(*self._deliveries, return_exceptions=True)
+        if self._http is not None:
+            await self._http.close()
+            self._http = None
+
+    # ---- lifecycle --------------------------------------------------------
+
+    async def aclose(self) -> None:
+        """Finish pending deliveries, then close the HTTP session and the dispatch thread"""
+        if self._loop is None:
+            return
+        if not self.thread:
+            await self._drain()
+            self._loop = None
+            return
+        loop, thread = self._loop, self._thread
+        await asyncio.wrap_future(asyncio.run_coroutine_threadsafe(self._drain(), loop))
+        loop.call_soon_threadsafe(loop.stop)
+        await asyncio.to_thread(thread.join, 5)
+        loop.close()
+        self._loop = self._thread = None
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            name: {
+                "provider": type(channel.provider).__name__,
+                "configured": channel.provider.configured(),
+                "max_batch": channel.provider.max_batch,
+                "concurrency": channel.concurrency,
+                **channel.stats
+            }
+            for name, channel in self.channels.items()
+        }
+
+
+receipt_dispatcher = ReceiptDispatcher()
+
+
+async def _loop_lag(stop: asyncio.Event, lags: List[float]) -> None:
+    """Oversleep of a 5 ms timer on the calling loop, as a voice session would feel it"""
+    while not stop.is_set():
+        started = time.perf_counter()
+        await asyncio.sleep(0.005)
+        lags.append((time.perf_counter() - started) * 1000 - 5)
+
+
+async def _benchmark(receipts: int, rate: float) -> None:
+    """Receipts per minute and calling-loop lag: unbatched inline, batched inline, batched on the dispatch thread"""
+    from email_templates import get_receipt_html, get_receipt_sms
+
+    logging.getLogger().setLevel(logging.CRITICAL)
+    html = get_receipt_html("TXN1700000000000", "125.00", "January 01, 2026", "Credit Card")
+    sms = get_receipt_sms("TXN1700000000000", "125.00", "January 01, 2026")
+    print(f"{receipts:,} receipts (half email, half SMS) arriving at {rate * 60:,.0f}/min; "
+          f"stub providers answer in 80 ms and fail 5% of requests")
+    for label, email_batch, thread in (("inline, unbatched", 1, False), ("inline, batched", 100, False),
+                                       ("dispatch thread, batched", 100, True)):
+        providers = {
+            "email": StubProvider("email", max_batch=email_batch, latency_ms=80, failure_rate=0.05, seed=1),
+            "sms": StubProvider("sms", max_batch=1, latency_ms=80, failure_rate=0.05, seed=2),
+        }
+        dispatcher = ReceiptDispatcher(providers, thread=thread, concurrency={"email": 8, "sms": 32},
+                                       retry_base_s=0.05)
+        await dispatcher.send("sms", {"to": "+15550000000", "body": sms})  # thread and HTTP session start
+        stop, lags = asyncio.Event(), []
+        probe = asyncio.create_task(_loop_lag(stop, lags))
+        started = time.perf_counter()
+        sends = []
+        for i in range(receipts):
+            # Tool calls arrive spread out, not in one burst
+            await asyncio.sleep(max(0.0, started + i / rate - time.perf_counter()))
+            sends.append(asyncio.ensure_future(
+                dispatcher.send("email", {"to": [f"user{i}@example.com"], "subject": f"Payment Receipt - TXN{i}",
+                                          "html": html})
+                if i % 2 else dispatcher.send("sms", {"to": f"+1555{i:07d}", "body": sms})
+            ))
+        results = await asyncio.gather(*sends)
+        elapsed = time.perf_counter() - started
+        stop.set()
+        await probe
+        await dispatcher.aclose()
+        stats = dispatcher.snapshot()
+        lags.sort()
+        print(f"  {label:<25} {receipts / elapsed * 60:7,.0f} receipts/min  "
+              f"delivered {sum(result['success'] for result in results):,}  "
+              f"requests email={stats['email']['requests']:,} sms={stats['sms']['requests']:,}  "
+              f"retries {stats['email']['retries'] + stats['sms']['retries']:,}  "
+              f"loop lag p99 {lags[int(len(lags) * 0.99)]:4.1f} ms max {lags[-1]:5.1f} ms")
+
+
+if __name__ == "__main__":
+    asyncio.run(_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 4000,
+                           float(sys.argv[2]) if len(sys.argv) > 2 else 400))
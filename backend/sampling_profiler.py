@@ -0,0 +1,203 @@
+"""
+In-process sampling profiler for the event loop thread
+A daemon thread wakes every interval_ms, reads the loop thread's current
+frame stack (sys._current_frames) and the asyncio task it is running, and
+counts the stack. Nothing is hooked into the profiled code, so the cost is
+one stack walk per sample. Output is collapsed stacks ("task;frame;frame N"),
+the input format of flamegraph.pl and speedscope
+
+Usage: POST /api/admin/profile?seconds=10 on a live worker, or
+python sampling_profiler.py [turns] to profile the local load harness
+(bench_engines.py) and measure the overhead
+"""
+import asyncio
+import logging
+import os
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_INTERVAL_MS = 5
+MAX_PROFILE_SECONDS = 120
+MAX_STACK_DEPTH = 64
+
+# A loop waiting in select() is idle, not busy
+_IDLE_FILES = ("selectors.py",)
+# Frames outside the callback the loop is running (run_forever, _run_once) are cut off
+_CALLBACK_RUNNER = asyncio.events.Handle._run.__code__
+
+
+def _frame_label(code) -> str:
+    return f"{getattr(code, 'co_qualname', code.co_name)} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class SamplingProfiler:
+    """Samples one thread (by default the running event loop's) until stopped"""
+
+    def __init__(self, interval_ms: float = DEFAULT_INTERVAL_MS, include_idle: bool = False):
+        self.interval_s = interval_ms / 1000
+        self.include_idle = include_idle
+        self.stacks: Counter = Counter()
+        self.samples = 0
+        self.idle_samples = 0
+        self.sampling_s = 0.0  # time spent inside the sampler
+        self._labels: Dict[Any, str] = {}
+        self._thread: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._started_at = 0.0
+        self.duration_s = 0.0
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self, thread_id: Optional[int] = None, loop: Optional[asyncio.AbstractEventLoop] = None) -> None:
+        """Start sampling; called from the loop thread unless thread_id/loop are given"""
+        if self.running:
+            raise RuntimeError("Profiler is already running")
+        target = thread_id if thread_id is not None else threading.get_ident()
+        if loop is None:
+            try:
+                loop = asyncio.get_running_loop()
+            except RuntimeError:
+                loop = None
+        self._stop.clear()
+        self._started_at = time.perf_counter()
+        self._thread = threading.Thread(
+            target=self._sample_loop, args=(target, loop), name="sampling-profiler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+        self.duration_s = time.perf_counter() - self._started_at
+
+    def _label(self, code) -> str:
+        label = self._labels.get(code)
+        if label is None:
+            label = self._labels[code] = _frame_label(code)
+        return label
+
+    def _sample_loop(self, thread_id: int, loop: Optional[asyncio.AbstractEventLoop]) -> None:
+        current_tasks = getattr(asyncio.tasks, "_current_tasks", {})
+        while not self._stop.wait(self.interval_s):
+            started = time.perf_counter()
+            frame = sys._current_frames().get(thread_id)
+            if frame is None:
+                break
+            codes = []
+            while frame is not None and len(codes) < MAX_STACK_DEPTH and frame.f_code is not _CALLBACK_RUNNER:
+                codes.append(frame.f_code)
+                frame = frame.f_back
+            self.samples += 1
+            if codes and os.path.basename(codes[0].co_filename) in _IDLE_FILES:
+                self.idle_samples += 1
+                if not self.include_idle:
+                    self.sampling_s += time.perf_counter() - started
+                    continue
+            task = current_tasks.get(loop) if loop is not None else None
+            coro = task.get_coro() if task is not None else None
+            root = f"task:{getattr(coro, '__qualname__', task.get_name())}" if task is not None else "loop"
+            self.stacks[(root, tuple(codes))] += 1
+            self.sampling_s += time.perf_counter() - started
+
+    # ------------------------------------------------------------------------
+    # Output
+    # ------------------------------------------------------------------------
+
+    def collapsed(self) -> str:
+        """One "root;outermost;...;innermost count" line per distinct stack"""
+        lines = []
+        for (root, codes), count in self.stacks.most_common():
+            frames = ";".join(self._label(code) for code in reversed(codes))
+            lines.append(f"{root};{frames} {count}")
+        return "\n".join(lines) + ("\n" if lines else "")
+
+    def summary(self, top: int = 20) -> Dict[str, Any]:
+        """Samples per task and the functions with the most own (leaf) and total samples"""
+        per_task: Counter = Counter()
+        own: Counter = Counter()
+        total: Counter = Counter()
+        for (root, codes), count in self.stacks.items():
+            per_task[root] += count
+            if codes:
+                own[self._label(codes[0])] += count
+            for code in set(codes):
+                total[self._label(code)] += count
+        busy = self.samples - self.idle_samples
+        return {
+            "duration_s": round(self.duration_s, 2),
+            "interval_ms": self.interval_s * 1000,
+            "samples": self.samples,
+            "busy_samples": busy,
+            "idle_samples": self.idle_samples,
+            "loop_busy_pct": round(100 * busy / self.samples, 1) if self.samples else None,
+            "sampler_overhead_pct": round(100 * self.sampling_s / self.duration_s, 2) if self.duration_s else None,
+            "tasks": dict(per_task.most_common(top)),
+            "top_own": own.most_common(top),
+            "top_total": total.most_common(top)
+        }
+
+
+async def profile_for(seconds: float, interval_ms: float = DEFAULT_INTERVAL_MS,
+                      include_idle: bool = False) -> SamplingProfiler:
+    """Profile the running loop for a number of seconds"""
+    profiler = SamplingProfiler(interval_ms, include_idle)
+    profiler.start()
+    try:
+        await asyncio.sleep(min(seconds, MAX_PROFILE_SECONDS))
+    finally:
+        await asyncio.get_running_loop().run_in_executor(None, profiler.stop)
+    return profiler
+
+
+async def _benchmark(turns: int) -> None:
+    import app
+    from bench_engines import measure
+    from fake_realtime import FakeRealtimeServer
+
+    upstream = FakeRealtimeServer(response_latency_ms=50, audio_chunks=20)
+    app.OPENAI_REALTIME_URL = await upstream.start()
+    app.openai_api_key = app.openai_api_key or "bench"
+
+    async def realtime(client):
+        await app.proxy_openai_realtime(client, f"bench-profile-{id(client)}", app.VoiceSessionConfig())
+
+    async def load(sessions: int = 8) -> float:
+        started = time.perf_counter()
+        await asyncio.gather(*(measure(realtime, turns) for _ in range(sessions)))
+        return time.perf_counter() - started
+
+    logging.getLogger().setLevel(logging.WARNING)
+    baseline = await load()
+    profiler = SamplingProfiler()
+    profiler.start()
+    profiled = await load()
+    profiler.stop()
+    await upstream.stop()
+
+    summary = profiler.summary(top=8)
+    print(f"8 sessions × {turns} turns through proxy_openai_realtime")
+    print(f"  wall time: {baseline:.2f} s unprofiled, {profiled:.2f} s profiled "
+          f"({(profiled / baseline - 1) * 100:+.1f}%)")
+    print(f"  samples: {summary['samples']} ({summary['loop_busy_pct']}% busy), "
+          f"sampler time {summary['sampler_overhead_pct']}% of wall time")
+    print("  busiest tasks:")
+    for task, count in summary["tasks"].items():
+        print(f"    {count:6d}  {task}")
+    print("  top functions (own samples):")
+    for label, count in summary["top_own"]:
+        print(f"    {count:6d}  {label}")
+    lines: List[str] = profiler.collapsed().splitlines()
+    print(f"  {len(lines)} collapsed stacks; heaviest:\n    {lines[0][-160:] if lines else '-'}")
+
+
+if __name__ == "__main__":
+    asyncio.run(_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 5))
@@ -0,0 +1,159 @@
+"""
+Production launcher
+Runs app:app on uvloop and httptools when they are installed, with one
+worker unless WEB_CONCURRENCY asks for more (sessions, config pushes, chat
+histories, monitors and payment idempotency live in the worker's memory),
+WebSocket settings for audio traffic
+(permessage-deflate off, bounded frames, fast keepalive) and graceful worker
+recycling: after WORKER_MAX_REQUESTS connections or WORKER_MAX_AGE_S (each
+with per-worker jitter) a worker stops accepting, lets its calls finish for
+up to WORKER_DRAIN_TIMEOUT_S and exits; the supervisor starts a fresh one.
+SIGTERM drains the same way
+
+Usage: python serve.py   (PORT / SERVER_HOST / WEB_CONCURRENCY from the environment)
+Compare with the plain uvicorn command: python bench_server.py
+"""
+import importlib.util
+import logging
+import os
+import random
+import signal
+import time
+from typing import Any, Dict, Optional
+
+import uvicorn
+from uvicorn.supervisors import Multiprocess
+
+from session_reaper import KEEPALIVE_INTERVAL_S, KEEPALIVE_TIMEOUT_S
+
+logger = logging.getLogger("uvicorn.error")
+
+# Largest WebSocket message accepted from clients (audio chunks are a few KB)
+WS_MAX_SIZE = int(os.getenv("WS_MAX_SIZE", str(1024 * 1024)))
+# Base64 PCM audio barely compresses, so deflate only costs CPU
+WS_PER_MESSAGE_DEFLATE = os.getenv("WS_PER_MESSAGE_DEFLATE", "false").lower() == "true"
+
+WORKER_MAX_REQUESTS = int(os.getenv("WORKER_MAX_REQUESTS", "5000"))  # 0 disables
+WORKER_MAX_AGE_S = float(os.getenv("WORKER_MAX_AGE_S", "86400"))  # 0 disables
+WORKER_RECYCLE_JITTER = 0.2  # fraction added at random per worker, so workers do not recycle together
+WORKER_DRAIN_TIMEOUT_S = float(os.getenv("WORKER_DRAIN_TIMEOUT_S", "600"))
+
+
+def available_cores() -> int:
+    """CPUs this process may use: affinity mask, capped by a cgroup v2 CPU quota"""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            cores = min(cores, max(1, int(int(quota) / int(period))))
+    except (OSError, ValueError):
+        pass
+    return cores
+
+
+def best_available(*modules: str) -> Optional[str]:
+    for module in modules:
+        if importlib.util.find_spec(module) is not None:
+            return module
+    return None
+
+
+def build_config(**overrides: Any) -> uvicorn.Config:
+    # Session state is per process, so several workers only when asked for explicitly
+    workers = int(os.getenv("WEB_CONCURRENCY") or 1)
+    settings: Dict[str, Any] = {
+        "app": "app:app",
+        "host": os.getenv("SERVER_HOST", "0.0.0.0"),
+        "port": int(os.getenv("PORT") or os.getenv("SERVER_PORT", "8000")),
+        "workers": workers,
+        "loop": "uvloop" if best_available("uvloop") else "asyncio",
+        "http": "httptools" if best_available("httptools") else "h11",
+        "ws": "websockets",
+        "ws_max_size": WS_MAX_SIZE,
+        "ws_ping_interval": KEEPALIVE_INTERVAL_S,
+        "ws_ping_timeout": KEEPALIVE_TIMEOUT_S,
+        "ws_per_message_deflate": WS_PER_MESSAGE_DEFLATE,
+        "timeout_graceful_shutdown": 10,
+        "proxy_headers": True,
+        # X-Forwarded-For is trusted only from these proxies; it keys voice_session_ip
+        "forwarded_allow_ips": os.getenv("FORWARDED_ALLOW_IPS", "127.0.0.1"),
+        "log_level": os.getenv("LOG_LEVEL", "info"),
+    }
+    settings.update(overrides)
+    return uvicorn.Config(**settings)
+
+
+class RecyclingServer(uvicorn.Server):
+    """uvicorn server that drains its connections before recycling or a SIGTERM exit"""
+
+    def __init__(self, config: uvicorn.Config, max_requests: int = WORKER_MAX_REQUESTS,
+                 max_age_s: float = WORKER_MAX_AGE_S, drain_timeout_s: float = WORKER_DRAIN_TIMEOUT_S):
+        super().__init__(config)
+        self.max_requests = max_requests
+        self.max_age_s = max_age_s
+        self.drain_timeout_s = drain_timeout_s
+        self._limits: Optional[tuple] = None
+        self._drain_started: Optional[float] = None
+
+    def _worker_limits(self) -> tuple:
+        # Drawn in the worker process, so every worker gets its own jitter
+        jitter = 1 + random.uniform(0, WORKER_RECYCLE_JITTER)
+        return (
+            int(self.max_requests * jitter) if self.max_requests > 0 else None,
+            time.monotonic() + self.max_age_s * jitter if self.max_age_s > 0 else None
+        )
+
+    def start_draining(self, reason: str) -> None:
+        if self._drain_started is not None:
+            return
+        self._drain_started = time.monotonic()
+        for server in self.servers:
+            server.close()  # stop accepting; open calls continue
+        logger.info(f"Worker {os.getpid()} draining ({reason}): "
+                    f"{len(self.server_state.connections)} connections, up to {self.drain_timeout_s:.0f} s")
+
+    async def on_tick(self, counter: int) -> bool:
+        if await super().on_tick(counter):
+            return True
+        if self._limits is None:
+            self._limits = self._worker_limits()
+        max_requests, recycle_at = self._limits
+        if self._drain_started is None and self.config.workers > 1:
+            if max_requests is not None and self.server_state.total_requests >= max_requests:
+                self.start_draining(f"served {self.server_state.total_requests} connections")
+            elif recycle_at is not None and time.monotonic() >= recycle_at:
+                self.start_draining("maximum worker age")
+        if self._drain_started is not None:
+            return (not self.server_state.connections
+                    or time.monotonic() - self._drain_started > self.drain_timeout_s)
+        return False
+
+    def handle_exit(self, sig: int, frame) -> None:
+        # SIGTERM (deploys, scale-down) lets calls finish; SIGINT or a second signal exits now
+        if sig == signal.SIGTERM and self._drain_started is None and self.started:
+            self.start_draining("SIGTERM")
+            return
+        super().handle_exit(sig, frame)
+
+
+def main() -> None:
+    config = build_config()
+    server = RecyclingServer(config)
+    logger.info(f"Starting {config.workers} worker(s) ({available_cores()} core(s) available): "
+                f"loop={config.loop} http={config.http} ws_max_size={config.ws_max_size} "
+                f"deflate={config.ws_per_message_deflate}")
+    if config.workers > 1:
+        # Workers share rate-limit buckets through SQLite unless told otherwise
+        os.environ.setdefault("RATE_LIMIT_BACKEND", "sqlite")
+        sock = config.bind_socket()
+        Multiprocess(config, target=server.run, sockets=[sock]).run()
+    else:
+        server.run()
+
+
+if __name__ == "__main__":
+    main()
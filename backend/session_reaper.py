@@ -0,0 +1,251 @@
+"""
+Idle-session reaper for /ws/voice
+Sessions report activity (caller speech, text input, responses) with touch(),
+which only stamps a time. One background task keeps a heap of check deadlines
+and re-arms an entry lazily when it finds the session was active since it was
+scheduled; idle sessions are warned first, then closed together with their
+upstream socket. Sessions are also closed after a maximum duration. Each
+warning and close runs as its own task with a timeout, so one session that
+is slow to close does not hold up the others
+
+Benchmark: python session_reaper.py [n_sessions]
+"""
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import sys
+import time
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+SESSION_IDLE_TIMEOUT_S = float(os.getenv("SESSION_IDLE_TIMEOUT_S", "300"))
+# How long before an idle close the client is warned (0 disables warnings)
+SESSION_IDLE_WARNING_S = float(os.getenv("SESSION_IDLE_WARNING_S", "30"))
+SESSION_MAX_DURATION_S = float(os.getenv("SESSION_MAX_DURATION_S", "3600"))
+
+# WebSocket ping/pong: an unanswered ping closes the connection after the timeout
+KEEPALIVE_INTERVAL_S = float(os.getenv("KEEPALIVE_INTERVAL_S", "15"))
+KEEPALIVE_TIMEOUT_S = float(os.getenv("KEEPALIVE_TIMEOUT_S", "10"))
+
+# Realtime events that count as caller activity (the microphone streams silence too)
+ACTIVITY_EVENTS = {
+    "input_audio_buffer.speech_started",
+    "conversation.item.input_audio_transcription.completed",
+}
+
+# Heap entries handled before the reaper yields to the event loop
+REAPER_BATCH = 256
+# Longest a single warning or close may take before it is abandoned
+REAPER_ACTION_TIMEOUT_S = float(os.getenv("REAPER_ACTION_TIMEOUT_S", "10"))
+
+WARN, CLOSE_IDLE, CLOSE_MAX = "warn", "idle", "max_duration"
+
+
+class _Tracked:
+    """Reaper state of one session"""
+
+    __slots__ = ("last_activity", "close", "warn")
+
+    def __init__(self, now: float, close: Callable[[str], Awaitable[None]],
+                 warn: Optional[Callable[[float], Awaitable[None]]]):
+        self.last_activity = now
+        self.close = close
+        self.warn = warn
+
+
+class SessionReaper:
+    """Warns and closes idle or overlong sessions from a single task"""
+
+    def __init__(self, idle_timeout_s: float = SESSION_IDLE_TIMEOUT_S, warning_s: float = SESSION_IDLE_WARNING_S,
+                 max_duration_s: float = SESSION_MAX_DURATION_S, action_timeout_s: float = REAPER_ACTION_TIMEOUT_S):
+        self.idle_timeout_s = idle_timeout_s
+        self.warning_s = min(warning_s, idle_timeout_s)
+        self.max_duration_s = max_duration_s
+        self.action_timeout_s = action_timeout_s
+        self._sessions: Dict[str, _Tracked] = {}
+        # (deadline, seq, session_id, action); entries of closed or active sessions are skipped when popped
+        self._heap: List[Tuple[float, int, str, str]] = []
+        self._seq = itertools.count()
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._actions: Set[asyncio.Task] = set()  # warnings and closes in progress
+        self.stats = {"warned": 0, "closed_idle": 0, "closed_max_duration": 0, "rearmed": 0, "timed_out": 0}
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    # ------------------------------------------------------------------------
+    # Sessions
+    # ------------------------------------------------------------------------
+
+    def register(self, session_id: str, close: Callable[[str], Awaitable[None]],
+                 warn: Optional[Callable[[float], Awaitable[None]]] = None) -> None:
+        """close(reason) ends the session; warn(seconds_left) notifies the client"""
+        now = time.monotonic()
+        self._sessions[session_id] = _Tracked(now, close, warn)
+        self._schedule_idle(session_id, now)
+        if self.max_duration_s > 0:
+            self._push(now + self.max_duration_s, session_id, CLOSE_MAX)
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    def unregister(self, session_id: str) -> None:
+        self._sessions.pop(session_id, None)
+
+    def touch(self, session_id: str) -> None:
+        """Session activity; O(1), the heap is not touched"""
+        tracked = self._sessions.get(session_id)
+        if tracked is not None:
+            tracked.last_activity = time.monotonic()
+
+    def idle_s(self, session_id: str) -> Optional[float]:
+        tracked = self._sessions.get(session_id)
+        return time.monotonic() - tracked.last_activity if tracked is not None else None
+
+    def _schedule_idle(self, session_id: str, last_activity: float) -> None:
+        if self.idle_timeout_s <= 0:
+            return
+        if self.warning_s > 0:
+            self._push(last_activity + self.idle_timeout_s - self.warning_s, session_id, WARN)
+        else:
+            self._push(last_activity + self.idle_timeout_s, session_id, CLOSE_IDLE)
+
+    def _push(self, deadline: float, session_id: str, action: str) -> None:
+        earliest = self._heap[0][0] if self._heap else None
+        heapq.heappush(self._heap, (deadline, next(self._seq), session_id, action))
+        if earliest is None or deadline < earliest:
+            self._wakeup.set()
+
+    # ------------------------------------------------------------------------
+    # Reaper task
+    # ------------------------------------------------------------------------
+
+    async def _run(self) -> None:
+        fired = 0
+        while self._heap:
+            delay = self._heap[0][0] - time.monotonic()
+            if delay > 0:
+                self._wakeup.clear()
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=delay)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            fired += 1
+            if fired % REAPER_BATCH == 0:
+                # Many deadlines at once: let sessions run between batches
+                await asyncio.sleep(0)
+                continue
+            _, _, session_id, action = heapq.heappop(self._heap)
+            tracked = self._sessions.get(session_id)
+            if tracked is None:
+                continue
+            self._fire(session_id, tracked, action)
+
+    def _spawn(self, session_id: str, action: str, call: Awaitable[None]) -> None:
+        """Run a warning or close in its own task, bounded by action_timeout_s"""
+        task = asyncio.create_task(self._run_action(session_id, action, call))
+        self._actions.add(task)
+        task.add_done_callback(self._actions.discard)
+
+    async def _run_action(self, session_id: str, action: str, call: Awaitable[None]) -> None:
+        try:
+            await asyncio.wait_for(call, timeout=self.action_timeout_s)
+        except asyncio.TimeoutError:
+            self.stats["timed_out"] += 1
+            logger.error(f"❌ Reaper action {action} for session {session_id} timed out "
+                         f"after {self.action_timeout_s:g} s")
+        except Exception as e:
+            logger.error(f"❌ Reaper action {action} for session {session_id} failed: {e}")
+
+    def _fire(self, session_id: str, tracked: _Tracked, action: str) -> None:
+        now = time.monotonic()
+        if action == CLOSE_MAX:
+            self.stats["closed_max_duration"] += 1
+            logger.info(f"⏱️ Closing session {session_id}: reached {self.max_duration_s:.0f} s maximum duration")
+            self.unregister(session_id)
+            self._spawn(session_id, action, tracked.close(CLOSE_MAX))
+            return
+
+        idle_deadline = tracked.last_activity + self.idle_timeout_s
+        if action == WARN:
+            if now < idle_deadline - self.warning_s:
+                # Active since this entry was scheduled: re-arm from the latest activity
+                self.stats["rearmed"] += 1
+                self._schedule_idle(session_id, tracked.last_activity)
+                return
+            self.stats["warned"] += 1
+            self._push(idle_deadline, session_id, CLOSE_IDLE)
+            if tracked.warn is not None:
+                self._spawn(session_id, action, tracked.warn(max(0.0, idle_deadline - now)))
+        elif action == CLOSE_IDLE:
+            if now < idle_deadline:
+                self.stats["rearmed"] += 1
+                self._schedule_idle(session_id, tracked.last_activity)
+                return
+            self.stats["closed_idle"] += 1
+            logger.info(f"💤 Closing session {session_id}: idle for {now - tracked.last_activity:.0f} s")
+            self.unregister(session_id)
+            self._spawn(session_id, action, tracked.close(CLOSE_IDLE))
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **self.stats,
+            "sessions": len(self._sessions),
+            "scheduled": len(self._heap),
+            "in_progress": len(self._actions),
+            "idle_timeout_s": self.idle_timeout_s,
+            "max_duration_s": self.max_duration_s
+        }
+
+    async def close(self) -> None:
+        self._sessions.clear()
+        self._heap.clear()
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        for task in list(self._actions):
+            task.cancel()
+
+
+session_reaper = SessionReaper()
+
+
+async def _benchmark(n: int) -> None:
+    """Reaper cost with n sessions: touches are free, deadlines cost one heap operation"""
+    closed: List[str] = []
+    reaper = SessionReaper(idle_timeout_s=1.0, warning_s=0.5, max_duration_s=0)
+
+    def closer(session_id: str):
+        async def close(reason: str) -> None:
+            closed.append(session_id)
+        return close
+
+    started = time.perf_counter()
+    for i in range(n):
+        reaper.register(f"s{i}", closer(f"s{i}"))
+    registered = time.perf_counter() - started
+
+    # Half the sessions stay active, the other half go idle
+    touch_s = 0.0
+    for _ in range(15):
+        started = time.perf_counter()
+        for i in range(0, n, 2):
+            reaper.touch(f"s{i}")
+        touch_s += time.perf_counter() - started
+        await asyncio.sleep(0.1)
+    touch_us = touch_s / (15 * ((n + 1) // 2)) * 1e6
+
+    print(f"{n:,} sessions, 1 s idle timeout, half of them active")
+    print(f"  register: {registered / n * 1e6:6.2f} µs per session")
+    print(f"  touch:    {touch_us:6.2f} µs")
+    print(f"  closed after 1.5 s: {len(closed):,} (expected {n // 2:,}), heap entries left {len(reaper._heap):,}")
+    print(f"  {reaper.snapshot()}")
+    await reaper.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100000))
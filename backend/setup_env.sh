@@ -49,7 +49,7 @@ fi
 echo ""
 echo "📋 Next steps:"
 echo "1. Edit .env and add your OpenAI API key"
-echo "2. (Optional) Run 'python get_cartesia_voices.py' to see available voices"
+echo "2. (Optional) Run 'python voice_catalog.py list' to see available voices"
 echo "3. Start the server with 'python app.py'"
 echo ""
 
@@ -0,0 +1,201 @@
+"""
+Speculative tool execution for the Realtime proxy
+Parses response.function_call_arguments.delta incrementally and starts
+read-only tools as soon as their required arguments are complete; the result
+is committed when .done confirms the arguments, or discarded otherwise.
+Likely follow-up calls (bills after an account lookup) are prefetched
+"""
+import asyncio
+import json
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from tools import execute_tool
+
+logger = logging.getLogger(__name__)
+
+# Read-only tools that are safe to run before the model finishes the call,
+# with the arguments that must be complete before starting them
+SPECULATIVE_TOOLS: Dict[str, Tuple[str, ...]] = {
+    "lookup_account": ("identifier",),
+    "get_bills": ("account_id",),
+    # Answered from plan_engine, the same figures select_payment_plan uses
+    "show_payment_plans": ("bill_id",),
+}
+
+# Speculative/prefetched results kept per session
+MAX_PENDING_RESULTS = 16
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = " \t\n\r"
+
+
+def _skip_whitespace(text: str, index: int) -> int:
+    while index < len(text) and text[index] in _WHITESPACE:
+        index += 1
+    return index
+
+
+class IncrementalArgumentParser:
+    """
+    Incremental parser for a JSON object arriving in fragments
+    Each top-level field is reported once its value is fully received;
+    already-parsed fields are never rescanned
+    """
+
+    def __init__(self):
+        self.buffer = ""
+        self.position = 0
+        self.started = False
+        self.invalid = False
+        self.fields: Dict[str, Any] = {}
+
+    def feed(self, fragment: str) -> List[str]:
+        """Append a fragment and return the keys completed by it"""
+        self.buffer += fragment
+        completed: List[str] = []
+        text = self.buffer
+
+        while not self.invalid:
+            index = _skip_whitespace(text, self.position)
+            if index >= len(text):
+                break
+            if not self.started:
+                if text[index] != "{":
+                    self.invalid = True
+                    break
+                self.started = True
+                self.position = index + 1
+                continue
+            if text[index] == ",":
+                self.position = index + 1
+                continue
+            if text[index] == "}":
+                break
+
+            try:
+                key, index = _decoder.raw_decode(text, index)
+            except ValueError:
+                break
+            index = _skip_whitespace(text, index)
+            if index >= len(text):
+                break
+            if text[index] != ":" or not isinstance(key, str):
+                self.invalid = True
+                break
+            index = _skip_whitespace(text, index + 1)
+            if index >= len(text):
+                break
+            try:
+                value, end = _decoder.raw_decode(text, index)
+            except ValueError:
+                break
+            # Numbers and literals are only final once something follows them
+            if not isinstance(value, (str, dict, list)) and end >= len(text):
+                break
+
+            self.fields[key] = value
+            completed.append(key)
+            self.position = end
+
+        return completed
+
+
+def _result_key(name: str, args: Dict[str, Any]) -> str:
+    return f"{name}:{json.dumps(args, sort_keys=True)}"
+
+
+class _PendingCall:
+    def __init__(self, name: str):
+        self.name = name
+        self.parser = IncrementalArgumentParser()
+        self.key: Optional[str] = None
+
+
+class SpeculativeToolRunner:
+    """Per-session speculative executor for SPECULATIVE_TOOLS"""
+
+    def __init__(self, executor: Callable = execute_tool):
+        self.executor = executor
+        self.pending_calls: Dict[str, _PendingCall] = {}
+        self.results: "OrderedDict[str, asyncio.Task]" = OrderedDict()
+        self.stats = {"speculative_hits": 0, "prefetch_hits": 0, "misses": 0, "discarded": 0}
+
+    @staticmethod
+    def handles(name: str) -> bool:
+        return name in SPECULATIVE_TOOLS
+
+    def _start(self, name: str, args: Dict[str, Any]) -> str:
+        key = _result_key(name, args)
+        if key not in self.results:
+            self.results[key] = asyncio.create_task(self.executor(name, json.dumps(args)))
+            while len(self.results) > MAX_PENDING_RESULTS:
+                _, evicted = self.results.popitem(last=False)
+                evicted.cancel()
+        return key
+
+    def _discard(self, key: Optional[str]) -> None:
+        task = self.results.pop(key, None) if key else None
+        if task is not None:
+            task.cancel()
+            self.stats["discarded"] += 1
+
+    def on_output_item_added(self, item: Dict[str, Any]) -> None:
+        """response.output_item.added announces the function name before any arguments"""
+        if item.get("type") == "function_call" and self.handles(item.get("name")):
+            self.pending_calls[item.get("call_id")] = _PendingCall(item["name"])
+
+    def on_arguments_delta(self, call_id: str, delta: str) -> None:
+        call = self.pending_calls.get(call_id)
+        if call is None or call.key is not None:
+            return
+        call.parser.feed(delta)
+        required = SPECULATIVE_TOOLS[call.name]
+        if all(isinstance(call.parser.fields.get(field), str) and call.parser.fields[field] for field in required):
+            args = {field: call.parser.fields[field] for field in required}
+            call.key = self._start(call.name, args)
+            logger.info(f"⚡ Speculatively started {call.name}({args})")
+
+    async def resolve(self, name: str, call_id: str, arguments_str: str) -> Dict[str, Any]:
+        """Called on .done: commit the speculative result if the final arguments match"""
+        call = self.pending_calls.pop(call_id, None)
+        try:
+            args = json.loads(arguments_str or "{}")
+        except json.JSONDecodeError:
+            args = {}
+
+        key = _result_key(name, args)
+        if call is not None and call.key is not None and call.key != key:
+            self._discard(call.key)
+
+        task = self.results.pop(key, None)
+        if task is not None and not task.cancelled():
+            self.stats["speculative_hits" if call and call.key == key else "prefetch_hits"] += 1
+        else:
+            self.stats["misses"] += 1
+            task = asyncio.create_task(self.executor(name, json.dumps(args)))
+
+        result = await task
+        self._prefetch_after(name, result)
+        return result
+
+    def _prefetch_after(self, name: str, result: Dict[str, Any]) -> None:
+        # The system prompt always follows a successful lookup with get_bills
+        if name == "lookup_account" and result.get("success"):
+            account_id = result.get("account", {}).get("id")
+            if account_id:
+                self._start("get_bills", {"account_id": account_id})
+
+    def forget(self, name: str) -> None:
+        """Drop pending results of a tool whose data just changed (e.g. bills after a payment)"""
+        for key in [key for key in self.results if key.startswith(f"{name}:")]:
+            self._discard(key)
+
+    def close(self) -> None:
+        for task in self.results.values():
+            task.cancel()
+        self.results.clear()
+        self.pending_calls.clear()
+        if any(self.stats.values()):
+            logger.info(f"⚡ Speculative tool stats: {self.stats}")
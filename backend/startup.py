@@ -0,0 +1,171 @@
+"""
+Startup timeline and deferred dependencies
+The openai client library, the heaviest import, is wrapped in LazyDependency
+and imported on first use or by a warm-up task after the server is listening,
+so a cold worker accepts its first WebSocket without waiting for them. The
+timeline records when each startup phase finished, measured from process
+start; /ready reports it and turns 200 once the dependencies are warm
+
+Benchmark: python startup.py [runs]
+"""
+import asyncio
+import logging
+import os
+import subprocess
+import sys
+import threading
+import time
+from typing import Any, Callable, Dict, Generic, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+
+def _process_started() -> float:
+    """time.monotonic() at process start (Linux), or now when unknown"""
+    try:
+        with open("/proc/self/stat") as f:
+            start_ticks = int(f.read().rsplit(")", 1)[1].split()[19])
+        age = time.clock_gettime(time.CLOCK_BOOTTIME) - start_ticks / os.sysconf("SC_CLK_TCK")
+        return time.monotonic() - max(age, 0.0)
+    except (OSError, ValueError, AttributeError, IndexError):
+        return time.monotonic()
+
+
+class StartupTimeline:
+    """Milliseconds from process start to the end of each startup phase"""
+
+    def __init__(self):
+        self.started = _process_started()
+        self.phases: Dict[str, float] = {}
+        self.ready = False
+
+    def mark(self, phase: str) -> None:
+        """Record a phase the first time it completes"""
+        if phase not in self.phases:
+            self.phases[phase] = round((time.monotonic() - self.started) * 1000, 1)
+
+    async def warm(self, *dependencies: "LazyDependency") -> None:
+        """Load dependencies off the event loop, then report ready"""
+        for dependency in dependencies:
+            try:
+                await dependency.aget()
+            except Exception as e:
+                logger.error(f"❌ Warming {dependency.name} failed: {e}")
+        self.mark("dependencies_warm")
+        self.ready = True
+        logger.info(f"🚀 Ready: {', '.join(f'{phase} {ms:.0f} ms' for phase, ms in self.phases.items())}")
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {"ready": self.ready, "phases_ms": dict(self.phases)}
+
+
+class LazyDependency(Generic[T]):
+    """A value built on first use; get() is thread-safe, aget() never blocks the loop"""
+
+    def __init__(self, name: str, loader: Callable[[], T]):
+        self.name = name
+        self._loader = loader
+        self._lock = threading.Lock()
+        self._loaded = False
+        self._value: Optional[T] = None
+        self.load_ms: Optional[float] = None
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded
+
+    def get(self) -> T:
+        if not self._loaded:
+            with self._lock:
+                if not self._loaded:
+                    started = time.perf_counter()
+                    self._value = self._loader()
+                    self.load_ms = round((time.perf_counter() - started) * 1000, 1)
+                    self._loaded = True
+                    logger.info(f"📦 Loaded {self.name} in {self.load_ms:.0f} ms")
+        return self._value
+
+    async def aget(self) -> T:
+        if self._loaded:
+            return self._value
+        return await asyncio.to_thread(self.get)
+
+
+class TimelineMiddleware:
+    """ASGI middleware marking the first request; a flag check afterwards"""
+
+    def __init__(self, app, timeline: StartupTimeline):
+        self.app = app
+        self.timeline = timeline
+        self._seen = False
+
+    async def __call__(self, scope, receive, send):
+        if not self._seen and scope["type"] in ("http", "websocket"):
+            self._seen = True
+            self.timeline.mark("first_request")
+        await self.app(scope, receive, send)
+
+
+startup_timeline = StartupTimeline()
+
+
+async def _time_to_first_websocket(command: list, port: int) -> Dict[str, Any]:
+    import aiohttp
+    import websockets
+
+    env = {
+        **os.environ,
+        "SERVER_HOST": "127.0.0.1",
+        "PORT": str(port),
+        "WEB_CONCURRENCY": "1",
+        "OPENAI_API_KEY": os.getenv("OPENAI_API_KEY", "bench"),
+        "OPENAI_REALTIME_URL": "ws://127.0.0.1:9/v1/realtime",  # sessions end at once; only the accept counts
+        "LOG_LEVEL": "warning",
+        "RATE_LIMIT_EXEMPT_LOOPBACK": "true"
+    }
+    started = time.perf_counter()
+    process = subprocess.Popen(command, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        while True:
+            try:
+                async with websockets.connect(f"ws://127.0.0.1:{port}/ws/voice", open_timeout=5):
+                    accepted = (time.perf_counter() - started) * 1000
+                break
+            except OSError:
+                await asyncio.sleep(0.005)
+        async with aiohttp.ClientSession() as session:
+            while True:
+                async with session.get(f"http://127.0.0.1:{port}/ready") as response:
+                    body = await response.json()
+                    if response.status == 200:
+                        break
+                await asyncio.sleep(0.02)
+        return {"first_websocket_ms": accepted, "ready_ms": (time.perf_counter() - started) * 1000, **body}
+    finally:
+        process.terminate()
+        await asyncio.to_thread(process.wait, 30)
+
+
+async def _benchmark(runs: int) -> None:
+    """Time from process start to the first accepted /ws/voice, with and without deferred imports"""
+    backend = os.path.dirname(os.path.abspath(__file__))
+    os.chdir(backend)
+    commands = {
+        # Importing the clients up front, as app.py did before they were deferred
+        "eager": [sys.executable, "-c",
+                  "import openai, resend, runpy; runpy.run_path('serve.py', run_name='__main__')"],
+        "deferred": [sys.executable, "serve.py"],
+    }
+    print(f"Process start → first accepted WebSocket, median of {runs} runs (1 worker)")
+    for name, command in commands.items():
+        results = [await _time_to_first_websocket(command, 8790 + run) for run in range(runs)]
+        results.sort(key=lambda result: result["first_websocket_ms"])
+        median = results[len(results) // 2]
+        print(f"  {name:<9} first WebSocket {median['first_websocket_ms']:6.0f} ms   ready {median['ready_ms']:6.0f} ms")
+        print(f"            server timeline: {median['phases_ms']}")
+
+
+if __name__ == "__main__":
+    asyncio.run(_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 5))
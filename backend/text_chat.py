@@ -0,0 +1,192 @@
+"""
+Text-only chat over the Chat Completions API
+Streams tokens to the client without opening a Realtime session; tool calls
+are executed on the backend and fed back to the model
+"""
+import asyncio
+import json
+import logging
+import uuid
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional, Tuple
+
+from tools import execute_tool
+
+logger = logging.getLogger(__name__)
+
+# Safety valve against tool-call loops in a single turn
+MAX_TOOL_ROUNDS = 5
+# Messages kept per conversation (excluding the system prompt)
+MAX_HISTORY_MESSAGES = 40
+# Conversations kept in memory before the oldest is evicted
+MAX_CONVERSATIONS = 1000
+
+
+def to_chat_tools(realtime_tools: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    """Convert Realtime-style tool definitions to the Chat Completions format"""
+    return [
+        {
+            "type": "function",
+            "function": {
+                "name": tool["name"],
+                "description": tool.get("description", ""),
+                "parameters": tool.get("parameters", {"type": "object", "properties": {}})
+            }
+        }
+        for tool in realtime_tools
+    ]
+
+
+class ChatConversationStore:
+    """In-memory conversation histories, evicted least-recently-used first"""
+
+    def __init__(self, max_conversations: int = MAX_CONVERSATIONS,
+                 on_evict: Optional[Callable[[str], None]] = None):
+        self.max_conversations = max_conversations
+        self.on_evict = on_evict  # called with the id of each evicted conversation
+        self._conversations: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._locks: Dict[str, asyncio.Lock] = {}
+
+    def get_or_create(self, conversation_id: str = None) -> Tuple[str, List[Dict[str, Any]]]:
+        if conversation_id and conversation_id in self._conversations:
+            self._conversations.move_to_end(conversation_id)
+            return conversation_id, self._conversations[conversation_id]
+
+        conversation_id = conversation_id or str(uuid.uuid4())
+        history: List[Dict[str, Any]] = []
+        self._conversations[conversation_id] = history
+        while len(self._conversations) > self.max_conversations:
+            evicted, _ = self._conversations.popitem(last=False)
+            self._locks.pop(evicted, None)
+            if self.on_evict is not None:
+                self.on_evict(evicted)
+        return conversation_id, history
+
+    def lock(self, conversation_id: str) -> asyncio.Lock:
+        """Lock serializing the turns of one conversation"""
+        lock = self._locks.get(conversation_id)
+        if lock is None:
+            lock = self._locks[conversation_id] = asyncio.Lock()
+        return lock
+
+    def __len__(self) -> int:
+        return len(self._conversations)
+
+
+def trim_history(history: List[Dict[str, Any]]) -> None:
+    """Drop the oldest turns, never leaving an orphaned tool result at the head"""
+    if len(history) <= MAX_HISTORY_MESSAGES:
+        return
+    del history[:len(history) - MAX_HISTORY_MESSAGES]
+    while history and history[0].get("role") != "user":
+        history.pop(0)
+
+
+async def stream_chat_reply(
+    client,
+    model: str,
+    instructions: str,
+    tools: List[Dict[str, Any]],
+    history: List[Dict[str, Any]],
+    user_message: str,
+    tool_executor: Callable = execute_tool
+) -> AsyncIterator[Dict[str, Any]]:
+    """
+    Run one user turn and yield client events as they happen:
+    response.text.delta, function_call (with its backend result) and
+    response.text.done
+
+    The caller must hold the conversation's lock. If the turn fails or is
+    abandoned before completing, every message it appended is rolled back so
+    the history never ends on an unanswered user turn or dangling tool call
+    """
+    turn_start = len(history)
+    completed = False
+    try:
+        async for event in _run_turn(client, model, instructions, tools, history, user_message, tool_executor):
+            if event["type"] == "response.text.done":
+                completed = True
+            yield event
+    finally:
+        if not completed:
+            del history[turn_start:]
+
+
+async def _run_turn(
+    client,
+    model: str,
+    instructions: str,
+    tools: List[Dict[str, Any]],
+    history: List[Dict[str, Any]],
+    user_message: str,
+    tool_executor: Callable
+) -> AsyncIterator[Dict[str, Any]]:
+    history.append({"role": "user", "content": user_message})
+    chat_tools = to_chat_tools(tools)
+
+    for _ in range(MAX_TOOL_ROUNDS):
+        stream = await client.chat.completions.create(
+            model=model,
+            messages=[{"role": "system", "content": instructions}] + history,
+            tools=chat_tools,
+            tool_choice="auto",
+            stream=True
+        )
+
+        text_parts: List[str] = []
+        tool_calls: Dict[int, Dict[str, str]] = {}
+
+        async for chunk in stream:
+            if not chunk.choices:
+                continue
+            delta = chunk.choices[0].delta
+            if delta.content:
+                text_parts.append(delta.content)
+                yield {"type": "response.text.delta", "delta": delta.content}
+            for tool_delta in delta.tool_calls or []:
+                call = tool_calls.setdefault(tool_delta.index, {"id": "", "name": "", "arguments": ""})
+                if tool_delta.id:
+                    call["id"] = tool_delta.id
+                if tool_delta.function:
+                    if tool_delta.function.name:
+                        call["name"] += tool_delta.function.name
+                    if tool_delta.function.arguments:
+                        call["arguments"] += tool_delta.function.arguments
+
+        text = "".join(text_parts)
+
+        if not tool_calls:
+            history.append({"role": "assistant", "content": text})
+            trim_history(history)
+            yield {"type": "response.text.done", "text": text}
+            return
+
+        ordered_calls = [tool_calls[index] for index in sorted(tool_calls)]
+        history.append({
+            "role": "assistant",
+            "content": text or None,
+            "tool_calls": [
+                {
+                    "id": call["id"],
+                    "type": "function",
+                    "function": {"name": call["name"], "arguments": call["arguments"]}
+                }
+                for call in ordered_calls
+            ]
+        })
+
+        for call in ordered_calls:
+            logger.info(f"🔧 Text chat function call: {call['name']}")
+            result = await tool_executor(call["name"], call["arguments"])
+            history.append({"role": "tool", "tool_call_id": call["id"], "content": json.dumps(result)})
+            yield {
+                "type": "function_call",
+                "call_id": call["id"],
+                "name": call["name"],
+                "arguments": call["arguments"],
+                "result": result
+            }
+
+    logger.warning(f"Text chat hit MAX_TOOL_ROUNDS ({MAX_TOOL_ROUNDS})")
+    trim_history(history)
+    yield {"type": "response.text.done", "text": ""}
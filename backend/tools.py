@@ -0,0 +1,330 @@
+"""
+Backend tool implementations for the voice/text assistant
+Mirrors the mock data and function handlers used by the frontend so that
+tools can be executed server-side (text chat, speculative execution, etc.)
+"""
+import json
+import logging
+import re
+import uuid
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from bills_cache import bills_cache
+from email_templates import get_receipt_html, get_receipt_sms
+from plan_engine import plan_engine, to_cents
+from receipt_channels import receipt_dispatcher
+from transactions import transaction_store
+
+logger = logging.getLogger(__name__)
+
+PAYMENT_METHOD_LABELS = {"card": "Credit Card", "bank": "Bank Account"}
+
+
+# ============================================================================
+# MOCK DATA (kept in sync with src/contexts/VoiceModeContext.tsx and
+# src/constants/bills.ts)
+# ============================================================================
+
+MOCK_ACCOUNTS: List[Dict[str, Any]] = [
+    {
+        "id": "acc_1",
+        "firstName": "Siva",
+        "lastName": "Kumar",
+        "phone": "9166065168",
+        "email": "sivakumar.kk@gmail.com",
+        "lastFour": "5678"
+    },
+    {
+        "id": "acc_2",
+        "firstName": "John",
+        "lastName": "Doe",
+        "phone": "555-0123",
+        "email": "john.doe@gmail.com",
+        "lastFour": "9876"
+    }
+]
+
+# Payment plans are priced per bill by plan_engine rather than hand-typed here
+BILLS: List[Dict[str, Any]] = [
+    {"id": "bill_1", "provider": "Medical Center", "amount": 1250.00},
+    {"id": "bill_2", "provider": "Dental Care", "amount": 850.50},
+    {"id": "bill_3", "provider": "Vision Care", "amount": 450.00}
+]
+
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+def normalize_phone(value: str) -> str:
+    """Strip non-digits and a leading US country code"""
+    digits = re.sub(r"\D", "", value or "")
+    if len(digits) == 11 and digits.startswith("1"):
+        digits = digits[1:]
+    return digits
+
+
+def to_e164(value: str) -> Optional[str]:
+    """+E.164 form of a US or +country-code phone number, None when invalid"""
+    if (value or "").strip().startswith("+"):
+        digits = re.sub(r"\D", "", value)
+        return f"+{digits}" if 8 <= len(digits) <= 15 else None
+    digits = normalize_phone(value)
+    return f"+1{digits}" if len(digits) == 10 else None
+
+
+def find_account(identifier: str) -> Optional[Dict[str, Any]]:
+    """Find a mock account by phone number or email"""
+    normalized = normalize_phone(identifier)
+    for account in MOCK_ACCOUNTS:
+        if normalized and normalize_phone(account["phone"]) == normalized:
+            return account
+        if account["email"].lower() == (identifier or "").lower():
+            return account
+    return None
+
+
+def find_bill(bill_id: str) -> Optional[Dict[str, Any]]:
+    """Find a bill by id, falling back to a partial provider name match"""
+    for bill in BILLS:
+        if bill["id"] == bill_id:
+            return bill
+    search_term = (bill_id or "").lower()
+    if not search_term:
+        return None
+    for bill in BILLS:
+        provider = bill["provider"].lower()
+        if search_term in provider or provider in search_term:
+            return bill
+    return None
+
+
+def available_providers() -> str:
+    return ", ".join(bill["provider"] for bill in BILLS)
+
+
+# ============================================================================
+# TOOL HANDLERS
+# ============================================================================
+
+async def lookup_account(args: Dict[str, Any]) -> Dict[str, Any]:
+    account = find_account(args.get("identifier", ""))
+    if account:
+        return {"success": True, "account": account}
+    return {"success": False, "error": "Account not found. Please try providing your email address."}
+
+
+async def get_bills(args: Dict[str, Any]) -> Dict[str, Any]:
+    account_id = args.get("account_id")
+    if not any(account["id"] == account_id for account in MOCK_ACCOUNTS):
+        return {"success": False, "error": f"Unknown account_id: {account_id}. Look up the account first."}
+    cached = bills_cache.get(account_id)
+    if cached is not None:
+        return cached
+    generation = bills_cache.generation(account_id)
+
+    # Bills already paid in full through the assistant are no longer due
+    paid_cents: Dict[str, int] = {}
+    for transaction in await transaction_store.recent(account_id, limit=50):
+        bill_id = transaction.get("bill_id")
+        paid_cents[bill_id] = paid_cents.get(bill_id, 0) + transaction["amount_cents"]
+    remaining = [b for b in BILLS if paid_cents.get(b["id"], 0) < to_cents(b["amount"])]
+    return bills_cache.put(account_id, {
+        "success": True,
+        "bills": [{"id": b["id"], "provider": b["provider"], "amount": b["amount"]} for b in remaining],
+        "message": "Bills are now displayed on the screen for you to review."
+    }, generation)
+
+
+async def show_payment_plans(args: Dict[str, Any]) -> Dict[str, Any]:
+    bill_id = args.get("bill_id")
+    if not bill_id:
+        return {
+            "success": False,
+            "error": f"Please specify which bill you'd like to see payment plans for. Available bills: {available_providers()}"
+        }
+    bill = find_bill(bill_id)
+    if not bill:
+        return {"success": False, "error": f"Bill not found. Available bills: {available_providers()}"}
+    return {
+        "success": True,
+        "bill_id": bill["id"],
+        "plans": plan_engine.quote([bill["amount"]])[0],
+        "message": f"Payment plans are now displayed on screen for {bill['provider']}."
+    }
+
+
+async def select_payment_plan(args: Dict[str, Any]) -> Dict[str, Any]:
+    bill_id = args.get("bill_id")
+    plan_id = args.get("plan_id")
+    bill = find_bill(bill_id)
+    plan = plan_engine.find_plan(bill["amount"], plan_id) if bill else None
+    if bill and plan:
+        return {
+            "success": True,
+            "bill_id": bill["id"],
+            "plan": plan,
+            "message": f"Payment plan selected: {plan['label']} for {bill['provider']}. Payment form is now displayed on screen. Waiting for user to enter payment details and click \"Pay Now\"."
+        }
+    available_plans = ", ".join(p["id"] for p in plan_engine.quote([bill["amount"]])[0]) if bill else "N/A"
+    return {
+        "success": False,
+        "error": f"Invalid bill or plan. Bill provided: \"{bill_id}\", Plan: \"{plan_id}\". Available bills: {available_providers()}. Available plans: {available_plans}"
+    }
+
+
+async def process_payment(args: Dict[str, Any]) -> Dict[str, Any]:
+    amount = args.get("amount")
+    transaction_id = f"TXN{uuid.uuid4().hex[:12].upper()}"
+    return {
+        "success": True,
+        "transaction_id": transaction_id,
+        "amount": amount,
+        "bill_id": args.get("bill_id"),
+        "timestamp": datetime.now().isoformat(),
+        "message": f"Payment of ${amount} processed successfully"
+    }
+
+
+async def send_email(args: Dict[str, Any]) -> Dict[str, Any]:
+    to_email = args.get("to")
+    logger.info(f"📧 Sending email to {to_email}...")
+    if not receipt_dispatcher.configured("email"):
+        logger.error("❌ Email provider not configured")
+        return {"success": False, "error": "Email service not configured."}
+    delivery = await receipt_dispatcher.send("email", {
+        "to": [to_email],
+        "subject": args.get("subject"),
+        "html": args.get("html")
+    })
+    if not delivery["success"]:
+        return {"success": False, "error": f"Error sending email: {delivery['error']}"}
+    logger.info(f"✅ Email sent: {delivery['id']}")
+    return {"success": True, "message": "Email sent successfully."}
+
+
+def owned_by(transaction: Dict[str, Any], caller: Optional[Dict[str, Any]]) -> bool:
+    """Whether the calling session made the transaction or verified its account"""
+    if not caller:
+        return False
+    if caller.get("session_id") and transaction.get("session_id") == caller["session_id"]:
+        return True
+    return bool(caller.get("account_id")) and transaction.get("account_id") == caller["account_id"]
+
+
+async def send_receipt(args: Dict[str, Any], caller: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    method = args.get("method")
+    recipient = args.get("recipient")
+    transaction_id = args.get("transaction_id")
+    if method not in ("email", "sms"):
+        return {"success": False, "error": f"Unknown receipt method: {method}. Use email or sms."}
+    if method == "sms":
+        recipient = to_e164(recipient)
+        if recipient is None:
+            return {"success": False, "error": f"Invalid phone number for an SMS receipt: {args.get('recipient')}"}
+
+    # Payments made through the assistant are on record; ones completed in the
+    # UI (confirmation numbers) only have the amount the model was told. Other
+    # callers' transactions are treated as unknown
+    transaction = await transaction_store.get(transaction_id)
+    if transaction is not None and not owned_by(transaction, caller):
+        transaction = None
+    if transaction is not None:
+        amount = f"{transaction['amount_cents'] / 100:.2f}"
+        paid_at = datetime.fromtimestamp(transaction["created_at"])
+        payment_method = PAYMENT_METHOD_LABELS.get(transaction.get("payment_method"), "Credit Card")
+    elif args.get("amount") is not None:
+        amount = f"{to_cents(args['amount']) / 100:.2f}"
+        paid_at = datetime.now()
+        payment_method = "Credit Card"
+    else:
+        return {"success": False, "error": f"Transaction {transaction_id} not found. Include the payment amount to send a receipt."}
+
+    logger.info(f"{'📱' if method == 'sms' else '📧'} Sending receipt to {recipient}...")
+    if not receipt_dispatcher.configured(method):
+        return {"success": False, "error": f"{'SMS' if method == 'sms' else 'Email'} service not configured."}
+    date_str = paid_at.strftime("%B %d, %Y")
+    if method == "sms":
+        message = {"to": recipient, "body": get_receipt_sms(transaction_id, amount, date_str)}
+    else:
+        message = {
+            "to": [recipient],
+            "subject": f"Payment Receipt - {transaction_id}",
+            "html": get_receipt_html(transaction_id, amount, date_str, payment_method)
+        }
+    delivery = await receipt_dispatcher.send(method, message)
+    if not delivery["success"]:
+        return {"success": False, "error": f"Error sending receipt: {delivery['error']}"}
+    logger.info(f"✅ Receipt sent: {delivery['id']}")
+    return {"success": True, "message": "Receipt sent successfully."}
+
+
+async def apply_for_card(args: Dict[str, Any]) -> Dict[str, Any]:
+    return {"success": True, "message": "I have provided the link to apply for a new CareCredit card in the chat."}
+
+
+async def select_payment_option(args: Dict[str, Any]) -> Dict[str, Any]:
+    option = (args.get("option") or "").lower()
+    if "carecredit" in option and "card" in option:
+        option = "carecredit-card"
+    elif "account" in option and "lookup" in option:
+        option = "account-lookup"
+    elif "apply" in option:
+        option = "apply-new"
+    messages = {
+        "apply-new": "Opening application for new CareCredit card.",
+        "account-lookup": "I've opened the account lookup screen. Please select your account to continue.",
+        "carecredit-card": "I've opened the secure payment form. Please enter your card details."
+    }
+    return {"success": True, "option": option, "message": messages.get(option, f"Selected payment option: {option}.")}
+
+
+async def select_account(args: Dict[str, Any]) -> Dict[str, Any]:
+    identifier = args.get("account_identifier") or ""
+    account = {"id": "acc_1", "last4": "5678", "type": "CareCredit Rewards"}
+    if "4321" in identifier:
+        account = {"id": "acc_2", "last4": "4321", "type": "CareCredit Standard"}
+    return {
+        "success": True,
+        "account": account,
+        "message": f"I've selected the account ending in {account['last4']}. Please confirm the payment details on the screen to proceed."
+    }
+
+
+# Tools that only see data of the calling session or its verified account
+CALLER_SCOPED_TOOLS = {"send_receipt"}
+
+TOOL_HANDLERS: Dict[str, Callable] = {
+    "lookup_account": lookup_account,
+    "get_bills": get_bills,
+    "process_payment": process_payment,
+    "send_receipt": send_receipt,
+    "show_payment_plans": show_payment_plans,
+    "send_email": send_email,
+    "select_payment_plan": select_payment_plan,
+    "apply_for_card": apply_for_card,
+    "select_payment_option": select_payment_option,
+    "select_account": select_account,
+}
+
+
+async def execute_tool(name: str, arguments: str, caller: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    """
+    Execute a tool call by name with its raw JSON argument string
+    caller ({"session_id", "account_id"}) scopes CALLER_SCOPED_TOOLS to the calling session
+    """
+    handler = TOOL_HANDLERS.get(name)
+    if handler is None:
+        return {"success": False, "error": "Unknown function"}
+    try:
+        args = json.loads(arguments or "{}")
+    except json.JSONDecodeError:
+        args = {}
+    try:
+        if name in CALLER_SCOPED_TOOLS:
+            return await handler(args, caller)
+        return await handler(args)
+    except Exception as e:
+        logger.error(f"❌ Error executing tool {name}: {e}")
+        return {"success": False, "error": str(e)}
@@ -0,0 +1,253 @@
+"""
+Transaction store for payments made through the assistant
+SQLite in WAL mode behind in-memory indexes by transaction_id and by account.
+Writes are queued and committed in batches on a dedicated thread, so the event
+loop never blocks on disk; reads for receipts and "make another payment"
+flows are served from memory
+
+Benchmark: python transactions.py [n_transactions] [n_sessions]
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from plan_engine import to_cents
+
+logger = logging.getLogger(__name__)
+
+TRANSACTIONS_DB_PATH = os.getenv(
+    "TRANSACTIONS_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "transactions.db")
+)
+
+# Transactions kept in memory: per account for recent queries, and overall by id
+RECENT_PER_ACCOUNT = 50
+MAX_INDEXED_TRANSACTIONS = 100000
+MAX_WRITE_BATCH = 2000
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS transactions (
+    transaction_id TEXT PRIMARY KEY,
+    account_id TEXT,
+    bill_id TEXT,
+    amount_cents INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    data TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS transactions_account ON transactions (account_id, created_at);
+"""
+
+
+class TransactionStore:
+    """Indexed, write-behind transaction store"""
+
+    def __init__(self, path: str = TRANSACTIONS_DB_PATH):
+        self.path = path
+        self.by_id: Dict[str, Dict[str, Any]] = {}
+        self.by_account: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._pending: List[Tuple[Dict[str, Any], asyncio.Future]] = []
+        self._writer: Optional[asyncio.Task] = None
+        self._db: Optional[sqlite3.Connection] = None
+        # One thread owns the connection, so every database call runs on it
+        self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="transactions")
+        self._loaded: Optional[asyncio.Task] = None
+        self.stats = {"writes": 0, "commits": 0, "db_reads": 0}
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._thread, fn, *args)
+
+    # ------------------------------------------------------------------------
+    # Database thread
+    # ------------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(_SCHEMA)
+        return self._db
+
+    def _load_recent(self) -> List[Dict[str, Any]]:
+        rows = self._connect().execute(
+            "SELECT data FROM transactions ORDER BY created_at DESC LIMIT ?", (MAX_INDEXED_TRANSACTIONS,)
+        ).fetchall()
+        return [json.loads(data) for (data,) in reversed(rows)]
+
+    def _write_batch(self, records: List[Dict[str, Any]]) -> List[Optional[Exception]]:
+        """Insert a batch; per record, None or the error that kept it out"""
+        db = self._connect()
+        rows = [
+            (r["transaction_id"], r.get("account_id"), r.get("bill_id"), r["amount_cents"],
+             r["created_at"], json.dumps(r, separators=(",", ":")))
+            for r in records
+        ]
+        try:
+            with db:
+                db.executemany("INSERT INTO transactions VALUES (?, ?, ?, ?, ?, ?)", rows)
+            return [None] * len(rows)
+        except sqlite3.IntegrityError:
+            pass
+        # A duplicate id rolled the batch back; insert one by one so only the duplicate fails
+        errors: List[Optional[Exception]] = []
+        for row in rows:
+            try:
+                with db:
+                    db.execute("INSERT INTO transactions VALUES (?, ?, ?, ?, ?, ?)", row)
+                errors.append(None)
+            except sqlite3.IntegrityError as e:
+                errors.append(e)
+        return errors
+
+    def _select(self, transaction_id: str) -> Optional[Dict[str, Any]]:
+        row = self._connect().execute(
+            "SELECT data FROM transactions WHERE transaction_id = ?", (transaction_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    # ------------------------------------------------------------------------
+    # Event loop API
+    # ------------------------------------------------------------------------
+
+    async def _ready(self) -> None:
+        if self._loaded is None:
+            self._loaded = asyncio.ensure_future(self._load())
+        if not self._loaded.done():
+            await asyncio.shield(self._loaded)
+
+    async def _load(self) -> None:
+        records = await self._run(self._load_recent)
+        for record in records:
+            self._index(record)
+        logger.info(f"🧾 Loaded {len(records)} transactions from {self.path}")
+
+    def _index(self, record: Dict[str, Any]) -> None:
+        self.by_id[record["transaction_id"]] = record
+        while len(self.by_id) > MAX_INDEXED_TRANSACTIONS:
+            del self.by_id[next(iter(self.by_id))]
+        account_id = record.get("account_id")
+        if account_id:
+            recent = self.by_account.setdefault(account_id, deque(maxlen=RECENT_PER_ACCOUNT))
+            recent.appendleft(record)
+
+    def _unindex(self, record: Dict[str, Any]) -> None:
+        if self.by_id.get(record["transaction_id"]) is record:
+            del self.by_id[record["transaction_id"]]
+        recent = self.by_account.get(record.get("account_id"))
+        if recent is not None and record in recent:
+            recent.remove(record)
+
+    async def add(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Index a transaction immediately and return once its batch is committed
+        amount (dollars) is stored as exact amount_cents
+        """
+        await self._ready()
+        if record["transaction_id"] in self.by_id:
+            raise ValueError(f"Duplicate transaction id {record['transaction_id']}")
+        record = {**record, "amount_cents": to_cents(record.get("amount") or 0)}
+        record.setdefault("created_at", time.time())
+        self._index(record)
+
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((record, future))
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write_loop())
+        # A cancelled caller only stops waiting; the record is still written
+        await future
+        return record
+
+    async def _write_loop(self) -> None:
+        while self._pending:
+            batch, self._pending = self._pending[:MAX_WRITE_BATCH], self._pending[MAX_WRITE_BATCH:]
+            try:
+                errors = await self._run(self._write_batch, [record for record, _ in batch])
+            except Exception as e:
+                logger.error(f"❌ Writing {len(batch)} transactions failed: {e}")
+                errors = [e] * len(batch)
+            else:
+                self.stats["writes"] += errors.count(None)
+                self.stats["commits"] += 1
+            for (record, future), error in zip(batch, errors):
+                if isinstance(error, sqlite3.IntegrityError):
+                    # The stored transaction with this id stays the one that is served
+                    logger.error(f"❌ Transaction {record['transaction_id']} not written: {error}")
+                    self._unindex(record)
+                if future.done():
+                    continue
+                if error is None:
+                    future.set_result(None)
+                else:
+                    future.set_exception(error)
+
+    async def get(self, transaction_id: str) -> Optional[Dict[str, Any]]:
+        """Transaction by id; older ones outside the in-memory index come from SQLite"""
+        await self._ready()
+        record = self.by_id.get(transaction_id)
+        if record is None and transaction_id:
+            self.stats["db_reads"] += 1
+            record = await self._run(self._select, transaction_id)
+        return record
+
+    async def recent(self, account_id: str, limit: int = 10) -> List[Dict[str, Any]]:
+        """Most recent transactions of an account, newest first"""
+        await self._ready()
+        return list(self.by_account.get(account_id, ()))[:limit]
+
+    async def close(self) -> None:
+        if self._writer is not None:
+            await self._writer
+        if self._db is not None:
+            await self._run(self._db.close)
+            self._db = None
+        self._thread.shutdown(wait=True)
+
+
+transaction_store = TransactionStore()
+
+
+async def _benchmark(n: int, sessions: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        store = TransactionStore(os.path.join(tmp, "transactions.db"))
+        await store._ready()
+
+        async def session(index: int) -> None:
+            for i in range(index, n, sessions):
+                await store.add({
+                    "transaction_id": f"TXN{i:09d}",
+                    "account_id": f"acc_{i % 1000}",
+                    "bill_id": f"bill_{i % 3 + 1}",
+                    "amount": 125.5
+                })
+
+        started = time.perf_counter()
+        await asyncio.gather(*(session(index) for index in range(sessions)))
+        elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        for i in range(10000):
+            await store.recent(f"acc_{i % 1000}")
+            await store.get(f"TXN{i:09d}")
+        query_us = (time.perf_counter() - started) / 20000 * 1e6
+
+        print(f"{n:,} transactions from {sessions} concurrent sessions")
+        print(f"  writes:  {n / elapsed:10,.0f} /s  ({store.stats['commits']} commits, "
+              f"{n / store.stats['commits']:.0f} per batch)")
+        print(f"  queries: {query_us:10.2f} µs avg (recent + get)")
+        await store.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(_benchmark(
+        int(sys.argv[1]) if len(sys.argv) > 1 else 100000,
+        int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    ))
@@ -0,0 +1,100 @@
+"""
+Coalescing of transcript delta events on their way to the client
+Consecutive deltas for the same item are merged into one event per interval.
+Pending text is flushed right before the matching .done, a function call,
+barge-in or error, so captions never lag behind the events that end them
+"""
+import asyncio
+import json
+import logging
+import os
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+TRANSCRIPT_COALESCE_MS = int(os.getenv("TRANSCRIPT_COALESCE_MS", "100"))
+MAX_COALESCE_MS = 1000
+
+COALESCED_EVENTS = {
+    "response.audio_transcript.delta",
+    "conversation.item.input_audio_transcription.delta",
+}
+
+# Events that must not overtake pending transcript text
+FLUSH_EVENTS = {
+    "response.audio_transcript.done",
+    "conversation.item.input_audio_transcription.completed",
+    "response.function_call_arguments.done",
+    "response.done",
+    "input_audio_buffer.speech_started",
+    "error",
+}
+
+
+def parse_coalesce_ms(value: Optional[str]) -> int:
+    """?coalesce_ms= value, clamped to 0..MAX_COALESCE_MS (0 disables coalescing)"""
+    if value is None or value == "":
+        return TRANSCRIPT_COALESCE_MS
+    return max(0, min(int(value), MAX_COALESCE_MS))
+
+
+class TranscriptCoalescer:
+    """Merges transcript deltas for one client connection"""
+
+    def __init__(self, send: Callable[[str], Awaitable[None]], interval_ms: int = TRANSCRIPT_COALESCE_MS):
+        self.send = send
+        self.interval_ms = interval_ms
+        self._pending: Optional[Dict[str, Any]] = None
+        self._key: Optional[Tuple] = None
+        self._timer: Optional[asyncio.Task] = None
+        # Serializes flushes with the sends that must follow them
+        self._lock = asyncio.Lock()
+        self.stats = {"deltas_in": 0, "events_out": 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.interval_ms > 0
+
+    async def add(self, message: str) -> None:
+        data = json.loads(message)
+        key = (data.get("type"), data.get("item_id"), data.get("content_index"))
+        self.stats["deltas_in"] += 1
+        async with self._lock:
+            if self._pending is not None and key != self._key:
+                await self._flush_locked()
+            if self._pending is None:
+                self._pending, self._key = data, key
+                self._timer = asyncio.create_task(self._flush_later())
+            else:
+                self._pending["delta"] = self._pending.get("delta", "") + data.get("delta", "")
+
+    async def _flush_later(self) -> None:
+        await asyncio.sleep(self.interval_ms / 1000)
+        async with self._lock:
+            self._timer = None
+            await self._flush_locked()
+
+    async def _flush_locked(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        if self._pending is None:
+            return
+        event, self._pending, self._key = self._pending, None, None
+        self.stats["events_out"] += 1
+        await self.send(json.dumps(event))
+
+    async def flush(self, then: Optional[str] = None) -> None:
+        """Send pending text, then (optionally) the event that ended it"""
+        async with self._lock:
+            await self._flush_locked()
+            if then is not None:
+                await self.send(then)
+
+    def close(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        self._pending = None
+        if self.stats["deltas_in"]:
+            logger.info(f"✂️ Transcript coalescing: {self.stats['deltas_in']} deltas → {self.stats['events_out']} events")
@@ -0,0 +1,331 @@
+"""
+Hedged connects and a circuit breaker for the OpenAI Realtime upstream
+A connect is done when the handshake has completed and session.created has
+arrived, and it must finish within UPSTREAM_CONNECT_TIMEOUT_S. If the first
+attempt has not finished by the p95 of recent connects (per model), a second
+one is raced and the loser is closed; an attempt that fails early is retried
+at once. Each model has a circuit breaker: after BREAKER_FAILURE_THRESHOLD
+failed connects in a row it opens and new callers get an error immediately;
+after BREAKER_OPEN_S one half-open probe is let through, and its result closes
+or reopens the circuit. Breaker state is exported on /metrics
+
+Benchmark: python upstream_connector.py [connects]
+"""
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import sys
+import time
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional, Set, Tuple
+
+import websockets
+
+logger = logging.getLogger(__name__)
+
+UPSTREAM_CONNECT_TIMEOUT_S = float(os.getenv("UPSTREAM_CONNECT_TIMEOUT_S", "8"))
+UPSTREAM_MAX_ATTEMPTS = int(os.getenv("UPSTREAM_MAX_ATTEMPTS", "2"))  # 1 disables hedging
+# Hedge delay until enough connects have been timed for a p95
+UPSTREAM_HEDGE_FALLBACK_MS = float(os.getenv("UPSTREAM_HEDGE_FALLBACK_MS", "1500"))
+HEDGE_MIN_SAMPLES = 20
+HEDGE_MIN_DELAY_MS = 50
+CONNECT_SAMPLES = 200
+
+BREAKER_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+BREAKER_OPEN_S = float(os.getenv("BREAKER_OPEN_S", "30"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+BREAKER_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+
+class UpstreamUnavailable(Exception):
+    """The upstream could not be reached, or its circuit is open"""
+
+    def __init__(self, message: str, retry_after_s: Optional[float] = None):
+        super().__init__(message)
+        self.retry_after_s = retry_after_s
+
+
+class CircuitBreaker:
+    """Consecutive-failure breaker with a single half-open probe"""
+
+    def __init__(self, failure_threshold: int = BREAKER_FAILURE_THRESHOLD, open_s: float = BREAKER_OPEN_S):
+        self.failure_threshold = failure_threshold
+        self.open_s = open_s
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probing = False
+        self.stats = Counter()  # successes, failures, rejected, opened
+
+    def allow(self) -> bool:
+        """Whether a connect may start now; in half-open only the one probe may"""
+        if self.state == OPEN:
+            if time.monotonic() - self.opened_at < self.open_s:
+                self.stats["rejected"] += 1
+                return False
+            self.state = HALF_OPEN
+            logger.info("🔌 Circuit half-open: probing the upstream")
+        if self.state == HALF_OPEN:
+            if self._probing:
+                self.stats["rejected"] += 1
+                return False
+            self._probing = True
+        return True
+
+    def retry_after_s(self) -> float:
+        return max(0.0, self.opened_at + self.open_s - time.monotonic()) if self.state == OPEN else 0.0
+
+    def record_success(self) -> None:
+        self.stats["successes"] += 1
+        self.consecutive_failures = 0
+        if self.state != CLOSED:
+            logger.info("✅ Circuit closed: upstream recovered")
+        self.state = CLOSED
+        self._probing = False
+
+    def record_failure(self) -> None:
+        self.stats["failures"] += 1
+        self.consecutive_failures += 1
+        if self.state == HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != OPEN:
+                self.stats["opened"] += 1
+                logger.warning(f"⛔ Circuit open after {self.consecutive_failures} failed connects: "
+                               f"failing fast for {self.open_s:.0f} s")
+            self.state = OPEN
+            self.opened_at = time.monotonic()
+        self._probing = False
+
+    def release(self) -> None:
+        """A connect ended without a verdict (caller gone): free the probe slot"""
+        self._probing = False
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "retry_after_s": round(self.retry_after_s(), 1),
+            **{key: self.stats[key] for key in ("successes", "failures", "rejected", "opened")}
+        }
+
+
+class UpstreamConnector:
+    """Connects to Realtime upstreams, one breaker and latency history per model"""
+
+    def __init__(self, timeout_s: float = UPSTREAM_CONNECT_TIMEOUT_S, max_attempts: int = UPSTREAM_MAX_ATTEMPTS,
+                 failure_threshold: int = BREAKER_FAILURE_THRESHOLD, open_s: float = BREAKER_OPEN_S):
+        self.timeout_s = timeout_s
+        self.max_attempts = max(1, max_attempts)
+        self.failure_threshold = failure_threshold
+        self.open_s = open_s
+        self.breakers: Dict[str, CircuitBreaker] = {}
+        self._connect_ms: Dict[str, Deque[float]] = {}
+        self._closing: Set[asyncio.Task] = set()
+        self.stats = Counter()  # connects, hedged, hedge_wins, timeouts
+
+    def breaker(self, key: str) -> CircuitBreaker:
+        breaker = self.breakers.get(key)
+        if breaker is None:
+            breaker = self.breakers[key] = CircuitBreaker(self.failure_threshold, self.open_s)
+        return breaker
+
+    def hedge_delay_s(self, key: str) -> float:
+        samples = self._connect_ms.get(key)
+        if not samples or len(samples) < HEDGE_MIN_SAMPLES:
+            return UPSTREAM_HEDGE_FALLBACK_MS / 1000
+        ordered = sorted(samples)
+        return max(HEDGE_MIN_DELAY_MS, ordered[int(len(ordered) * 0.95)]) / 1000
+
+    # ------------------------------------------------------------------------
+    # Connect
+    # ------------------------------------------------------------------------
+
+    async def _attempt(self, url: str, options: Dict[str, Any]) -> Tuple[Any, Dict[str, Any]]:
+        ws = await websockets.connect(url, **options)
+        try:
+            raw = await ws.recv()
+            initial = json.loads(raw) if isinstance(raw, str) else {}
+            if initial.get("type") == "error":
+                raise Exception(f"OpenAI connection error: {initial.get('error', {}).get('message', 'Unknown error')}")
+            return ws, initial
+        except BaseException:
+            self._close_later(ws)
+            raise
+
+    def _close_later(self, ws) -> None:
+        task = asyncio.create_task(ws.close())
+        self._closing.add(task)
+        task.add_done_callback(self._closing.discard)
+
+    async def connect(self, key: str, url: str, **options: Any) -> Tuple[Any, Dict[str, Any]]:
+        """
+        Open the upstream socket for a model (key) and return it with its first
+        event (session.created); raises UpstreamUnavailable
+        """
+        breaker = self.breaker(key)
+        if not breaker.allow():
+            raise UpstreamUnavailable(
+                f"OpenAI Realtime ({key}) is unavailable, try again shortly",
+                retry_after_s=round(breaker.retry_after_s(), 1)
+            )
+        self.stats["connects"] += 1
+        started = time.monotonic()
+        deadline = started + self.timeout_s
+        # A half-open probe is a single attempt, so a failing upstream is not hit twice
+        max_attempts = 1 if breaker.state == HALF_OPEN else self.max_attempts
+        hedge_at = started + self.hedge_delay_s(key)
+        attempts: List[asyncio.Task] = []
+        pending: Set[asyncio.Task] = set()
+        error: Optional[BaseException] = None
+
+        def launch() -> None:
+            task = asyncio.create_task(self._attempt(url, options))
+            attempts.append(task)
+            pending.add(task)
+
+        launch()
+        try:
+            while True:
+                now = time.monotonic()
+                if now >= deadline:
+                    break
+                if len(attempts) < max_attempts and (not pending or now >= hedge_at):
+                    if pending:
+                        self.stats["hedged"] += 1
+                    launch()
+                    continue
+                wake = deadline if len(attempts) >= max_attempts else min(deadline, hedge_at)
+                done, pending = await asyncio.wait(pending, timeout=wake - now, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        ws, initial = task.result()
+                        elapsed_ms = (time.monotonic() - started) * 1000
+                        self._connect_ms.setdefault(key, deque(maxlen=CONNECT_SAMPLES)).append(elapsed_ms)
+                        if task is not attempts[0]:
+                            self.stats["hedge_wins"] += 1
+                        breaker.record_success()
+                        for other in done - {task}:
+                            if other.exception() is None:
+                                self._close_later(other.result()[0])
+                        return ws, initial
+                    error = task.exception()
+                if not pending and len(attempts) >= max_attempts:
+                    break
+        except asyncio.CancelledError:
+            breaker.release()
+            raise
+        finally:
+            for task in pending:
+                task.cancel()
+
+        if not error:
+            self.stats["timeouts"] += 1
+        breaker.record_failure()
+        reason = f"{error}" if error else f"no session within {self.timeout_s:g} s"
+        logger.error(f"❌ Upstream connect to {key} failed after {len(attempts)} attempt(s): {reason}")
+        raise UpstreamUnavailable(f"Could not reach OpenAI Realtime ({key}): {reason}")
+
+    @contextlib.asynccontextmanager
+    async def session(self, key: str, url: str, **options: Any):
+        """connect() as an async context manager yielding (ws, first event); closes the socket on exit"""
+        ws, initial = await self.connect(key, url, **options)
+        try:
+            yield ws, initial
+        finally:
+            await ws.close()
+
+    # ------------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------------
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            **{key: self.stats[key] for key in ("connects", "hedged", "hedge_wins", "timeouts")},
+            "breakers": {key: breaker.snapshot() for key, breaker in self.breakers.items()},
+            "hedge_delay_ms": {key: round(self.hedge_delay_s(key) * 1000) for key in self.breakers}
+        }
+
+    def prometheus(self) -> str:
+        """Prometheus text exposition of the connector and breaker metrics"""
+        lines = [
+            "# HELP upstream_breaker_state Circuit breaker state (0 closed, 1 half-open, 2 open)",
+            "# TYPE upstream_breaker_state gauge",
+        ]
+        for key, breaker in self.breakers.items():
+            lines.append(f'upstream_breaker_state{{model="{key}"}} {BREAKER_STATE_VALUES[breaker.state]}')
+        for stat, help_text in (("successes", "Successful connects"), ("failures", "Failed connects"),
+                                ("rejected", "Connects refused by an open circuit"),
+                                ("opened", "Times the circuit opened")):
+            lines.append(f"# HELP upstream_breaker_{stat}_total {help_text}")
+            lines.append(f"# TYPE upstream_breaker_{stat}_total counter")
+            for key, breaker in self.breakers.items():
+                lines.append(f'upstream_breaker_{stat}_total{{model="{key}"}} {breaker.stats[stat]}')
+        for stat in ("connects", "hedged", "hedge_wins", "timeouts"):
+            lines.append(f"# TYPE upstream_{stat}_total counter")
+            lines.append(f"upstream_{stat}_total {self.stats[stat]}")
+        return "\n".join(lines) + "\n"
+
+
+upstream_connector = UpstreamConnector()
+
+
+async def _benchmark(n: int) -> None:
+    """Connect latency with slow-connect faults, hedged vs not, then a breaker trip and recovery"""
+    from fake_realtime import FakeRealtimeServer
+
+    def percentile(ordered: List[float], p: float) -> float:
+        return ordered[min(len(ordered) - 1, int(len(ordered) * p))]
+
+    # 10% of connects take 2 s longer
+    upstream = FakeRealtimeServer(connect_delay_ms=30, fault="slow", fault_rate=0.1, slow_connect_ms=2000, seed=7)
+    url = await upstream.start()
+    print(f"{n} connects, 10% slowed by 2 s (10 at a time)")
+    for label, attempts in (("single attempt", 1), ("hedged", 2)):
+        connector = UpstreamConnector(max_attempts=attempts)
+        samples: List[float] = []
+
+        async def one() -> None:
+            started = time.perf_counter()
+            ws, _ = await connector.connect("bench", url)
+            samples.append((time.perf_counter() - started) * 1000)
+            await ws.close()
+
+        for _ in range(n // 10):
+            await asyncio.gather(*(one() for _ in range(10)))
+        ordered = sorted(samples)
+        print(f"  {label:<15} p50={percentile(ordered, 0.5):6.0f} ms  p95={percentile(ordered, 0.95):6.0f} ms  "
+              f"p99={percentile(ordered, 0.99):6.0f} ms  hedged={connector.stats['hedged']} "
+              f"wins={connector.stats['hedge_wins']} (hedge delay {connector.hedge_delay_s('bench') * 1000:.0f} ms)")
+
+    # Every connect hangs: trip the breaker, fail fast, recover through a probe
+    upstream.fault, upstream.fault_rate = "hang", 1.0
+    connector = UpstreamConnector(timeout_s=0.5, failure_threshold=3, open_s=1.0)
+
+    async def timed() -> Tuple[str, float]:
+        started = time.perf_counter()
+        try:
+            ws, _ = await connector.connect("bench", url)
+            await ws.close()
+            outcome = "ok"
+        except UpstreamUnavailable as e:
+            outcome = "fast-fail" if e.retry_after_s is not None else "failed"
+        return outcome, (time.perf_counter() - started) * 1000
+
+    print("Upstream hangs (0.5 s deadline, opens after 3 failures, 1 s open)")
+    for _ in range(5):
+        outcome, ms = await timed()
+        print(f"  {outcome:<9} {ms:6.1f} ms  breaker={connector.breaker('bench').state}")
+    upstream.fault_rate = 0.0
+    await asyncio.sleep(1.1)
+    for _ in range(2):
+        outcome, ms = await timed()
+        print(f"  {outcome:<9} {ms:6.1f} ms  breaker={connector.breaker('bench').state} (upstream healthy)")
+    print(connector.prometheus().splitlines()[2])
+    await upstream.stop()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.WARNING)
+    asyncio.run(_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 200))
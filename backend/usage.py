@@ -0,0 +1,301 @@
+"""
+Per-session usage and cost accounting
+Each voice session accumulates token usage (from response.done), upstream
+bytes, tool calls and time to first audio in a fixed-size counter array.
+When the session closes its totals are queued to a SQLite sink and written
+in batches on a dedicated thread; /api/usage aggregates them per preset or
+per config field, so settings like max_response_output_tokens can be tied to
+latency and cost
+
+Benchmark: python usage.py [n_sessions]
+"""
+import asyncio
+import json
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from array import array
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+USAGE_DB_PATH = os.getenv(
+    "USAGE_DB_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "usage.db")
+)
+MAX_WRITE_BATCH = 1000
+
+# Counter slots of a session, in storage order
+USAGE_FIELDS = (
+    "responses",
+    "input_text_tokens",
+    "input_audio_tokens",
+    "cached_text_tokens",
+    "cached_audio_tokens",
+    "output_text_tokens",
+    "output_audio_tokens",
+    "bytes_up",
+    "bytes_down",
+    "tool_calls",
+    "turns",
+    "first_audio_ms",
+)
+(RESPONSES, INPUT_TEXT, INPUT_AUDIO, CACHED_TEXT, CACHED_AUDIO, OUTPUT_TEXT, OUTPUT_AUDIO,
+ BYTES_UP, BYTES_DOWN, TOOL_CALLS, TURNS, FIRST_AUDIO_MS) = range(len(USAGE_FIELDS))
+
+# USD per 1M tokens (gpt-4o-realtime-preview); override with USAGE_PRICES='{"output_audio_tokens": 80, ...}'
+TOKEN_PRICES: Dict[str, float] = {
+    "input_text_tokens": 5.0,
+    "input_audio_tokens": 40.0,
+    "cached_text_tokens": 2.5,
+    "cached_audio_tokens": 2.5,
+    "output_text_tokens": 20.0,
+    "output_audio_tokens": 80.0,
+    **json.loads(os.getenv("USAGE_PRICES", "{}"))
+}
+
+# Columns /api/usage can group by besides config fields
+GROUP_COLUMNS = ("preset", "engine")
+
+
+def estimate_cost(totals: Dict[str, Any]) -> float:
+    """USD for token totals; input_*_tokens include the cached tokens billed at the cached rate"""
+    cost = 0.0
+    for field, price in TOKEN_PRICES.items():
+        tokens = totals.get(field) or 0
+        if field == "input_text_tokens":
+            tokens -= totals.get("cached_text_tokens") or 0
+        elif field == "input_audio_tokens":
+            tokens -= totals.get("cached_audio_tokens") or 0
+        cost += max(tokens, 0) * price / 1_000_000
+    return round(cost, 6)
+
+
+class SessionUsage:
+    """Counters of one live session"""
+
+    __slots__ = ("session_id", "engine", "preset", "config", "started_at", "_started", "_speech_stopped", "counters")
+
+    def __init__(self, session_id: str, engine: str = "realtime", preset: Optional[str] = None,
+                 config: Optional[Dict[str, Any]] = None):
+        self.session_id = session_id
+        self.engine = engine
+        self.preset = preset
+        self.config = config or {}
+        self.started_at = time.time()
+        self._started = time.monotonic()
+        self._speech_stopped: Optional[float] = None
+        self.counters = array("q", bytes(8 * len(USAGE_FIELDS)))
+
+    def add_response(self, usage: Optional[Dict[str, Any]]) -> None:
+        """Token usage of a response.done event"""
+        counters = self.counters
+        counters[RESPONSES] += 1
+        if not usage:
+            return
+        input_details = usage.get("input_token_details") or {}
+        output_details = usage.get("output_token_details") or {}
+        counters[INPUT_TEXT] += input_details.get("text_tokens") or 0
+        counters[INPUT_AUDIO] += input_details.get("audio_tokens") or 0
+        cached = input_details.get("cached_tokens_details")
+        if cached:
+            counters[CACHED_TEXT] += cached.get("text_tokens") or 0
+            counters[CACHED_AUDIO] += cached.get("audio_tokens") or 0
+        else:
+            counters[CACHED_TEXT] += input_details.get("cached_tokens") or 0
+        counters[OUTPUT_TEXT] += output_details.get("text_tokens") or 0
+        counters[OUTPUT_AUDIO] += output_details.get("audio_tokens") or 0
+
+    def speech_stopped(self) -> None:
+        self._speech_stopped = time.monotonic()
+
+    def audio_started(self) -> Optional[int]:
+        """First response audio of a turn: time since the caller stopped speaking, or None"""
+        if self._speech_stopped is None:
+            return None
+        first_audio_ms = int((time.monotonic() - self._speech_stopped) * 1000)
+        self.counters[TURNS] += 1
+        self.counters[FIRST_AUDIO_MS] += first_audio_ms
+        self._speech_stopped = None
+        return first_audio_ms
+
+    def duration_ms(self) -> int:
+        return int((time.monotonic() - self._started) * 1000)
+
+    def snapshot(self) -> Dict[str, Any]:
+        totals = dict(zip(USAGE_FIELDS, self.counters))
+        return {
+            "session_id": self.session_id,
+            "engine": self.engine,
+            "preset": self.preset,
+            "started_at": self.started_at,
+            "duration_ms": self.duration_ms(),
+            **totals,
+            "cost_usd": estimate_cost(totals)
+        }
+
+
+_SCHEMA = f"""
+CREATE TABLE IF NOT EXISTS session_usage (
+    session_id TEXT PRIMARY KEY,
+    engine TEXT,
+    preset TEXT,
+    config TEXT NOT NULL,
+    started_at REAL NOT NULL,
+    duration_ms INTEGER NOT NULL,
+    {", ".join(f"{field} INTEGER NOT NULL" for field in USAGE_FIELDS)}
+);
+CREATE INDEX IF NOT EXISTS session_usage_started ON session_usage (started_at);
+"""
+
+
+class UsageStore:
+    """Write-behind SQLite sink for finished sessions"""
+
+    def __init__(self, path: str = USAGE_DB_PATH):
+        self.path = path
+        self._pending: List[tuple] = []
+        self._writer: Optional[asyncio.Task] = None
+        self._db: Optional[sqlite3.Connection] = None
+        # One thread owns the connection, so every database call runs on it
+        self._thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="usage")
+        self.stats = {"sessions": 0, "commits": 0}
+
+    async def _run(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._thread, fn, *args)
+
+    # ------------------------------------------------------------------------
+    # Database thread
+    # ------------------------------------------------------------------------
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._db is None:
+            os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+            self._db = sqlite3.connect(self.path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("PRAGMA synchronous=NORMAL")
+            self._db.executescript(_SCHEMA)
+        return self._db
+
+    def _write_batch(self, rows: List[tuple]) -> None:
+        db = self._connect()
+        with db:
+            db.executemany(
+                f"INSERT OR REPLACE INTO session_usage VALUES ({', '.join('?' * (6 + len(USAGE_FIELDS)))})", rows
+            )
+
+    def _aggregate(self, group_expr: str, since: float) -> List[tuple]:
+        sums = ", ".join(f"SUM({field})" for field in USAGE_FIELDS)
+        rows = self._connect().execute(
+            f"SELECT {group_expr} AS grp, COUNT(*), SUM(duration_ms), {sums} FROM session_usage "
+            f"WHERE started_at >= ? GROUP BY grp ORDER BY COUNT(*) DESC",
+            (since,)
+        ).fetchall()
+        return [(row[0], row[1], row[2], dict(zip(USAGE_FIELDS, row[3:]))) for row in rows]
+
+    # ------------------------------------------------------------------------
+    # Event loop API
+    # ------------------------------------------------------------------------
+
+    def record(self, usage: SessionUsage) -> None:
+        """Queue a finished session; it is written with the next batch"""
+        self._pending.append((
+            usage.session_id, usage.engine, usage.preset, json.dumps(usage.config, separators=(",", ":")),
+            usage.started_at, usage.duration_ms(), *usage.counters
+        ))
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._write_loop())
+
+    async def _write_loop(self) -> None:
+        while self._pending:
+            batch, self._pending = self._pending[:MAX_WRITE_BATCH], self._pending[MAX_WRITE_BATCH:]
+            try:
+                await self._run(self._write_batch, batch)
+            except Exception as e:
+                logger.error(f"❌ Writing usage of {len(batch)} sessions failed: {e}")
+                continue
+            self.stats["sessions"] += len(batch)
+            self.stats["commits"] += 1
+
+    async def flush(self) -> None:
+        if self._writer is not None:
+            await self._writer
+
+    async def aggregate(self, group_by: str = "preset", since: float = 0) -> List[Dict[str, Any]]:
+        """
+        Totals per group of finished sessions: a GROUP_COLUMNS column or a
+        session config field (e.g. max_response_output_tokens)
+        """
+        await self.flush()
+        if group_by in GROUP_COLUMNS:
+            group_expr = f"COALESCE({group_by}, 'default')" if group_by == "preset" else group_by
+        elif group_by.isidentifier():
+            group_expr = f"json_extract(config, '$.{group_by}')"
+        else:
+            raise ValueError(f"Cannot group usage by {group_by!r}")
+
+        result = []
+        for group, sessions, duration_ms, totals in await self._run(self._aggregate, group_expr, since):
+            result.append({
+                group_by: group,
+                "sessions": sessions,
+                "avg_duration_s": round(duration_ms / sessions / 1000, 1),
+                "avg_first_audio_ms": round(totals["first_audio_ms"] / totals["turns"]) if totals["turns"] else None,
+                "avg_output_tokens": round((totals["output_text_tokens"] + totals["output_audio_tokens"])
+                                           / totals["responses"]) if totals["responses"] else None,
+                "cost_usd": estimate_cost(totals),
+                "avg_cost_usd": round(estimate_cost(totals) / sessions, 6),
+                "totals": totals
+            })
+        return result
+
+    async def close(self) -> None:
+        await self.flush()
+        if self._db is not None:
+            await self._run(self._db.close)
+            self._db = None
+        self._thread.shutdown(wait=True)
+
+
+usage_store = UsageStore()
+
+
+async def _benchmark(n: int) -> None:
+    usage_response = {
+        "input_token_details": {"text_tokens": 900, "audio_tokens": 300, "cached_tokens": 640},
+        "output_token_details": {"text_tokens": 40, "audio_tokens": 160}
+    }
+    with tempfile.TemporaryDirectory() as tmp:
+        store = UsageStore(os.path.join(tmp, "usage.db"))
+
+        started = time.perf_counter()
+        for i in range(n):
+            usage = SessionUsage(f"s{i}", preset=("payment", "conversation", None)[i % 3],
+                                 config={"max_response_output_tokens": (256, 1000)[i % 2]})
+            for _ in range(10):
+                usage.add_response(usage_response)
+                usage.counters[BYTES_DOWN] += 48000
+            store.record(usage)
+        queued = time.perf_counter() - started
+        await store.flush()
+        written = time.perf_counter() - started
+
+        started = time.perf_counter()
+        by_preset = await store.aggregate("preset")
+        await store.aggregate("max_response_output_tokens")
+        query_ms = (time.perf_counter() - started) / 2 * 1000
+
+        print(f"{n:,} sessions × 10 responses")
+        print(f"  accumulate + queue: {queued / n * 1e6:6.2f} µs per session")
+        print(f"  written:            {n / written:9,.0f} sessions/s ({store.stats['commits']} commits)")
+        print(f"  aggregate query:    {query_ms:6.1f} ms")
+        print(f"  {by_preset[0]['preset']}: {by_preset[0]['sessions']} sessions, ${by_preset[0]['avg_cost_usd']} each")
+        await store.close()
+
+
+if __name__ == "__main__":
+    asyncio.run(_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 100000))
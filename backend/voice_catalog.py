@@ -0,0 +1,300 @@
+"""
+Voice catalog
+OpenAI Realtime voices are a fixed set; Cartesia voices (cascaded engine)
+come from the Cartesia API. The catalog is fetched in the background after
+startup, kept in memory by voice id for O(1) validation of session configs,
+and mirrored to a JSON file so a restarted or offline worker starts from
+the last copy. It is refreshed every VOICE_CATALOG_TTL_S; a failed fetch
+keeps the current copy and retries sooner. /api/voices serves it
+
+Benchmark: python voice_catalog.py [voices]
+List the catalog: python voice_catalog.py list
+"""
+import asyncio
+import json
+import logging
+import os
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+CARTESIA_API_URL = os.getenv("CARTESIA_API_URL", "https://api.cartesia.ai")
+CARTESIA_VERSION = "2024-06-10"
+VOICE_CATALOG_TTL_S = float(os.getenv("VOICE_CATALOG_TTL_S", "21600"))
+VOICE_CATALOG_RETRY_S = float(os.getenv("VOICE_CATALOG_RETRY_S", "300"))
+VOICE_CATALOG_PATH = os.getenv(
+    "VOICE_CATALOG_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "cartesia_voices.json")
+)
+MAX_CATALOG_PAGES = 50
+
+# Voices of the OpenAI Realtime API
+REALTIME_VOICES = frozenset({"alloy", "ash", "ballad", "coral", "echo", "sage", "shimmer", "verse"})
+
+# Fields kept per Cartesia voice
+VOICE_FIELDS = ("id", "name", "description", "language", "gender")
+
+
+def _voices_of(page: Any) -> List[Dict[str, Any]]:
+    """Voices of one API response: a plain list (older API versions) or {"data": [...]}"""
+    if isinstance(page, list):
+        return page
+    return page.get("data") or page.get("voices") or []
+
+
+class VoiceCatalog:
+    """Cartesia voices by id, loaded from disk and refreshed from the API in the background"""
+
+    def __init__(self, api_key: Optional[str] = None, path: str = VOICE_CATALOG_PATH,
+                 ttl_s: float = VOICE_CATALOG_TTL_S, retry_s: float = VOICE_CATALOG_RETRY_S,
+                 base_url: str = CARTESIA_API_URL):
+        self._api_key = api_key
+        self.path = path
+        self.ttl_s = ttl_s
+        self.retry_s = retry_s
+        self.base_url = base_url.rstrip("/")
+        self.voices: Dict[str, Dict[str, Any]] = {}
+        self.fetched_at: Optional[float] = None  # wall clock, survives restarts through the file
+        self.source = "none"  # none | disk | api
+        self.stats = {"refreshes": 0, "failures": 0}
+        self._listing: Optional[str] = None
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def api_key(self) -> Optional[str]:
+        # Read on use: the module-level catalog is built before app.py loads .env
+        return self._api_key if self._api_key is not None else os.getenv("CARTESIA_API_KEY")
+
+    # ---- lookups ----------------------------------------------------------
+
+    def has(self, voice_id: str) -> bool:
+        return voice_id in self.voices
+
+    @property
+    def loaded(self) -> bool:
+        return self.fetched_at is not None
+
+    def stale(self) -> bool:
+        return self.fetched_at is None or time.time() - self.fetched_at > self.ttl_s
+
+    def listing(self) -> str:
+        """JSON of both voice sets; the voice list is encoded once per catalog update"""
+        if self._listing is None:
+            self._listing = json.dumps({
+                "realtime": sorted(REALTIME_VOICES),
+                "cartesia": sorted(self.voices.values(), key=lambda voice: (voice.get("name") or "", voice["id"]))
+            })
+        return f'{self._listing[:-1]}, {json.dumps(self.snapshot())[1:]}'
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "source": self.source,
+            "voices": len(self.voices),
+            "fetched_at": self.fetched_at,
+            "stale": self.stale(),
+            **self.stats
+        }
+
+    # ---- loading ----------------------------------------------------------
+
+    def _replace(self, voices: List[Dict[str, Any]], fetched_at: float, source: str) -> None:
+        self.voices = {
+            voice["id"]: {field: voice.get(field) for field in VOICE_FIELDS}
+            for voice in voices if isinstance(voice, dict) and voice.get("id")
+        }
+        self.fetched_at = fetched_at
+        self.source = source
+        self._listing = None
+
+    def load_disk(self) -> bool:
+        """Start from the file written by the last successful fetch"""
+        try:
+            with open(self.path) as f:
+                cached = json.load(f)
+            self._replace(cached["voices"], cached["fetched_at"], "disk")
+        except FileNotFoundError:
+            return False
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning(f"⚠️ Ignoring unreadable voice catalog cache {self.path}: {e}")
+            return False
+        logger.info(f"🎤 Voice catalog: {len(self.voices)} Cartesia voices from disk "
+                    f"({(time.time() - self.fetched_at) / 3600:.1f} h old)")
+        return True
+
+    def _save_disk(self, voices: List[Dict[str, Any]], fetched_at: float) -> None:
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        partial = f"{self.path}.tmp"
+        with open(partial, "w") as f:
+            json.dump({"fetched_at": fetched_at, "voices": voices}, f)
+        os.replace(partial, self.path)
+
+    async def fetch(self, http) -> List[Dict[str, Any]]:
+        """Every voice from the Cartesia API, following pagination"""
+        headers = {"X-API-Key": self.api_key, "Cartesia-Version": CARTESIA_VERSION}
+        voices: List[Dict[str, Any]] = []
+        params: Dict[str, Any] = {"limit": 100}
+        for _ in range(MAX_CATALOG_PAGES):
+            async with http.get(f"{self.base_url}/voices", headers=headers, params=params) as response:
+                response.raise_for_status()
+                page = await response.json()
+            page_voices = _voices_of(page)
+            voices.extend(page_voices)
+            if not isinstance(page, dict) or not page.get("has_more") or not page_voices:
+                break
+            params["starting_after"] = page_voices[-1].get("id")
+        return voices
+
+    async def refresh(self) -> bool:
+        """Fetch the catalog and write it to disk; the current copy stays on failure"""
+        import aiohttp
+
+        if not self.api_key:
+            return False
+        started = time.perf_counter()
+        try:
+            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30)) as http:
+                voices = await self.fetch(http)
+        except Exception as e:
+            self.stats["failures"] += 1
+            logger.warning(f"⚠️ Voice catalog refresh failed, keeping {self.source} copy: {e}")
+            return False
+        fetched_at = time.time()
+        try:
+            await asyncio.to_thread(self._save_disk, voices, fetched_at)
+        except OSError as e:
+            logger.warning(f"⚠️ Cannot write voice catalog cache {self.path}: {e}")
+        self._replace(voices, fetched_at, "api")
+        self.stats["refreshes"] += 1
+        logger.info(f"🎤 Voice catalog: {len(self.voices)} Cartesia voices fetched in "
+                    f"{(time.perf_counter() - started) * 1000:.0f} ms")
+        return True
+
+    async def run(self) -> None:
+        """Disk copy first, then keep the catalog fresh for the life of the worker"""
+        await asyncio.to_thread(self.load_disk)
+        if not self.api_key:
+            logger.info("🎤 CARTESIA_API_KEY not set: Cartesia voices come from the disk cache only")
+            return
+        while True:
+            if self.stale():
+                await self.refresh()
+            wait_s = self.ttl_s - (time.time() - self.fetched_at) if not self.stale() else self.retry_s
+            await asyncio.sleep(max(wait_s, 1.0))
+
+    def start(self) -> None:
+        """Load and refresh in the background; returns at once"""
+        if self._task is None:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+voice_catalog = VoiceCatalog()
+
+
+def check_voice(voice: Optional[str], engine: Optional[str], catalog: VoiceCatalog = voice_catalog) -> None:
+    """Raise ValueError for a voice the engine cannot use"""
+    if voice is None or voice in REALTIME_VOICES:
+        # The cascaded engine falls back to CARTESIA_VOICE_ID for Realtime voice names
+        return
+    if engine == "cascaded":
+        # Unverifiable until the catalog has been loaded once
+        if catalog.loaded and not catalog.has(voice):
+            raise ValueError(f"Unknown Cartesia voice '{voice}'; see /api/voices")
+        return
+    raise ValueError(f"Unknown Realtime voice '{voice}'. Available: {', '.join(sorted(REALTIME_VOICES))}")
+
+
+async def _benchmark(count: int) -> None:
+    """Startup cost, cold fetch, disk start and validation against a fake Cartesia API"""
+    import tempfile
+
+    from aiohttp import web
+
+    logging.getLogger().setLevel(logging.WARNING)
+    voices = [{"id": f"voice-{i:05d}", "name": f"Voice {i}", "language": "en", "description": "bench"}
+              for i in range(count)]
+
+    async def list_voices(request):
+        await asyncio.sleep(0.3)  # a slow API
+        limit = int(request.query.get("limit", 100))
+        after = request.query.get("starting_after")
+        start = next((i + 1 for i, voice in enumerate(voices) if voice["id"] == after), 0) if after else 0
+        page = voices[start:start + limit]
+        return web.json_response({"data": page, "has_more": start + limit < len(voices)})
+
+    server = web.Application()
+    server.router.add_get("/voices", list_voices)
+    runner = web.AppRunner(server)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    base_url = f"http://127.0.0.1:{site._server.sockets[0].getsockname()[1]}"
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "voices.json")
+        catalog = VoiceCatalog("bench", path, base_url=base_url)
+        started = time.perf_counter()
+        catalog.start()
+        print(f"{count:,} voices, 300 ms per API page of 100")
+        print(f"  start() returned after           {(time.perf_counter() - started) * 1e6:8.0f} µs")
+        while not catalog.loaded:
+            await asyncio.sleep(0.01)
+        print(f"  cold fetch from the API          {(time.perf_counter() - started) * 1000:8.0f} ms")
+        await catalog.stop()
+
+        offline = VoiceCatalog("bench", path, base_url="http://127.0.0.1:9")
+        started = time.perf_counter()
+        offline.start()
+        while not offline.loaded:
+            await asyncio.sleep(0.001)
+        print(f"  offline start from disk cache    {(time.perf_counter() - started) * 1000:8.1f} ms  "
+              f"({len(offline.voices):,} voices, source={offline.source})")
+        await offline.stop()
+
+        probes = [voices[i % count]["id"] for i in range(0, 100000, 7)]
+        started = time.perf_counter()
+        for voice_id in probes:
+            check_voice(voice_id, "cascaded", catalog)
+        lookup_ns = (time.perf_counter() - started) / len(probes) * 1e9
+        started = time.perf_counter()
+        for voice_id in probes[:1000]:
+            any(voice["id"] == voice_id for voice in voices)
+        scan_ns = (time.perf_counter() - started) / 1000 * 1e9
+        print(f"  validate a voice                 {lookup_ns:8.0f} ns  (scanning the API list: {scan_ns:,.0f} ns)")
+        started = time.perf_counter()
+        for _ in range(1000):
+            catalog.listing()
+        print(f"  /api/voices body                 {(time.perf_counter() - started) * 1000:8.1f} µs "
+              f"(encoded once: {len(catalog.listing()):,} bytes)")
+    await runner.cleanup()
+
+
+async def _list() -> None:
+    catalog = VoiceCatalog()
+    catalog.load_disk()
+    if catalog.stale() and not await catalog.refresh() and not catalog.loaded:
+        print("❌ No voice catalog: set CARTESIA_API_KEY")
+        return
+    print(f"\n🎤 Cartesia voices ({catalog.source}):\n")
+    for voice in sorted(catalog.voices.values(), key=lambda voice: voice.get("name") or ""):
+        print(f"  - {voice['id']}: {voice.get('name')} ({voice.get('language')})")
+    print(f"\nOpenAI Realtime voices: {', '.join(sorted(REALTIME_VOICES))}")
+
+
+if __name__ == "__main__":
+    if sys.argv[1:2] == ["list"]:
+        from dotenv import load_dotenv
+        load_dotenv()
+        asyncio.run(_list())
+    else:
+        asyncio.run(_benchmark(int(sys.argv[1]) if len(sys.argv) > 1 else 1000))
@@ -38,7 +38,7 @@ export const bills: Bill[] = [
         id: 'plan_24mo_reduced',
         type: 'reduced_apr',
         months: 24,
-        monthlyPayment: 58.00, // Approximate with interest
+        monthlyPayment: 60.55, // As priced by backend/plan_engine.py
         label: '24 Months Reduced APR',
         details: '14.90% APR for 24 months'
       }
@@ -80,6 +80,12 @@ export const VoiceModeProvider: React.FC<VoiceModeProviderProps> = ({ children,
     const { call_id, name, arguments: args } = event;
     console.log(`🔧 Function call received: ${name}`, { call_id, args });
 
+    // Re-issued calls answered by the backend were already applied to the UI
+    if (event.handled && event.duplicate) {
+      console.log(`♻️ Duplicate ${name} already handled, skipping`);
+      return;
+    }
+
     let parsedArgs;
 
     try {
@@ -324,7 +330,7 @@ export const VoiceModeProvider: React.FC<VoiceModeProviderProps> = ({ children,
         break;
 
       case 'process_payment':
-        const transactionId = `TXN${Date.now()}`;
+        const transactionId = event.result?.transaction_id || `TXN${Date.now()}`;
         result = {
           success: true,
           transaction_id: transactionId,
@@ -373,6 +379,11 @@ export const VoiceModeProvider: React.FC<VoiceModeProviderProps> = ({ children,
         break;
     }
 
+    // Tools answered by the backend only need their UI side effects here
+    if ((event as any).handled) {
+      return;
+    }
+
     realtimeService.sendFunctionResult(call_id, result);
   }, [addMessageToHistory]);
 
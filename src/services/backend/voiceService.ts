@@ -12,6 +12,7 @@ export class BackendVoiceService {
   private eventHandlers: Map<string, Set<(event: RealtimeEvent) => void>> = new Map();
   private audioQueue: AudioBuffer[] = [];
   private isPlaying = false;
+  private currentSource: AudioBufferSourceNode | null = null;
   private backendUrl: string;
 
   constructor(backendUrl: string = 'ws://localhost:8000/ws/voice') {
@@ -133,9 +134,13 @@ export class BackendVoiceService {
     const source = this.audioContext.createBufferSource();
     source.buffer = audioBuffer;
     source.connect(this.audioContext.destination);
+    this.currentSource = source;
 
     source.onended = () => {
-      this.playNextAudio();
+      // A source stopped by barge-in must not restart playback
+      if (this.currentSource === source) {
+        this.playNextAudio();
+      }
     };
 
     try {
@@ -196,8 +201,8 @@ export class BackendVoiceService {
         this.audioQueue.push(audioBuffer);
         // console.log('🎵 Audio chunk queued. Queue length:', this.audioQueue.length); // Debug log
 
-        // Buffer at least 5 chunks before playing to prevent stuttering
-        if (!this.isPlaying && this.audioQueue.length >= 5) {
+        // The backend paces audio at playback rate, so a two-frame cushion is enough
+        if (!this.isPlaying && this.audioQueue.length >= 2) {
           this.playNextAudio();
         }
       } catch (error) {
@@ -214,6 +219,11 @@ export class BackendVoiceService {
       }
       this.emit(data.type, data);
       this.emit('*', data);
+    } else if (data.type === 'input_audio_buffer.speech_started') {
+      // Caller interrupted: cut playback; the backend has already dropped the rest
+      this.stopPlayback();
+      this.emit(data.type, data);
+      this.emit('*', data);
     } else if (data.type === 'function_call') {
       // Handle function call events from backend
       console.log('🔧 FUNCTION CALL RECEIVED:', data);
@@ -333,10 +343,23 @@ export class BackendVoiceService {
     this.cleanup();
   }
 
-  private cleanup(): void {
-    this.stopRecording();
+  private stopPlayback(): void {
+    const source = this.currentSource;
+    this.currentSource = null;
     this.audioQueue = [];
     this.isPlaying = false;
+    if (source) {
+      try {
+        source.stop();
+      } catch {
+        // Already stopped
+      }
+    }
+  }
+
+  private cleanup(): void {
+    this.stopRecording();
+    this.stopPlayback();
   }
 
   on(event: string, handler: (event: RealtimeEvent) => void): void {